@@ -0,0 +1,192 @@
+# backfill.py
+"""
+Historical backfill into the bar cache (bar_store.py).
+- a requested range is split into provider-legal windows (ccxt: page_limit bars per call;
+  yfinance intraday: per-request and lookback limits per interval)
+- windows are downloaded concurrently, each request paced by its provider's token bucket
+- finished windows are merged into the bar store (duplicates dropped, index sorted) and
+  recorded as covered spans, so a re-run after a failure only fetches what is still missing
+- start dates older than the provider can serve are clamped, with a warning, instead of
+  being silently truncated by the provider
+
+Usage:
+python -m backfill BINANCE:BTC/USDT --interval 15m --days 365
+python -m backfill NSE:RELIANCE --interval 15m --days 365     # clamped to yfinance's 60 days
+"""
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import (BarStore, _index_to_ns, _ts_to_ns, get_store, interval_to_timedelta,
+                       period_to_timedelta)
+from metrics import inc, span
+from rate_limit import get_bucket
+
+logger = logging.getLogger(__name__)
+
+# yfinance intraday: interval -> (how far back it serves, longest range per request)
+YF_LIMITS = {
+    "1m": ("29d", "7d"),
+    "2m": ("59d", "59d"),
+    "5m": ("59d", "59d"),
+    "15m": ("59d", "59d"),
+    "30m": ("59d", "59d"),
+    "90m": ("59d", "59d"),
+    "60m": ("729d", "729d"),
+    "1h": ("729d", "729d"),
+}
+DAILY_WINDOW = pd.Timedelta(days=3650)
+
+
+def provider_limits(provider: str, interval: str, page_limit: int = 500) -> Tuple[pd.Timedelta, Optional[pd.Timedelta]]:
+    """(window per request, max lookback or None) for a rate-limit provider key."""
+    bar = interval_to_timedelta(interval)
+    if provider.startswith("ccxt"):
+        return bar * page_limit, None
+    if provider == "yfinance" and interval in YF_LIMITS:
+        lookback, window = YF_LIMITS[interval]
+        return period_to_timedelta(window), period_to_timedelta(lookback)
+    return DAILY_WINDOW, None
+
+
+def split_windows(start: pd.Timestamp, end: pd.Timestamp, window: pd.Timedelta) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """[start, end) cut into consecutive [s, e) pieces no longer than window."""
+    out = []
+    s = start
+    while s < end:
+        e = min(s + window, end)
+        out.append((s, e))
+        s = e
+    return out
+
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts
+
+
+def _trim(df: pd.DataFrame, s: pd.Timestamp, e: pd.Timestamp) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame()
+    ns = _index_to_ns(df.index)
+    return df[(ns >= _ts_to_ns(s)) & (ns < _ts_to_ns(e))]
+
+
+def backfill(symbol: str, interval: str, start, end, fetch_range: Callable[[pd.Timestamp, pd.Timestamp], pd.DataFrame],
+             window: pd.Timedelta, store: Optional[BarStore] = None, max_workers: int = 4,
+             bucket: Optional[str] = None, retries: int = 3, merge_every: int = 16,
+             refresh_last: bool = False, record_empty: bool = True) -> dict:
+    """
+    Fill [start, end) of (symbol, interval) in the bar store. fetch_range(s, e) returns OHLCV
+    for [s, e); rows outside the window are dropped. Windows already covered are skipped.
+    refresh_last: refetch the newest cached bar with the tail after it (it may have been partial).
+    record_empty: count windows that came back empty as fetched (False if the provider reports
+    errors as empty frames).
+    Returns {"windows", "done", "failed": [(start, end)], "rows"}.
+    """
+    store = store or get_store()
+    bar = interval_to_timedelta(interval)
+    start, end = _utc(start), _utc(end)
+    missing = store.missing_ranges(symbol, interval, start, end, min_gap=bar)
+    if refresh_last and missing and store.read_meta(symbol, interval).get("rows"):
+        last_ns = int(np.load(store._dir(symbol, interval) / "index.npy", mmap_mode="r")[-1])
+        s, e = missing[-1]
+        if _ts_to_ns(s) > last_ns >= _ts_to_ns(s) - bar.value:
+            missing[-1] = (pd.Timestamp(last_ns, tz="UTC"), e)
+    windows = [w for s, e in missing for w in split_windows(s, e, window)]
+    summary = {"windows": len(windows), "done": 0, "failed": [], "rows": 0}
+    if not windows:
+        return summary
+    logger.info("Backfill %s %s: %d windows, %s -> %s", symbol, interval, len(windows), windows[0][0], end)
+    limiter = get_bucket(bucket) if bucket else None
+
+    def _one(s, e):
+        for attempt in range(retries):
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                with span("provider_request", provider=bucket or "unknown"):
+                    df = fetch_range(s, e)
+                return _trim(df, s, e)
+            except Exception as ex:
+                inc("provider_request_errors_total", provider=bucket or "unknown")
+                if attempt == retries - 1:
+                    raise
+                logger.warning("Backfill %s window %s -> %s failed (%s), retrying", symbol, s, e, ex)
+                time.sleep(0.5 * 2 ** attempt)
+
+    pending = []  # finished, not yet merged: (frame, span)
+
+    def _flush():
+        # one merge per batch of windows: every merge rewrites the cached series
+        frames = [df for df, _ in pending if not df.empty]
+        # empty windows (holidays, before listing) count as fetched unless record_empty is off
+        spans = [span for df, span in pending if record_empty or not df.empty]
+        pending.clear()
+        if frames:
+            store.merge(symbol, interval, pd.concat(frames), spans=spans)
+        elif spans and store.read_meta(symbol, interval).get("rows"):
+            store.merge(symbol, interval, store.load(symbol, interval).iloc[:0], spans=spans)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(_one, s, e): (s, e) for s, e in windows}
+        for fut in as_completed(futures):
+            s, e = futures[fut]
+            try:
+                df = fut.result()
+            except Exception as ex:
+                logger.error("Backfill %s window %s -> %s failed: %s", symbol, s, e, ex)
+                summary["failed"].append((s, e))
+                continue
+            pending.append((df, (_ts_to_ns(s), _ts_to_ns(e))))
+            summary["done"] += 1
+            summary["rows"] += len(df)
+            if len(pending) >= merge_every:
+                _flush()
+    _flush()
+    if summary["failed"]:
+        logger.warning("Backfill %s %s: %d of %d windows failed; run again to resume",
+                       symbol, interval, len(summary["failed"]), len(windows))
+    return summary
+
+
+def backfill_period(symbol: str, interval: str, period: str, fetch_range, provider: str = "yfinance",
+                    page_limit: int = 500, store: Optional[BarStore] = None, max_workers: int = 4,
+                    now=None, record_empty: bool = True) -> pd.DataFrame:
+    """
+    The last `period` of bars for symbol, backfilled through `provider`'s windows and token
+    bucket. A period longer than the provider's lookback is clamped with a warning.
+    """
+    store = store or get_store()
+    span = period_to_timedelta(period)
+    if span is None:
+        raise ValueError(f"Cannot backfill open-ended period: {period}")
+    now = pd.Timestamp.now(tz="UTC") if now is None else _utc(now)
+    window, lookback = provider_limits(provider, interval, page_limit)
+    start = now - span
+    if lookback is not None and span > lookback:
+        logger.warning("%s serves %s bars only %s back; %s for %s clamped to that",
+                       provider, interval, lookback, period, symbol)
+        start = now - lookback
+    backfill(symbol, interval, start, now, fetch_range, window, store=store, max_workers=max_workers,
+             bucket=provider, refresh_last=True, record_empty=record_empty)
+    return store.load(symbol, interval, start=now - span)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("symbol", help="universe symbol, e.g. BINANCE:BTC/USDT or NSE:RELIANCE")
+    ap.add_argument("--interval", default="15m")
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+    from universal_fetcher import fetch_market_data
+    df = fetch_market_data(args.symbol, interval=args.interval, period=f"{args.days}d")
+    print(f"{args.symbol}: {len(df)} bars" + (f" from {df.index[0]} to {df.index[-1]}" if len(df) else ""))
@@ -0,0 +1,255 @@
+# bar_store.py
+"""
+On-disk columnar OHLCV cache keyed by (universe symbol, interval).
+- every column is its own .npy file, read back memory-mapped so only the
+  requested columns / time slice are paged in
+- meta.json records which time spans have already been downloaded, so a
+  top-up only asks the provider for the missing tail (and any holes)
+- cached_fetch() wraps any provider function that can fetch a [start, end) range
+"""
+
+import json
+import os
+import re
+import logging
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+DEFAULT_CACHE_DIR = os.getenv("BAR_CACHE_DIR", "data/cache/bars")
+
+_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400, "wk": 7 * 86400, "mo": 30 * 86400, "y": 365 * 86400}
+
+
+def _parse_span(text: str) -> Optional[pd.Timedelta]:
+    m = re.fullmatch(r"(\d+)\s*(m|h|d|wk|mo|y)", str(text).strip().lower())
+    if not m:
+        return None
+    return pd.Timedelta(seconds=int(m.group(1)) * _UNIT_SECONDS[m.group(2)])
+
+
+def interval_to_timedelta(interval: str) -> pd.Timedelta:
+    """'1m','5m','15m','1h','1d','1wk' -> Timedelta"""
+    td = _parse_span(interval)
+    if td is None:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return td
+
+
+def period_to_timedelta(period: str) -> Optional[pd.Timedelta]:
+    """'7d','30d','365d','1y' -> Timedelta; None for open-ended periods like 'max' / 'ytd'"""
+    return _parse_span(period)
+
+
+def _ts_to_ns(ts) -> int:
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.value)
+
+
+def _index_to_ns(index) -> np.ndarray:
+    idx = pd.DatetimeIndex(index)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    return idx.values.astype("datetime64[ns]").view("int64")
+
+
+def _ns_to_index(ns: np.ndarray, tz: Optional[str]) -> pd.DatetimeIndex:
+    idx = pd.DatetimeIndex(np.asarray(ns).astype("datetime64[ns]"))
+    if tz:
+        idx = idx.tz_localize("UTC").tz_convert(tz)
+    return idx
+
+
+def _merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for s, e in sorted(spans):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+class BarStore:
+    """
+    Layout: <root>/<safe symbol>/<interval>/{index,open,high,low,close,volume}.npy + meta.json
+    The index is stored as int64 UTC nanoseconds; the original timezone is kept in meta.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR):
+        self.root = Path(root)
+
+    def _dir(self, symbol: str, interval: str) -> Path:
+        safe = re.sub(r"[^A-Za-z0-9._-]+", "_", symbol)
+        return self.root / safe / interval
+
+    def read_meta(self, symbol: str, interval: str) -> dict:
+        path = self._dir(symbol, interval) / "meta.json"
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text())
+        except Exception as e:
+            logger.warning("Corrupt bar cache meta for %s %s: %s", symbol, interval, e)
+            return {}
+
+    def covered_spans(self, symbol: str, interval: str) -> List[Tuple[int, int]]:
+        return [tuple(s) for s in self.read_meta(symbol, interval).get("spans", [])]
+
+    def load(self, symbol: str, interval: str, columns: Optional[List[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """
+        Load cached bars. Columns are memory-mapped and only the [start, end) slice is copied out.
+        Returns an empty DataFrame when nothing is cached.
+        """
+        meta = self.read_meta(symbol, interval)
+        columns = columns or meta.get("columns", OHLCV_COLUMNS)
+        d = self._dir(symbol, interval)
+        if not meta.get("rows"):
+            return pd.DataFrame()
+        try:
+            index = np.load(d / "index.npy", mmap_mode="r")
+            if len(index) != meta["rows"]:
+                raise ValueError("row count mismatch")
+            lo = 0 if start is None else int(np.searchsorted(index, _ts_to_ns(start), side="left"))
+            hi = len(index) if end is None else int(np.searchsorted(index, _ts_to_ns(end), side="left"))
+            data = {}
+            for col in columns:
+                arr = np.load(d / f"{col}.npy", mmap_mode="r")
+                if len(arr) != meta["rows"]:
+                    raise ValueError(f"row count mismatch in {col}")
+                data[col] = np.array(arr[lo:hi])
+            idx = _ns_to_index(index[lo:hi], meta.get("tz"))
+        except Exception as e:
+            logger.warning("Unreadable bar cache for %s %s, ignoring it: %s", symbol, interval, e)
+            return pd.DataFrame()
+        return pd.DataFrame(data, index=idx)
+
+    def write(self, symbol: str, interval: str, df: pd.DataFrame, spans: List[Tuple[int, int]]):
+        """Replace the cached series. Column files first, meta.json last (it is the commit point)."""
+        d = self._dir(symbol, interval)
+        d.mkdir(parents=True, exist_ok=True)
+        tz = str(df.index.tz) if getattr(df.index, "tz", None) is not None else None
+        arrays = {"index": _index_to_ns(df.index)}
+        for col in df.columns:
+            arrays[col] = df[col].to_numpy(dtype="float64")
+        for name, arr in arrays.items():
+            tmp = d / f"{name}.npy.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, d / f"{name}.npy")
+        meta = {
+            "symbol": symbol,
+            "interval": interval,
+            "columns": list(df.columns),
+            "rows": int(len(df)),
+            "tz": tz,
+            "spans": [list(s) for s in _merge_spans(spans)],
+        }
+        tmp = d / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, d / "meta.json")
+
+    def merge(self, symbol: str, interval: str, df: pd.DataFrame, span: Optional[Tuple[int, int]] = None,
+              spans: Sequence[Tuple[int, int]] = ()):
+        """Merge new bars into the cache (new rows win on duplicate timestamps) and record the fetched span(s)."""
+        existing = self.load(symbol, interval)
+        covered = self.covered_spans(symbol, interval) + list(spans)
+        if span is not None:
+            covered.append(span)
+        df = df[[c for c in OHLCV_COLUMNS if c in df.columns]]
+        if not existing.empty:
+            tz = existing.index.tz
+            new_idx = pd.DatetimeIndex(df.index)
+            if tz is not None and new_idx.tz is None:
+                new_idx = new_idx.tz_localize("UTC")
+            if tz is not None:
+                new_idx = new_idx.tz_convert(tz)
+            elif new_idx.tz is not None:
+                new_idx = new_idx.tz_convert("UTC").tz_localize(None)
+            df = df.set_axis(new_idx)
+            df = pd.concat([existing, df])
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        self.write(symbol, interval, df, covered)
+        return df
+
+    def missing_ranges(self, symbol: str, interval: str, start, end,
+                       min_gap: Optional[pd.Timedelta] = None) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """Parts of [start, end) not yet downloaded. Holes shorter than min_gap are ignored."""
+        s_ns, e_ns = _ts_to_ns(start), _ts_to_ns(end)
+        min_ns = 0 if min_gap is None else int(min_gap.value)
+        missing = []
+        cursor = s_ns
+        for cs, ce in _merge_spans(self.covered_spans(symbol, interval)):
+            if ce <= cursor:
+                continue
+            if cs >= e_ns:
+                break
+            if cs > cursor:
+                missing.append((cursor, cs))
+            cursor = max(cursor, ce)
+        if cursor < e_ns:
+            missing.append((cursor, e_ns))
+        return [(pd.Timestamp(s, tz="UTC"), pd.Timestamp(e, tz="UTC"))
+                for s, e in missing if e - s >= min_ns]
+
+
+_default_store = None
+
+
+def get_store() -> BarStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = BarStore()
+    return _default_store
+
+
+def cached_fetch(symbol: str, interval: str, period: str,
+                 fetch_range: Callable[[pd.Timestamp, pd.Timestamp], pd.DataFrame],
+                 store: Optional[BarStore] = None, page_limit: Optional[int] = None,
+                 now=None) -> pd.DataFrame:
+    """
+    Return the last `period` of `interval` bars for `symbol`, only downloading what the cache lacks.
+    fetch_range(start, end) must return an OHLCV frame covering [start, end) (UTC timestamps).
+    page_limit: if the provider caps rows per call (ccxt), keep paging while a full page comes back.
+    """
+    store = store or get_store()
+    span = period_to_timedelta(period)
+    if span is None:
+        raise ValueError(f"Cannot cache open-ended period: {period}")
+    bar = interval_to_timedelta(interval)
+    now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+    if now.tzinfo is None:
+        now = now.tz_localize("UTC")
+    start = now - span
+
+    meta = store.read_meta(symbol, interval)
+    last_ns = None
+    if meta.get("rows"):
+        last_ns = int(np.load(store._dir(symbol, interval) / "index.npy", mmap_mode="r")[-1])
+
+    for s, e in store.missing_ranges(symbol, interval, start, now, min_gap=bar):
+        # the newest cached bar may have been partial when it was fetched: refresh it with the tail
+        if last_ns is not None and _ts_to_ns(s) > last_ns >= _ts_to_ns(s) - bar.value:
+            s = pd.Timestamp(last_ns, tz="UTC")
+        while s < e:
+            logger.info("Bar cache top-up %s %s: %s -> %s", symbol, interval, s, e)
+            df = fetch_range(s, e)
+            if df is None or df.empty:
+                break
+            got_ns = _index_to_ns(df.index)
+            full_page = page_limit is not None and len(df) >= page_limit
+            covered_end = int(got_ns[-1]) if full_page else _ts_to_ns(e)
+            store.merge(symbol, interval, df, span=(_ts_to_ns(s), covered_end))
+            if not full_page or covered_end <= _ts_to_ns(s):
+                break
+            s = pd.Timestamp(covered_end, tz="UTC")
+
+    return store.load(symbol, interval, start=start)
@@ -0,0 +1,224 @@
+# benchmarks/run.py
+"""
+End-to-end benchmark suite (offline, synthetic data from benchmarks/synthetic.py).
+Cases:
+- detect_patterns, add_technical_indicators, build_features_and_labels
+- resample: base bars -> 1h / 1d / 1wk (resample.resample_ohlcv)
+- tick_aggregator: size ticks over 100 symbols -> 1m / 5m / 15m bars (live.tick_aggregator)
+- model_fit / model_predict (build_model(); fit is capped at --max-fit-rows)
+- backtest: run_backtest on the model's predictions
+- universe_features: add_technical_indicators over --symbols series
+- webhook_sync / webhook_async: POST /webhook through the Flask app with a stub executor
+Each case runs --repeat times and records min/median seconds and bars per second.
+Results go to JSON; --compare flags cases slower than the baseline by more than --tolerance.
+
+Usage:
+python -m benchmarks.run --sizes 1k,100k --out benchmarks/results/latest.json
+python -m benchmarks.run --sizes 1k,100k,1m --symbols 100 --save-baseline benchmarks/results/baseline.json
+python -m benchmarks.run --sizes 1k,100k --compare benchmarks/results/baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.synthetic import gbm_ohlcv, parse_size, universe
+from candlestick_patterns import detect_patterns
+from live.tick_aggregator import SimulatedFeed, TickAggregator
+from resample import resample_many
+from scripts.backtest import run_backtest
+from scripts.features import add_technical_indicators, build_features_and_labels
+from scripts.model import build_model
+
+CASES = ["detect_patterns", "add_technical_indicators", "resample", "tick_aggregator", "build_features_and_labels",
+         "model_fit", "model_predict", "backtest", "universe_features", "webhook_sync", "webhook_async"]
+
+
+def _time(fn, repeat):
+    times = []
+    out = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t)
+    return times, out
+
+
+def _record(case, size, n, times, **extra):
+    med = statistics.median(times)
+    return {"case": case, "size": size, "n": n, "min_s": min(times), "median_s": med,
+            "per_s": n / med if med > 0 else None, "repeat": len(times), **extra}
+
+
+class _StubExecutor:
+    def place_order(self, symbol, side, size_pct=1.0, signal_id=None):
+        return {"paper": True, "action": side, "symbol": symbol}
+
+
+def bench_webhook(n_requests, mode):
+    """Requests/sec and ack latency of POST /webhook via the Flask test client."""
+    import live.webhook_server as ws
+    from live.order_queue import OrderQueue
+    from live.risk_manager import RiskManager
+    cfg = {"symbol": "SYN0000", "risk": {"max_risk_per_trade_pct": 100.0}}
+    ws.cfg, ws.executor, ws.risk = cfg, _StubExecutor(), RiskManager(cfg)
+    ws.orders = OrderQueue(ws.executor, maxsize=n_requests + 1, workers=4) if mode == "async" else None
+    client = ws.app.test_client()
+    lat = np.empty(n_requests)
+    t0 = time.perf_counter()
+    for i in range(n_requests):
+        t = time.perf_counter()
+        client.post("/webhook", json={"action": "BUY", "size_pct": 0.01, "id": f"b{i}"})
+        lat[i] = time.perf_counter() - t
+    if ws.orders is not None:
+        ws.orders.join()
+        ws.orders.shutdown()
+        ws.orders = None
+    return time.perf_counter() - t0, float(np.percentile(lat, 50) * 1e3), float(np.percentile(lat, 99) * 1e3)
+
+
+def run_suite(sizes, symbols=1, repeat=3, cases=None, max_fit_rows=200_000, webhook_requests=2000, seed=0):
+    cases = cases or CASES
+    results = []
+    log = logging.getLogger("benchmarks")
+    for size in sizes:
+        n = parse_size(size)
+        df = gbm_ohlcv(n, seed=seed)
+        log.info("size %s (%d bars)", size, n)
+        if "detect_patterns" in cases:
+            times, _ = _time(lambda: detect_patterns(df.copy()), repeat)
+            results.append(_record("detect_patterns", size, n, times))
+        if "add_technical_indicators" in cases:
+            times, _ = _time(lambda: add_technical_indicators(df), repeat)
+            results.append(_record("add_technical_indicators", size, n, times))
+        if "resample" in cases:
+            times, _ = _time(lambda: resample_many(df, ["1h", "1d", "1wk"]), repeat)
+            results.append(_record("resample", size, n, times))
+        if "tick_aggregator" in cases:
+            ticks = [t for batch in SimulatedFeed(100, n_ticks=n, late_frac=0.01, seed=seed) for t in batch]
+            times, _ = _time(lambda: TickAggregator(["1m", "5m", "15m"]).update_many(ticks), repeat)
+            results.append(_record("tick_aggregator", size, n, times))
+        need_xy = {"build_features_and_labels", "model_fit", "model_predict", "backtest"} & set(cases)
+        if need_xy:
+            times, (X, y, df_all) = _time(lambda: build_features_and_labels(df), repeat)
+            if "build_features_and_labels" in cases:
+                results.append(_record("build_features_and_labels", size, n, times))
+            fit_rows = min(len(X), max_fit_rows)
+            model = build_model()
+            times, _ = _time(lambda: model.fit(X.iloc[:fit_rows], y.iloc[:fit_rows]), 1)
+            if "model_fit" in cases:
+                results.append(_record("model_fit", size, fit_rows, times))
+            times, pred = _time(lambda: model.predict(X), repeat)
+            if "model_predict" in cases:
+                results.append(_record("model_predict", size, len(X), times))
+            if "backtest" in cases:
+                close = df_all.loc[X.index, "close"].to_numpy()
+                times, _ = _time(lambda: run_backtest(close, pred, index=X.index), repeat)
+                results.append(_record("backtest", size, len(X), times))
+        if "universe_features" in cases and symbols > 1:
+            def _universe():
+                for _sym, frame in universe(symbols, n, seed=seed):
+                    add_technical_indicators(frame)
+            times, _ = _time(_universe, 1)
+            results.append(_record("universe_features", size, n * symbols, times, symbols=symbols))
+    for mode in ("sync", "async"):
+        if f"webhook_{mode}" in cases:
+            times, p50, p99 = [], [], []
+            for _ in range(repeat):
+                el, a, b = bench_webhook(webhook_requests, mode)
+                times.append(el)
+                p50.append(a)
+                p99.append(b)
+            results.append(_record(f"webhook_{mode}", "requests", webhook_requests, times,
+                                   p50_ms=statistics.median(p50), p99_ms=statistics.median(p99)))
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": sys.version.split()[0], "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__,
+            "commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results, baseline, tolerance=0.2, min_delta_s=0.005):
+    """
+    [(case, size, baseline_s, new_s, ratio, regressed)] for cases present in both runs.
+    A case regresses when it is slower by more than `tolerance` and by more than
+    min_delta_s, so millisecond-scale cases do not flag on timer noise.
+    """
+    base = {(r["case"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for r in results:
+        b = base.get((r["case"], r["size"]))
+        if b is None or not b["median_s"]:
+            continue
+        ratio = r["median_s"] / b["median_s"]
+        regressed = ratio > 1.0 + tolerance and r["median_s"] - b["median_s"] > min_delta_s
+        rows.append((r["case"], r["size"], b["median_s"], r["median_s"], ratio, regressed))
+    return rows
+
+
+def print_results(results):
+    print(f"{'case':<28}{'size':>10}{'n':>12}{'median s':>12}{'per s':>14}")
+    for r in results:
+        per = f"{r['per_s']:,.0f}" if r["per_s"] else "-"
+        print(f"{r['case']:<28}{r['size']:>10}{r['n']:>12}{r['median_s']:>12.4f}{per:>14}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1k,10k,100k", help="comma list: 1k,10k,100k,1m,10m or bar counts")
+    ap.add_argument("--symbols", type=int, default=1, help="series for universe_features (1..1000)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--cases", default=None, help=f"comma list from {','.join(CASES)}")
+    ap.add_argument("--max-fit-rows", type=int, default=200_000)
+    ap.add_argument("--webhook-requests", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="benchmarks/results/latest.json")
+    ap.add_argument("--save-baseline", default=None, help="also write the results here")
+    ap.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    ap.add_argument("--min-delta", type=float, default=0.005, help="ignore slowdowns smaller than this (seconds)")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)  # the webhook handler logs every request at INFO
+    logging.getLogger("benchmarks").setLevel(logging.INFO)
+
+    results = run_suite(args.sizes.split(","), symbols=args.symbols, repeat=args.repeat,
+                        cases=args.cases.split(",") if args.cases else None, max_fit_rows=args.max_fit_rows,
+                        webhook_requests=args.webhook_requests, seed=args.seed)
+    report = {"env": environment(), "args": vars(args), "results": results}
+    for path in filter(None, [args.out, args.save_baseline]):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(report, indent=2))
+    print_results(results)
+
+    if args.compare:
+        rows = compare(results, json.loads(Path(args.compare).read_text()), args.tolerance, args.min_delta)
+        print(f"\n{'case':<28}{'size':>10}{'baseline s':>12}{'now s':>12}{'ratio':>8}")
+        for case, size, b, n, ratio, bad in rows:
+            print(f"{case:<28}{size:>10}{b:>12.4f}{n:>12.4f}{ratio:>8.2f}{'  REGRESSION' if bad else ''}")
+        if any(r[-1] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
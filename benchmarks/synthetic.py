@@ -0,0 +1,64 @@
+# benchmarks/synthetic.py
+"""
+Reproducible synthetic OHLCV for benchmarks (no network).
+- close follows a geometric Brownian motion sampled at the bar interval, with a weak
+  mean reversion towards the start price so very long series do not wander to absurd prices
+- each bar's open is the previous close plus a small gap; high/low add wicks drawn from
+  an exponential distribution scaled by the bar's volatility, so high >= max(open, close)
+  and low <= min(open, close) always hold
+- volume is lognormal with a U-shaped intraday profile and scales with the bar's move
+- the same (seed, symbol index) always gives the same series
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def parse_size(s) -> int:
+    """'100k' / '1m' / '2500' -> int"""
+    s = str(s).lower()
+    if s in SIZES:
+        return SIZES[s]
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1])
+    return int(float(s[:-1]) * mult) if mult else int(s)
+
+
+def gbm_ohlcv(n_bars: int, seed: int = 0, s0: float = 100.0, mu: float = 0.05, sigma: float = 0.25,
+              freq: str = "15min", start: str = "2015-01-01", bars_per_year: float = 252 * 26,
+              reversion: float = 0.5) -> pd.DataFrame:
+    """One symbol: DataFrame[open, high, low, close, volume] on a regular DatetimeIndex."""
+    rng = np.random.default_rng(seed)
+    dt = 1.0 / bars_per_year
+    # volatility clusters a little (slow random walk in log-vol) so wicks and volume vary
+    log_vol = np.cumsum(rng.normal(0.0, 0.02, n_bars))
+    log_vol -= np.linspace(0.0, log_vol[-1], n_bars) if n_bars > 1 else 0.0
+    vol = sigma * np.exp(np.clip(log_vol, -1.0, 1.0))
+    ret = (mu - 0.5 * vol ** 2) * dt + vol * np.sqrt(dt) * rng.standard_normal(n_bars)
+    # log price: GBM increments with a weak pull back towards log(s0) (half-life ~1.4 years),
+    # so bar-to-bar behaviour is GBM but multi-decade series stay in a sane price range
+    log_path = lfilter([1.0], [1.0, -(1.0 - reversion * dt)], ret)
+    close = s0 * np.exp(log_path)
+    bar_sd = vol * np.sqrt(dt) * close
+    gap = rng.normal(0.0, 0.1, n_bars) * bar_sd
+    open_ = np.empty(n_bars)
+    open_[0] = s0
+    open_[1:] = close[:-1] + gap[1:]
+    open_ = np.maximum(open_, 0.01)
+    high = np.maximum(open_, close) + rng.exponential(0.5, n_bars) * bar_sd
+    body_low = np.minimum(open_, close)
+    low = np.minimum(np.maximum(body_low - rng.exponential(0.5, n_bars) * bar_sd, 0.5 * body_low), body_low)
+    slot = np.arange(n_bars) % 26
+    intraday = 1.0 + 0.8 * ((slot - 12.5) / 12.5) ** 2
+    move = np.abs(close - open_) / np.maximum(bar_sd, 1e-12)
+    volume = np.round(rng.lognormal(10.0, 0.5, n_bars) * intraday * (1.0 + 0.3 * move))
+    index = pd.date_range(start, periods=n_bars, freq=freq, tz="UTC")
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close, "volume": volume}, index=index)
+
+
+def universe(n_symbols: int, n_bars: int, seed: int = 0, **kw):
+    """Yield (symbol, frame) for n_symbols independent series; generated lazily to bound memory."""
+    for i in range(n_symbols):
+        yield f"SYN{i:04d}", gbm_ohlcv(n_bars, seed=seed * 100_003 + i, s0=20.0 + 10.0 * (i % 50), **kw)
@@ -5,136 +5,137 @@ Detects single, double, and triple candlestick patterns.
 Works on any timeframe OHLCV data.
 """
 
+import math
+from typing import Tuple
+
+import numpy as np
 import pandas as pd
 
+# pattern columns in the order detect_patterns() adds them
+PATTERN_COLUMNS = [
+    "hammer", "inverted_hammer", "hanging_man", "shooting_star", "doji",
+    "dragonfly_doji", "gravestone_doji", "spinning_top", "marubozu_bull", "marubozu_bear",
+    "bull_engulf", "bear_engulf", "piercing", "dark_cloud", "tweezer_bottom", "tweezer_top",
+    "morning_star", "evening_star", "three_white_soldiers", "three_black_crows",
+    "three_inside_up", "three_inside_down",
+]
+# +1 bullish / -1 bearish contribution of each pattern to final_signal
+PATTERN_SIGNS = np.array([
+    1, 1, -1, -1, 1,
+    1, -1, 1, 1, -1,
+    1, -1, 1, -1, 1, -1,
+    1, -1, 1, -1,
+    1, -1,
+], dtype=np.int8)
+PATTERN_BITS = {name: 1 << i for i, name in enumerate(PATTERN_COLUMNS)}
+_PATTERN_INDEX = {name: i for i, name in enumerate(PATTERN_COLUMNS)}
+
+
+def _shifted(a: np.ndarray, n: int) -> np.ndarray:
+    # a.shift(n) for a float array: first n values are NaN, so comparisons on them are False
+    out = np.empty_like(a)
+    out[:n] = np.nan
+    if len(a) > n:
+        out[n:] = a[:-n]
+    return out
+
+
+def pattern_kernel(o, h, l, c) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized pattern engine on contiguous float64 arrays.
+    Returns (bits, final_signal):
+      bits: uint32 per bar, bit i set when PATTERN_COLUMNS[i] fired (see PATTERN_BITS)
+      final_signal: int8 per bar, signed sum of the fired patterns (PATTERN_SIGNS)
+    """
+    o, h, l, c = (np.ascontiguousarray(x, dtype=np.float64) for x in (o, h, l, c))
+    n = len(c)
+    bits = np.zeros(n, dtype=np.uint32)
+    signal = np.zeros(n, dtype=np.int8)
+
+    def put(name, mask):
+        i = _PATTERN_INDEX[name]
+        bits[...] |= mask.astype(np.uint32) << np.uint32(i)
+        if PATTERN_SIGNS[i] > 0:
+            np.add(signal, mask, out=signal, casting="unsafe")
+        else:
+            np.subtract(signal, mask, out=signal, casting="unsafe")
+
+    # every shifted view is built exactly once
+    o1, h1, l1, c1 = _shifted(o, 1), _shifted(h, 1), _shifted(l, 1), _shifted(c, 1)
+    o2, c2 = _shifted(o, 2), _shifted(c, 2)
+
+    body = np.abs(c - o)
+    body2 = 2 * body
+    top, bottom = np.maximum(c, o), np.minimum(c, o)
+    up, down = c > o, o > c
+    prev_up, prev_down = c1 > o1, c1 < o1
+    tol = 0.001 * c
+    is_doji = body <= tol
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # --------------- Single Candle Patterns ---------------
+        put("hammer", up & ((o - l) >= body2) & ((h - c) <= body))
+        put("inverted_hammer", up & ((h - c) >= body2) & ((o - l) <= body))
+        put("hanging_man", down & ((o - l) >= body2) & ((h - o) <= body))
+        put("shooting_star", down & ((h - o) >= body2) & ((c - l) <= body))
+        put("doji", is_doji)
+        put("dragonfly_doji", is_doji & ((h - top) <= tol) & ((bottom - l) >= body2))
+        put("gravestone_doji", is_doji & ((top - l) <= tol) & ((h - top) >= body2))
+        rng = 0.001 + h - l
+        put("spinning_top", ((h - l) > 3 * body) & ((c - l) / rng > 0.3) & ((h - c) / rng > 0.3))
+        put("marubozu_bull", up & (h == c) & (l == o))
+        put("marubozu_bear", down & (h == o) & (l == c))
+
+        # --------------- Double Candle Patterns ---------------
+        mid1 = (o1 + c1) / 2
+        put("bull_engulf", up & prev_down & (c > o1) & (o < c1))
+        put("bear_engulf", down & prev_up & (c < o1) & (o > c1))
+        put("piercing", up & prev_down & (c > mid1) & (o < c1))
+        put("dark_cloud", down & prev_up & (c < mid1) & (o > c1))
+        put("tweezer_bottom", up & prev_down & (np.abs(l - l1) <= 0.002 * l))
+        put("tweezer_top", down & prev_up & (np.abs(h - h1) <= 0.002 * h))
+
+        # --------------- Triple Candle Patterns ---------------
+        mid2 = (o2 + c2) / 2
+        small1 = np.abs(c1 - o1) <= 0.002 * c1
+        put("morning_star", (c2 < o2) & small1 & (c > mid2))
+        put("evening_star", (c2 > o2) & small1 & (c < mid2))
+        put("three_white_soldiers", up & prev_up & (c2 > o2) & (c > c1) & (c1 > c2))
+        put("three_black_crows", down & prev_down & (c2 < o2) & (c < c1) & (c1 < c2))
+        put("three_inside_up", prev_up & (o1 < c2) & (c1 > o2) & (c > c1))
+        put("three_inside_down", prev_down & (o1 > c2) & (c1 < o2) & (c < c1))
+
+    return bits, signal
+
+
+def detect_pattern_bits(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Compact output: (uint32 bitmask per bar, int8 final_signal per bar). No pandas frames are built."""
+    return pattern_kernel(df["open"].to_numpy(), df["high"].to_numpy(),
+                          df["low"].to_numpy(), df["close"].to_numpy())
+
+
+def patterns_frame(bits: np.ndarray, final_signal: np.ndarray = None, index=None) -> pd.DataFrame:
+    """Expand a bitmask into the signed int pattern columns (pandas view, built only on request)."""
+    cols = {}
+    for i, name in enumerate(PATTERN_COLUMNS):
+        cols[name] = ((bits >> np.uint32(i)) & np.uint32(1)).astype(np.int64) * int(PATTERN_SIGNS[i])
+    out = pd.DataFrame(cols, index=index)
+    if final_signal is not None:
+        out["final_signal"] = final_signal.astype(np.int64)
+    return out
+
 
 def detect_patterns(df: pd.DataFrame) -> pd.DataFrame:
     """
     Detect candlestick patterns.
     Input: DataFrame with ['open','high','low','close']
     Output: DataFrame with pattern columns + final signal
+    (runs pattern_kernel; use detect_pattern_bits() when the bitmask is enough)
     """
     df = df.copy()
-
-    o, h, l, c = df["open"], df["high"], df["low"], df["close"]
-
-    # --------------- Single Candle Patterns ---------------
-
-    # Hammer (bullish bottom reversal)
-    df["hammer"] = ((c > o) &
-                    ((o - l) >= 2 * abs(c - o)) &
-                    ((h - c) <= abs(c - o))).astype(int)
-
-    # Inverted Hammer (bullish bottom reversal)
-    df["inverted_hammer"] = ((c > o) &
-                             ((h - c) >= 2 * abs(c - o)) &
-                             ((o - l) <= abs(c - o))).astype(int)
-
-    # Hanging Man (bearish top reversal, same as hammer but after uptrend)
-    df["hanging_man"] = ((o > c) &
-                         ((o - l) >= 2 * abs(c - o)) &
-                         ((h - o) <= abs(c - o))).astype(int) * -1
-
-    # Shooting Star (bearish top reversal)
-    df["shooting_star"] = ((o > c) &
-                           ((h - o) >= 2 * abs(c - o)) &
-                           ((c - l) <= abs(c - o))).astype(int) * -1
-
-    # Doji (indecision)
-    df["doji"] = (abs(c - o) <= 0.001 * c).astype(int)
-
-    # Dragonfly Doji (bullish at support)
-    df["dragonfly_doji"] = ((abs(c - o) <= 0.001 * c) &
-                            ((h - max(c, o)) <= (c * 0.001)) &
-                            ((min(c, o) - l) >= (abs(c - o) * 2))).astype(int)
-
-    # Gravestone Doji (bearish at resistance)
-    df["gravestone_doji"] = ((abs(c - o) <= 0.001 * c) &
-                             ((max(c, o) - l) <= (c * 0.001)) &
-                             ((h - max(c, o)) >= (abs(c - o) * 2))).astype(int) * -1
-
-    # Spinning Top (indecision)
-    df["spinning_top"] = (((h - l) > 3 * abs(c - o)) &
-                          ((c - l) / (0.001 + h - l) > 0.3) &
-                          ((h - c) / (0.001 + h - l) > 0.3)).astype(int)
-
-    # Marubozu (strong trend candle, no wicks)
-    df["marubozu_bull"] = ((c > o) & ((h == c) & (l == o))).astype(int)
-    df["marubozu_bear"] = ((o > c) & ((h == o) & (l == c))).astype(int) * -1
-
-    # --------------- Double Candle Patterns ---------------
-
-    # Bullish Engulfing
-    df["bull_engulf"] = ((c > o) &
-                         (c.shift(1) < o.shift(1)) &
-                         (c > o.shift(1)) &
-                         (o < c.shift(1))).astype(int)
-
-    # Bearish Engulfing
-    df["bear_engulf"] = ((c < o) &
-                         (c.shift(1) > o.shift(1)) &
-                         (c < o.shift(1)) &
-                         (o > c.shift(1))).astype(int) * -1
-
-    # Piercing Pattern (bullish reversal)
-    df["piercing"] = ((c > o) &
-                      (c.shift(1) < o.shift(1)) &
-                      (c > (o.shift(1) + c.shift(1)) / 2) &
-                      (o < c.shift(1))).astype(int)
-
-    # Dark Cloud Cover (bearish reversal)
-    df["dark_cloud"] = ((c < o) &
-                        (c.shift(1) > o.shift(1)) &
-                        (c < (o.shift(1) + c.shift(1)) / 2) &
-                        (o > c.shift(1))).astype(int) * -1
-
-    # Tweezer Bottoms (bullish)
-    df["tweezer_bottom"] = ((c > o) &
-                            (c.shift(1) < o.shift(1)) &
-                            (abs(l - l.shift(1)) <= 0.002 * l)).astype(int)
-
-    # Tweezer Tops (bearish)
-    df["tweezer_top"] = ((c < o) &
-                         (c.shift(1) > o.shift(1)) &
-                         (abs(h - h.shift(1)) <= 0.002 * h)).astype(int) * -1
-
-    # --------------- Triple Candle Patterns ---------------
-
-    # Morning Star (bullish 3-candle reversal)
-    df["morning_star"] = ((c.shift(2) < o.shift(2)) &
-                          (abs(c.shift(1) - o.shift(1)) <= 0.002 * c.shift(1)) &
-                          (c > (o.shift(2) + c.shift(2)) / 2)).astype(int)
-
-    # Evening Star (bearish 3-candle reversal)
-    df["evening_star"] = ((c.shift(2) > o.shift(2)) &
-                          (abs(c.shift(1) - o.shift(1)) <= 0.002 * c.shift(1)) &
-                          (c < (o.shift(2) + c.shift(2)) / 2)).astype(int) * -1
-
-    # Three White Soldiers (bullish continuation)
-    df["three_white_soldiers"] = ((c > o) &
-                                  (c.shift(1) > o.shift(1)) &
-                                  (c.shift(2) > o.shift(2)) &
-                                  (c > c.shift(1)) &
-                                  (c.shift(1) > c.shift(2))).astype(int)
-
-    # Three Black Crows (bearish continuation)
-    df["three_black_crows"] = ((c < o) &
-                               (c.shift(1) < o.shift(1)) &
-                               (c.shift(2) < o.shift(2)) &
-                               (c < c.shift(1)) &
-                               (c.shift(1) < c.shift(2))).astype(int) * -1
-
-    # Three Inside Up (bullish reversal)
-    df["three_inside_up"] = ((c.shift(1) > o.shift(1)) &
-                             (o.shift(1) < c.shift(2)) &
-                             (c.shift(1) > o.shift(2)) &
-                             (c > c.shift(1))).astype(int)
-
-    # Three Inside Down (bearish reversal)
-    df["three_inside_down"] = ((c.shift(1) < o.shift(1)) &
-                               (o.shift(1) > c.shift(2)) &
-                               (c.shift(1) < o.shift(2)) &
-                               (c < c.shift(1))).astype(int) * -1
+    bits, _ = detect_pattern_bits(df)
+    for col, values in patterns_frame(bits, index=df.index).items():
+        df[col] = values
 
     # --------------- Final Signal ---------------
     pattern_cols = [col for col in df.columns if col not in ["open", "high", "low", "close", "volume"]]
@@ -143,6 +144,88 @@ def detect_patterns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _ratio_gt(num: float, den: float, bound: float) -> bool:
+    # num / den > bound with pandas' float semantics when den == 0 (inf / nan instead of raising)
+    if den != 0:
+        return num / den > bound
+    if num == 0 or math.isnan(num):
+        return False
+    return (num > 0) == (math.copysign(1.0, den) > 0)
+
+
+class PatternStream:
+    """
+    Incremental version of detect_patterns() for live bars.
+    Keeps the last three bars in a fixed ring buffer; update() is O(1) per bar and returns
+    (pattern values in PATTERN_COLUMNS order, final_signal), identical to the row
+    detect_patterns() would produce for that bar.
+    """
+
+    __slots__ = ("_o", "_h", "_l", "_c", "_head", "bars")
+
+    def __init__(self):
+        nan = float("nan")
+        # before two prior bars exist the shifted values are NaN, exactly like .shift()
+        self._o = [nan, nan, nan]
+        self._h = [nan, nan, nan]
+        self._l = [nan, nan, nan]
+        self._c = [nan, nan, nan]
+        self._head = 0
+        self.bars = 0
+
+    def seed(self, df: pd.DataFrame):
+        """Warm the ring buffer from history (only the last two bars matter)."""
+        for row in df[["open", "high", "low", "close"]].tail(2).itertuples(index=False):
+            self.update(*row)
+
+    def update(self, open_: float, high: float, low: float, close: float) -> Tuple[Tuple[int, ...], int]:
+        i = self._head
+        o = self._o[i] = float(open_)
+        h = self._h[i] = float(high)
+        l = self._l[i] = float(low)
+        c = self._c[i] = float(close)
+        j, k = (i - 1) % 3, (i - 2) % 3
+        o1, h1, l1, c1 = self._o[j], self._h[j], self._l[j], self._c[j]
+        o2, c2 = self._o[k], self._c[k]
+        self._head = (i + 1) % 3
+        self.bars += 1
+
+        body = abs(c - o)
+        top, bottom = (c if c > o else o), (c if c < o else o)
+        up, down = c > o, o > c
+        prev_up, prev_down = c1 > o1, c1 < o1
+        is_doji = body <= 0.001 * c
+        rng = 0.001 + h - l
+
+        values = (
+            int(up and (o - l) >= 2 * body and (h - c) <= body),
+            int(up and (h - c) >= 2 * body and (o - l) <= body),
+            -int(down and (o - l) >= 2 * body and (h - o) <= body),
+            -int(down and (h - o) >= 2 * body and (c - l) <= body),
+            int(is_doji),
+            int(is_doji and (h - top) <= c * 0.001 and (bottom - l) >= body * 2),
+            -int(is_doji and (top - l) <= c * 0.001 and (h - top) >= body * 2),
+            int((h - l) > 3 * body and _ratio_gt(c - l, rng, 0.3) and _ratio_gt(h - c, rng, 0.3)),
+            int(up and h == c and l == o),
+            -int(down and h == o and l == c),
+            # double
+            int(up and prev_down and c > o1 and o < c1),
+            -int(c < o and prev_up and c < o1 and o > c1),
+            int(up and prev_down and c > (o1 + c1) / 2 and o < c1),
+            -int(c < o and prev_up and c < (o1 + c1) / 2 and o > c1),
+            int(up and prev_down and abs(l - l1) <= 0.002 * l),
+            -int(c < o and prev_up and abs(h - h1) <= 0.002 * h),
+            # triple
+            int(c2 < o2 and abs(c1 - o1) <= 0.002 * c1 and c > (o2 + c2) / 2),
+            -int(c2 > o2 and abs(c1 - o1) <= 0.002 * c1 and c < (o2 + c2) / 2),
+            int(up and prev_up and c2 > o2 and c > c1 and c1 > c2),
+            -int(c < o and prev_down and c2 < o2 and c < c1 and c1 < c2),
+            int(prev_up and o1 < c2 and c1 > o2 and c > c1),
+            -int(prev_down and o1 > c2 and c1 < o2 and c < c1),
+        )
+        return values, sum(values)
+
+
 # ------------------ Example Usage ------------------
 if __name__ == "__main__":
     data = {
@@ -0,0 +1,252 @@
+# live/instrument_store.py
+"""
+Local, indexed copy of the Kite instrument master.
+- kite.instruments() is downloaded at most once per (IST) trading day and saved as column
+  arrays (.npy) under data/cache/instruments/<date>/; startup loads the newest copy from
+  disk without a network call
+- rows are sorted by (exchange, name, expiry, instrument_type, strike), so every option
+  chain is a contiguous, strike-sorted slice; lookups are dict hits + binary searches
+- the underlying is matched on the exact `name` field, so NIFTY does not match BANKNIFTY
+
+Usage:
+python -m live.instrument_store refresh
+python -m live.instrument_store chain NIFTY --spot 24850 --window 5
+"""
+
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.getenv("INSTRUMENT_STORE_DIR", "data/cache/instruments")
+IST = ZoneInfo("Asia/Kolkata")
+
+# column -> dtype of the saved array (strings are fixed-width unicode, so no pickling)
+_NUMERIC = {"instrument_token": np.int64, "exchange_token": np.int64, "strike": np.float64,
+            "tick_size": np.float64, "lot_size": np.int64, "last_price": np.float64}
+_TEXT = ["tradingsymbol", "name", "instrument_type", "segment", "exchange"]
+COLUMNS = list(_NUMERIC) + _TEXT + ["expiry"]
+
+
+def today_ist() -> dt.date:
+    return dt.datetime.now(IST).date()
+
+
+def _to_day(v) -> np.datetime64:
+    if v is None or v == "":
+        return np.datetime64("NaT", "D")
+    if isinstance(v, dt.datetime):
+        v = v.date()
+    return np.datetime64(v if isinstance(v, dt.date) else str(v)[:10], "D")
+
+
+class InstrumentStore:
+    def __init__(self, cols: dict, as_of: dt.date = None):
+        self.cols = cols
+        self.as_of = as_of
+        self._build_index()
+
+    # ---------- construction ----------
+    @classmethod
+    def from_records(cls, records, as_of: dt.date = None):
+        """Build from kite.instruments() output (list of dicts)."""
+        cols = {}
+        for c, dtype in _NUMERIC.items():
+            cols[c] = np.array([r.get(c) or 0 for r in records], dtype=dtype)
+        for c in _TEXT:
+            cols[c] = np.array([str(r.get(c) or "") for r in records], dtype=str)
+        cols["expiry"] = np.array([_to_day(r.get("expiry")) for r in records], dtype="datetime64[D]")
+        # NaT sorts last in numpy; instruments without an expiry end up after the dated ones
+        order = np.lexsort((cols["strike"], cols["instrument_type"], cols["expiry"], cols["name"], cols["exchange"]))
+        return cls({c: a[order] for c, a in cols.items()}, as_of=as_of or today_ist())
+
+    def _build_index(self):
+        ex, name, expiry, itype = self.cols["exchange"], self.cols["name"], self.cols["expiry"], self.cols["instrument_type"]
+        n = len(name)
+        self._symbol = {}   # "EXCH:TRADINGSYMBOL" -> row
+        self._expiries = {}  # (exchange, name) -> sorted array of option expiries
+        self._chains = {}    # (exchange, name, expiry, "CE"/"PE") -> (start, stop), strike-sorted
+        self._strikes = {}   # (exchange, name, expiry) -> unique sorted strikes
+        for i, (e, s) in enumerate(zip(ex, self.cols["tradingsymbol"])):
+            self._symbol[f"{e}:{s}"] = i
+        if n == 0:
+            return
+        # boundaries of runs of equal (exchange, name, expiry, type) in the sorted arrays
+        key_change = np.ones(n, dtype=bool)
+        key_change[1:] = ((ex[1:] != ex[:-1]) | (name[1:] != name[:-1]) |
+                          (expiry[1:] != expiry[:-1]) | (itype[1:] != itype[:-1]))
+        # NaT != NaT is True, so undated rows each form their own run; they are skipped below
+        starts = np.flatnonzero(key_change)
+        stops = np.r_[starts[1:], n]
+        for a, b in zip(starts, stops):
+            k = (str(ex[a]), str(name[a]))
+            t = str(itype[a])
+            if t not in ("CE", "PE") or np.isnat(expiry[a]):
+                continue
+            self._chains[k + (expiry[a], t)] = (int(a), int(b))
+        for (e, nm, exp, _t), (a, b) in self._chains.items():
+            key = (e, nm, exp)
+            prev = self._strikes.get(key)
+            s = self.cols["strike"][a:b]
+            self._strikes[key] = s if prev is None else np.union1d(prev, s)
+        for (e, nm, exp) in self._strikes:
+            self._expiries.setdefault((e, nm), set()).add(exp)
+        self._expiries = {k: np.array(sorted(v), dtype="datetime64[D]") for k, v in self._expiries.items()}
+        self._strikes = {k: np.unique(v) for k, v in self._strikes.items()}
+
+    def __len__(self):
+        return len(self.cols["tradingsymbol"])
+
+    # ---------- lookups ----------
+    def row(self, symbol: str, exchange: str = "NFO"):
+        """Row index of 'EXCH:TRADINGSYMBOL' (or a bare tradingsymbol on `exchange`), or None."""
+        return self._symbol.get(symbol if ":" in symbol else f"{exchange}:{symbol}")
+
+    def records(self, rows):
+        """Rows as kite-style dicts (expiry as datetime.date, or None)."""
+        out = []
+        for i in np.atleast_1d(rows):
+            rec = {c: self.cols[c][i].item() for c in _NUMERIC}
+            rec.update({c: str(self.cols[c][i]) for c in _TEXT})
+            e = self.cols["expiry"][i]
+            rec["expiry"] = None if np.isnat(e) else e.astype(dt.date)
+            out.append(rec)
+        return out
+
+    def expiries(self, underlying: str, exchange: str = "NFO"):
+        return self._expiries.get((exchange, underlying.upper()), np.array([], dtype="datetime64[D]"))
+
+    def nearest_expiry(self, underlying: str, exchange: str = "NFO", on: dt.date = None):
+        exps = self.expiries(underlying, exchange)
+        i = np.searchsorted(exps, np.datetime64(on or today_ist(), "D"))
+        return exps[i] if i < len(exps) else None
+
+    def strikes(self, underlying: str, expiry, exchange: str = "NFO"):
+        return self._strikes.get((exchange, underlying.upper(), _to_day(expiry)), np.array([]))
+
+    def atm_strike(self, underlying: str, expiry, spot: float, exchange: str = "NFO"):
+        s = self.strikes(underlying, expiry, exchange)
+        if len(s) == 0:
+            return None
+        i = int(np.searchsorted(s, spot))
+        if i == len(s) or (i > 0 and spot - s[i - 1] <= s[i] - spot):
+            i -= 1
+        return float(s[i])
+
+    def option_chain(self, underlying: str, expiry=None, spot: float = None, strike_window: int = None,
+                     exchange: str = "NFO", types=("CE", "PE")):
+        """
+        Row indices of the option chain, strike-sorted within each type.
+        expiry: date / 'YYYY-MM-DD' / None (= nearest expiry from today).
+        spot + strike_window: keep only strikes within ATM +- strike_window steps.
+        """
+        name = underlying.upper()
+        exp = _to_day(expiry) if expiry is not None else self.nearest_expiry(name, exchange)
+        if exp is None:
+            return np.array([], dtype=np.int64)
+        lo_k, hi_k = -np.inf, np.inf
+        if spot is not None and strike_window is not None:
+            s = self.strikes(name, exp, exchange)
+            if len(s):
+                atm = int(np.searchsorted(s, self.atm_strike(name, exp, spot, exchange)))
+                lo_k = s[max(0, atm - strike_window)]
+                hi_k = s[min(len(s) - 1, atm + strike_window)]
+        parts = []
+        for t in types:
+            span = self._chains.get((exchange, name, exp, t))
+            if span is None:
+                continue
+            a, b = span
+            strikes = self.cols["strike"][a:b]
+            i0 = a + int(np.searchsorted(strikes, lo_k, side="left"))
+            i1 = a + int(np.searchsorted(strikes, hi_k, side="right"))
+            parts.append(np.arange(i0, i1))
+        return np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+
+    # ---------- persistence ----------
+    def save(self, root: str = DEFAULT_ROOT, keep: int = 5):
+        root = Path(root)
+        final = root / str(self.as_of)
+        tmp = root / f".{self.as_of}.tmp-{os.getpid()}"
+        tmp.mkdir(parents=True, exist_ok=True)
+        for c, a in self.cols.items():
+            np.save(tmp / f"{c}.npy", a)
+        (tmp / "meta.json").write_text(json.dumps({"as_of": str(self.as_of), "rows": len(self)}))
+        if final.exists():
+            shutil.rmtree(final)
+        os.replace(tmp, final)
+        for old in sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))[:-keep]:
+            shutil.rmtree(old, ignore_errors=True)
+        return final
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        cols = {c: np.load(path / f"{c}.npy") for c in COLUMNS}
+        return cls(cols, as_of=dt.date.fromisoformat(meta["as_of"]))
+
+    @classmethod
+    def latest(cls, root: str = DEFAULT_ROOT):
+        """Newest saved copy, or None."""
+        root = Path(root)
+        if not root.exists():
+            return None
+        days = sorted(p for p in root.iterdir() if p.is_dir() and (p / "meta.json").exists() and not p.name.startswith("."))
+        return cls.load(days[-1]) if days else None
+
+    @classmethod
+    def load_or_refresh(cls, kite=None, root: str = DEFAULT_ROOT, force: bool = False):
+        """
+        Today's copy from disk if present; otherwise download (when a kite client is given)
+        and save. Falls back to the newest stale copy if the download is not possible.
+        """
+        store = None if force else cls.latest(root)
+        if store is not None and store.as_of >= today_ist():
+            return store
+        if kite is not None:
+            try:
+                logger.info("Downloading instrument master...")
+                fresh = cls.from_records(kite.instruments())
+                fresh.save(root)
+                return fresh
+            except Exception as e:
+                logger.warning("Instrument download failed: %s", e)
+        if store is not None:
+            logger.warning("Using instrument master from %s", store.as_of)
+            return store
+        raise FileNotFoundError(f"no instrument master in {root} and no kite client to download one")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=DEFAULT_ROOT)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("refresh")
+    p_chain = sub.add_parser("chain")
+    p_chain.add_argument("underlying")
+    p_chain.add_argument("--expiry", default=None)
+    p_chain.add_argument("--spot", type=float, default=None)
+    p_chain.add_argument("--window", type=int, default=None)
+    p_chain.add_argument("--exchange", default="NFO")
+    args = ap.parse_args()
+
+    if args.cmd == "refresh":
+        from live.kite_option_chain import KiteHelper
+        kh = KiteHelper()
+        store = InstrumentStore.load_or_refresh(kh.kite, args.root, force=True)
+        print("Instruments:", len(store), "as of", store.as_of)
+    else:
+        store = InstrumentStore.load_or_refresh(None, args.root)
+        rows = store.option_chain(args.underlying, args.expiry, args.spot, args.window, args.exchange)
+        for r in store.records(rows):
+            print(r["tradingsymbol"], r["expiry"], r["instrument_type"], r["strike"], r["lot_size"])
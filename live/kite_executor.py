@@ -2,16 +2,29 @@
 """
 Wrapper for Zerodha KiteConnect. NOTE: store secrets outside source control.
 You must pip install kiteconnect and provide api_key/access_token in secrets.
+
+CoalescingExecutor can sit in front of it: signals for the same symbol that arrive within
+a short window are netted (BUY +qty, SELL -qty) and only the residual quantity is sent from a
+timer thread, without holding up the caller for the window.
 """
 from kiteconnect import KiteConnect
 import yaml
 import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from metrics import inc, span
 
 logger = logging.getLogger(__name__)
 
 class KiteExecutor:
-    def __init__(self, cfg):
+    def __init__(self, cfg, kite=None):
+        """kite: an already configured client (e.g. replay_provider.ReplayProvider) instead of the keys in cfg"""
         self.cfg = cfg
+        if kite is not None:
+            self.kite = kite
+            return
         kc_cfg = cfg.get("zerodha", {})
         api_key = kc_cfg.get("api_key")
         access_token = kc_cfg.get("access_token")
@@ -22,26 +35,115 @@ class KiteExecutor:
         self.kite = KiteConnect(api_key=api_key)
         self.kite.set_access_token(access_token)
 
-    def place_order(self, symbol, side, size_pct=1.0):
+    def place_order(self, symbol, side, size_pct=1.0, signal_id=None, qty=None):
         """
-        Very simple: calculates quantity from size_pct of account. For demo only.
+        Very simple: sends `qty` shares, or 1 when the signal carries no qty. For demo only.
         You must implement proper qty calculation, instrument token lookup, error handling.
         """
+        quantity = int(qty) if qty else 1
         if not self.kite:
-            logger.info(f"PAPER: would {side} {symbol} size_pct={size_pct}")
-            return {"paper": True, "action": side, "symbol": symbol}
+            logger.info(f"PAPER: would {side} {quantity} {symbol} size_pct={size_pct} signal={signal_id}")
+            return {"paper": True, "action": side, "symbol": symbol, "qty": quantity}
         # TODO: look up margin / balance to translate size_pct -> qty
         try:
             # This is a placeholder. You need to find instrument_token or tradingsymbol etc.
-            order = self.kite.place_order(
-                tradingsymbol=symbol,
-                exchange="NSE",
-                transaction_type="BUY" if side=="BUY" else "SELL",
-                quantity=1,
-                order_type="MARKET",
-                product="MIS"
-            )
+            with span("place_order", broker="kite"):
+                order = self.kite.place_order(
+                    tradingsymbol=symbol,
+                    exchange="NSE",
+                    transaction_type="BUY" if side=="BUY" else "SELL",
+                    quantity=quantity,
+                    order_type="MARKET",
+                    product="MIS"
+                )
             return order
         except Exception as e:
             logger.exception("Order failed")
+            inc("order_errors_total", broker="kite")
             return {"error": str(e)}
+
+
+class _Batch:
+    def __init__(self):
+        self.signals = []  # (signal_id, side, size_pct, qty)
+        self.futures = []  # one Future per signal, resolved with the batch record
+
+
+class CoalescingExecutor:
+    """
+    Nets signals per symbol over `window_s` before calling executor.place_order().
+    The first signal for a symbol opens a batch and arms a timer for the window; later
+    signals join it. When the timer fires, one order is sent for the net quantity (or none if
+    the signals cancel out) and every signal in the batch resolves to the same record,
+    including the ids of the signals that order satisfied.
+    A signal without a qty counts as the 1 share KiteExecutor would have sent for it alone;
+    size_pct is netted alongside for the record but does not size the order.
+    place_order_async() returns a Future right away, so no caller waits out the window;
+    place_order() is the blocking form for callers that want the record back.
+    """
+
+    def __init__(self, executor, window_s=0.25, keep_history=1000):
+        self.executor = executor
+        self.window_s = window_s
+        self._batches = {}  # symbol -> open _Batch
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.history = deque(maxlen=keep_history)  # one record per flushed batch
+
+    def place_order_async(self, symbol, side, size_pct=1.0, signal_id=None, qty=None):
+        """Add the signal to the symbol's open batch; the Future resolves when the batch is flushed."""
+        side = side.upper()
+        if side not in ("BUY", "SELL"):
+            raise ValueError(f"unknown side {side}")
+        fut = Future()
+        with self._lock:
+            if signal_id is None:
+                self._seq += 1
+                signal_id = f"auto-{self._seq}"
+            batch = self._batches.get(symbol)
+            if batch is None:
+                batch = self._batches[symbol] = _Batch()
+                timer = threading.Timer(self.window_s, self._flush_batch, args=(symbol, batch))
+                timer.daemon = True
+                timer.start()
+            batch.signals.append((signal_id, side, float(size_pct), float(qty) if qty else 1.0))
+            batch.futures.append(fut)
+        return fut
+
+    def place_order(self, symbol, side, size_pct=1.0, signal_id=None, qty=None):
+        return self.place_order_async(symbol, side, size_pct, signal_id, qty).result()
+
+    def _flush_batch(self, symbol, batch):
+        with self._lock:
+            if self._batches.get(symbol) is batch:
+                del self._batches[symbol]
+        rec = self._flush(symbol, batch.signals)
+        for fut in batch.futures:
+            fut.set_result(rec)
+
+    def _flush(self, symbol, signals):
+        net = round(sum(q if side == "BUY" else -q for _, side, _, q in signals), 9)
+        net_pct = round(sum(s if side == "BUY" else -s for _, side, s, _ in signals), 9)
+        ids = [sid for sid, _, _, _ in signals]
+        rec = {"symbol": symbol, "signals": ids, "net_qty": abs(net), "net_size_pct": abs(net_pct),
+               "net_side": "BUY" if net > 0 else "SELL" if net < 0 else None}
+        if net == 0:
+            rec["status"] = "netted_out"
+            rec["broker_result"] = None
+            logger.info("Coalesced %d signals for %s: netted out, no order", len(ids), symbol)
+        else:
+            try:
+                res = self.executor.place_order(symbol, rec["net_side"], abs(net_pct), signal_id=",".join(ids),
+                                                qty=abs(net))
+            except Exception as e:
+                logger.exception("Coalesced order for %s failed", symbol)
+                res = {"error": str(e)}
+            rec["broker_result"] = res
+            if isinstance(res, dict) and "error" in res:
+                rec["status"] = "failed"
+                rec["error"] = res["error"]
+            else:
+                rec["status"] = "placed"
+            logger.info("Coalesced %d signals for %s into %s %g", len(ids), symbol, rec["net_side"], abs(net))
+        self.history.append(rec)
+        return rec
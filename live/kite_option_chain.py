@@ -2,6 +2,7 @@
 """
 Kite Connect example:
 - list instruments (large CSV) and filter option chain for an underlying
+  (via the indexed, daily-cached instrument master in live/instrument_store.py)
 - fetch LTP/quotes for option instruments
 - simple place_order example (paper/demo if no keys provided)
 
@@ -11,14 +12,35 @@ pip install kiteconnect
 
 import os
 import logging
+import time
 from kiteconnect import KiteConnect
-from typing import List, Dict
+from typing import List
+from live.instrument_store import InstrumentStore, today_ist
+from live.option_chain_snapshot import LTP_BATCH, fetch_batched
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# index underlyings whose spot quote is not "NSE:<name>"
+INDEX_SPOT_SYMBOLS = {
+    "NIFTY": "NSE:NIFTY 50",
+    "BANKNIFTY": "NSE:NIFTY BANK",
+    "FINNIFTY": "NSE:NIFTY FIN SERVICE",
+    "MIDCPNIFTY": "NSE:NIFTY MID SELECT",
+    "SENSEX": "BSE:SENSEX",
+}
+
 class KiteHelper:
-    def __init__(self, api_key=None, access_token=None):
+    # while only a stale instrument master is available, retry the download at most this often
+    INSTRUMENT_RETRY_S = 300.0
+
+    def __init__(self, api_key=None, access_token=None, kite=None):
+        self._store = None
+        self._store_retry_at = 0.0  # time.monotonic() before which a stale store is not re-downloaded
+        if kite is not None:
+            # injected client, e.g. replay_provider.ReplayProvider for offline runs
+            self.kite = kite
+            return
         api_key = api_key or os.getenv("KITE_API_KEY")
         access_token = access_token or os.getenv("KITE_ACCESS_TOKEN")
         if not api_key:
@@ -40,38 +62,64 @@ class KiteHelper:
         instruments = self.kite.instruments()  # returns list of dicts
         return instruments
 
-    def filter_option_chain(self, instruments: List[Dict], underlying: str, expiry: str = None, strike_window: int = 10):
+    def instrument_store(self, refresh: bool = False) -> InstrumentStore:
+        """
+        Indexed instrument master: today's copy from disk, downloaded at most once a day.
+        If the download fails, the stale copy is served and retried every INSTRUMENT_RETRY_S.
+        """
+        stale = self._store is not None and self._store.as_of < today_ist()
+        if self._store is None or refresh or (stale and time.monotonic() >= self._store_retry_at):
+            self._store = InstrumentStore.load_or_refresh(self.kite, force=refresh)
+            if self._store.as_of < today_ist():
+                self._store_retry_at = time.monotonic() + self.INSTRUMENT_RETRY_S
+        return self._store
+
+    def underlying_spot(self, underlying: str):
+        """Last price of the underlying (index or stock), or None in paper mode."""
+        if not self.kite:
+            return None
+        sym = INDEX_SPOT_SYMBOLS.get(underlying.upper(), f"NSE:{underlying.upper()}")
+        try:
+            return float(self.kite.ltp([sym])[sym]["last_price"])
+        except Exception as e:
+            logger.warning("Could not fetch spot for %s: %s", underlying, e)
+            return None
+
+    def filter_option_chain(self, instruments=None, underlying: str = "NIFTY", expiry: str = None,
+                            strike_window: int = None, spot: float = None, exchange: str = "NFO"):
         """
-        Filter instrument list to option contracts for an underlying.
+        Option contracts for an underlying (exact match on the instrument `name`).
+        instruments: an InstrumentStore, a kite.instruments() list, or None (= instrument_store())
         underlying: e.g., 'RELIANCE' or 'NIFTY'
-        expiry: exact date string '2025-09-25' or None to include all
-        strike_window: number of strikes around ATM to return (requires you compute/choose ATM)
-        Returns list of instrument dicts matching underlying.
+        expiry: date string '2025-09-25', or None for the nearest expiry
+        strike_window: strikes on each side of ATM to return; ATM is taken from `spot`
+          (fetched from Kite when not given). None (default) returns every strike.
+        Returns list of instrument dicts, CE then PE, each sorted by strike.
         """
-        res = []
-        for inst in instruments:
-            try:
-                tradingsymbol = inst.get("tradingsymbol", "")
-                instrument_type = inst.get("instrument_type", "")
-                name = inst.get("name", "")  # underlying name
-                if underlying.upper() in tradingsymbol and instrument_type in ("CE", "PE"):
-                    if expiry and expiry not in tradingsymbol:
-                        continue
-                    res.append(inst)
-            except Exception:
-                continue
-        return res
+        if isinstance(instruments, InstrumentStore):
+            store = instruments
+        elif instruments is not None:
+            store = InstrumentStore.from_records(instruments)
+        else:
+            store = self.instrument_store()
+        if strike_window is not None and spot is None:
+            spot = self.underlying_spot(underlying)
+            if spot is None:
+                logger.warning("No spot price for %s, returning all strikes", underlying)
+        rows = store.option_chain(underlying, expiry, spot, strike_window if spot is not None else None, exchange)
+        return store.records(rows)
 
     def fetch_quotes(self, tradingsymbols: List[str]):
         """
         Fetch quote/LTP for a list of tradingsymbols using kite.ltp
         tradingsymbols e.g. ['NSE:RELIANCE21SEP4200CE', ...]
+        Long lists are split into kite.ltp-sized batches and fetched concurrently.
+        For a full chain with IV/greeks use live/option_chain_snapshot.py.
         """
         if not self.kite:
             logger.info("PAPER: Would fetch quotes for: %s", tradingsymbols)
             return {}
-        q = self.kite.ltp(tradingsymbols)
-        return q
+        return fetch_batched(self.kite.ltp, tradingsymbols, batch_size=LTP_BATCH, bucket="kite:ltp")
 
     def place_order(self, tradingsymbol: str, side: str = "BUY", qty: int = 1, product="MIS", order_type="MARKET"):
         """
@@ -99,9 +147,9 @@ if __name__ == "__main__":
     # Make sure to export KITE_API_KEY and KITE_ACCESS_TOKEN in env for live usage
     kh = KiteHelper()
     if kh.kite:
-        instruments = kh.load_instruments()
-        print("Total instruments:", len(instruments))
-        chain = kh.filter_option_chain(instruments, underlying="RELIANCE")
+        store = kh.instrument_store()
+        print("Total instruments:", len(store))
+        chain = kh.filter_option_chain(store, underlying="RELIANCE", strike_window=5)
         print("Found option instruments:", len(chain))
         # pick first 5 tradingsymbols to fetch quotes
         syms = [i["tradingsymbol"] for i in chain[:5]]
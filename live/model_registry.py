@@ -0,0 +1,188 @@
+# live/model_registry.py
+"""
+Versioned model registry with hot-swap for the live server.
+- each version is a flat forest directory (scripts/flat_forest.py) + meta.json
+- manifest.json lists versions and the active one; it is replaced atomically
+- ModelHandle keeps the active model in memory (memory-mapped arrays) and swaps to a new
+  version by a single reference assignment, so in-flight requests keep the model they started with
+
+Usage:
+python -m live.model_registry publish models/rf_model.pkl --activate --note "retrain 2025-09"
+python -m live.model_registry ls
+python -m live.model_registry activate v0002
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from scripts.flat_forest import FlatForest, export_flat
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY = "models/registry"
+
+
+class ModelRegistry:
+    def __init__(self, root: str = DEFAULT_REGISTRY):
+        self.root = Path(root)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / "manifest.json"
+
+    def manifest(self) -> dict:
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except FileNotFoundError:
+            return {"active": None, "versions": []}
+
+    def _write_manifest(self, manifest: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".manifest.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, self.manifest_path)
+
+    def active_version(self):
+        return self.manifest().get("active")
+
+    def publish(self, model, note: str = "", activate: bool = False) -> str:
+        """Compile a fitted pipeline into a new version directory. Returns the version name."""
+        manifest = self.manifest()
+        version = f"v{len(manifest['versions']) + 1:04d}"
+        while (self.root / version).exists():
+            version = f"v{int(version[1:]) + 1:04d}"
+        tmp = self.root / f".{version}.tmp"
+        export_flat(model, tmp)
+        info = {"version": version, "created": time.time(), "note": note,
+                "features": list(getattr(model, "feature_names_in_", []))}
+        (tmp / "version.json").write_text(json.dumps(info))
+        os.replace(tmp, self.root / version)
+        manifest = self.manifest()
+        manifest["versions"].append(info)
+        if activate or manifest.get("active") is None:
+            manifest["active"] = version
+        self._write_manifest(manifest)
+        logger.info("Published model %s%s", version, " (active)" if manifest["active"] == version else "")
+        return version
+
+    def activate(self, version: str):
+        manifest = self.manifest()
+        if version not in [v["version"] for v in manifest["versions"]]:
+            raise KeyError(f"unknown model version {version}")
+        manifest["active"] = version
+        self._write_manifest(manifest)
+
+    def load(self, version: str = None) -> FlatForest:
+        version = version or self.active_version()
+        if version is None:
+            raise FileNotFoundError(f"no active model in {self.root}")
+        return FlatForest.load(self.root / version, mmap=True)
+
+    def info(self, version: str) -> dict:
+        for v in self.manifest()["versions"]:
+            if v["version"] == version:
+                return v
+        return {}
+
+
+class ModelHandle:
+    """
+    Holds (version, model) for the server. get() is lock-free; swap() loads the new version
+    fully before publishing it, so requests never see a half-loaded model.
+    """
+
+    def __init__(self, registry: ModelRegistry):
+        self.registry = registry
+        self._current = (None, None)
+        self._swap_lock = threading.Lock()
+        self._watcher = None
+
+    def get(self):
+        return self._current
+
+    @property
+    def ready(self) -> bool:
+        return self._current[1] is not None
+
+    def swap(self, version: str = None) -> str:
+        with self._swap_lock:
+            version = version or self.registry.active_version()
+            if version is None:
+                raise FileNotFoundError(f"no active model in {self.registry.root}")
+            if version == self._current[0]:
+                return version
+            self._publish(version, self._load(version))
+            return version
+
+    def activate(self, version: str) -> str:
+        """
+        Load `version`, record it as active in the manifest, then put it live. The manifest is
+        only written once the model loaded, so a bad version never becomes the active one.
+        """
+        with self._swap_lock:
+            if not self.registry.info(version):
+                raise KeyError(f"unknown model version {version}")
+            model = self._load(version) if version != self._current[0] else self._current[1]
+            # manifest before _current: a watcher that sees the new active version finds it live
+            self.registry.activate(version)
+            self._publish(version, model)
+            return version
+
+    def _load(self, version: str) -> FlatForest:
+        model = self.registry.load(version)
+        # warm up: touch every array once so the first request does not pay for page faults
+        model.predict(model.mean.reshape(1, -1))
+        return model
+
+    def _publish(self, version: str, model: FlatForest):
+        if version != self._current[0]:
+            self._current = (version, model)
+            logger.info("Model %s is now live", version)
+
+    def watch(self, interval: float = 5.0):
+        """Poll the manifest and hot-swap when the active version changes."""
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    active = self.registry.active_version()
+                    if active and active != self._current[0]:
+                        self.swap(active)
+                except Exception:
+                    logger.exception("Model watcher failed")
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=_loop, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=DEFAULT_REGISTRY)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_pub = sub.add_parser("publish")
+    p_pub.add_argument("model_path")
+    p_pub.add_argument("--note", default="")
+    p_pub.add_argument("--activate", action="store_true")
+    sub.add_parser("ls")
+    p_act = sub.add_parser("activate")
+    p_act.add_argument("version")
+    args = ap.parse_args()
+
+    reg = ModelRegistry(args.root)
+    if args.cmd == "publish":
+        from scripts.model import load_model
+        print(reg.publish(load_model(args.model_path), note=args.note, activate=args.activate))
+    elif args.cmd == "ls":
+        m = reg.manifest()
+        for v in m["versions"]:
+            mark = "*" if v["version"] == m["active"] else " "
+            print(mark, v["version"], time.strftime("%Y-%m-%d %H:%M", time.localtime(v["created"])), v.get("note", ""))
+    elif args.cmd == "activate":
+        reg.activate(args.version)
+        print("Active:", args.version)
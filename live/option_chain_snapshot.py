@@ -0,0 +1,331 @@
+# live/option_chain_snapshot.py
+"""
+Option-chain snapshots: batched concurrent quotes + vectorized Black-Scholes IV and Greeks.
+- the chain comes from the instrument store (live/instrument_store.py)
+- quote requests are split into API-sized batches (kite.quote: 500 instruments) and fetched
+  from a small thread pool, each call going through the "kite:quote" token bucket
+- IV is solved for every contract at once: Newton steps on the whole array, with a
+  vectorized bisection for the few contracts where Newton does not converge
+- the result is one long table (strike, type, quote fields, iv, greeks); chain_wide()
+  pivots it to strike x CE/PE
+
+Usage:
+python -m live.option_chain_snapshot NIFTY --window 20
+python -m live.option_chain_snapshot bench            # full synthetic NIFTY chain against a stub client
+"""
+
+import argparse
+import datetime as dt
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from live.instrument_store import IST, InstrumentStore
+from rate_limit import get_bucket
+
+logger = logging.getLogger(__name__)
+
+QUOTE_BATCH = 500      # kite.quote() instruments per request
+LTP_BATCH = 1000       # kite.ltp() instruments per request
+EXPIRY_TIME = dt.time(15, 30)  # NSE F&O expiry, IST
+_SQRT_2PI = np.sqrt(2.0 * np.pi)
+
+
+# ---------------- Black-Scholes (vectorized) ----------------
+def _d1_d2(S, K, T, r, q, sigma):
+    vol_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / vol_t
+    return d1, d1 - vol_t
+
+
+def bs_price(S, K, T, r, sigma, is_call, q=0.0):
+    S, K, T, sigma = (np.asarray(a, dtype=np.float64) for a in (S, K, T, sigma))
+    d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+    df_r, df_q = np.exp(-r * T), np.exp(-q * T)
+    call = S * df_q * ndtr(d1) - K * df_r * ndtr(d2)
+    put = K * df_r * ndtr(-d2) - S * df_q * ndtr(-d1)
+    return np.where(is_call, call, put)
+
+
+def bs_greeks(S, K, T, r, sigma, is_call, q=0.0):
+    """dict of delta, gamma, vega (per 1.00 vol), theta (per year), rho arrays."""
+    S, K, T, sigma = (np.asarray(a, dtype=np.float64) for a in (S, K, T, sigma))
+    d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+    df_r, df_q = np.exp(-r * T), np.exp(-q * T)
+    pdf = np.exp(-0.5 * d1 * d1) / _SQRT_2PI
+    sqrt_t = np.sqrt(T)
+    gamma = df_q * pdf / (S * sigma * sqrt_t)
+    vega = S * df_q * pdf * sqrt_t
+    decay = -S * df_q * pdf * sigma / (2 * sqrt_t)
+    theta_call = decay - r * K * df_r * ndtr(d2) + q * S * df_q * ndtr(d1)
+    theta_put = decay + r * K * df_r * ndtr(-d2) - q * S * df_q * ndtr(-d1)
+    return {
+        "delta": np.where(is_call, df_q * ndtr(d1), -df_q * ndtr(-d1)),
+        "gamma": gamma,
+        "vega": vega,
+        "theta": np.where(is_call, theta_call, theta_put),
+        "rho": np.where(is_call, K * T * df_r * ndtr(d2), -K * T * df_r * ndtr(-d2)),
+    }
+
+
+def implied_vol(price, S, K, T, r, is_call, q=0.0, tol=1e-8, max_iter=50, lo=1e-4, hi=5.0):
+    """
+    IV for every contract at once. NaN where the price is outside the no-arbitrage bounds
+    or T <= 0. Newton from the Brenner-Subrahmanyam guess; bisection for the leftovers.
+    """
+    price, S, K, T = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (price, S, K, T)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    df_r, df_q = np.exp(-r * T), np.exp(-q * T)
+    intrinsic = np.where(is_call, np.maximum(S * df_q - K * df_r, 0.0), np.maximum(K * df_r - S * df_q, 0.0))
+    upper = np.where(is_call, S * df_q, K * df_r)
+    ok = (T > 0) & np.isfinite(price) & (price > intrinsic) & (price < upper)
+    iv = np.full(price.shape, np.nan)
+    if not ok.any():
+        return iv
+
+    p, s, k, t, c = price[ok], S[ok], K[ok], T[ok], is_call[ok]
+    sigma = np.clip(np.sqrt(2 * np.pi / t) * p / s, 0.05, 2.0)
+    done = np.zeros(p.shape, dtype=bool)
+    active = np.arange(p.size)
+    for _ in range(max_iter):
+        a = active
+        d1, _ = _d1_d2(s[a], k[a], t[a], r, q, sigma[a])
+        vega = s[a] * np.exp(-q * t[a]) * np.exp(-0.5 * d1 * d1) / _SQRT_2PI * np.sqrt(t[a])
+        diff = bs_price(s[a], k[a], t[a], r, sigma[a], c[a], q) - p[a]
+        step = diff / np.where(vega > 1e-12, vega, np.nan)
+        new = sigma[a] - step
+        good = np.isfinite(new) & (new > lo) & (new < hi)
+        sigma[a] = np.where(good, new, sigma[a])
+        conv = good & (np.abs(step) < tol)
+        done[a[conv]] = True
+        # contracts whose Newton step left the bracket go to bisection
+        active = a[good & ~conv]
+        if active.size == 0:
+            break
+
+    rest = np.flatnonzero(~done)
+    if rest.size:
+        a_lo = np.full(rest.size, lo)
+        a_hi = np.full(rest.size, hi)
+        for _ in range(100):
+            mid = 0.5 * (a_lo + a_hi)
+            above = bs_price(s[rest], k[rest], t[rest], r, mid, c[rest], q) > p[rest]
+            a_hi = np.where(above, mid, a_hi)
+            a_lo = np.where(above, a_lo, mid)
+            if np.max(a_hi - a_lo) < tol:
+                break
+        sigma[rest] = 0.5 * (a_lo + a_hi)
+    iv[ok] = sigma
+    return iv
+
+
+def year_fraction(expiry, now: dt.datetime = None) -> np.ndarray:
+    """Years from `now` (naive = IST wall clock) to 15:30 IST on each expiry date (datetime64[D] array)."""
+    now = now or dt.datetime.now(IST)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=IST)
+    now_ns = np.datetime64(now.astimezone(dt.timezone.utc).replace(tzinfo=None), "ns")
+    close = np.asarray(expiry, dtype="datetime64[D]").astype("datetime64[ns]") + np.timedelta64(
+        (EXPIRY_TIME.hour * 60 + EXPIRY_TIME.minute) * 60 - 5 * 3600 - 1800, "s")  # 15:30 IST in UTC
+    return (close - now_ns).astype(np.float64) / (365.0 * 86400e9)
+
+
+# ---------------- batched quotes ----------------
+def fetch_batched(call, keys, batch_size=QUOTE_BATCH, max_workers=4, bucket="kite:quote"):
+    """
+    call(list_of_keys) -> dict, e.g. kite.quote / kite.ltp. Splits keys into batches, runs them
+    concurrently (rate-limited by the named token bucket, None = unlimited) and merges the dicts.
+    """
+    keys = list(keys)
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+    limiter = get_bucket(bucket) if bucket else None
+
+    def _one(batch):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return call(batch) or {}
+        except Exception as e:
+            logger.warning("Quote batch of %d failed: %s", len(batch), e)
+            return {}
+
+    out = {}
+    if len(batches) <= 1:
+        for b in batches:
+            out.update(_one(b))
+        return out
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        for res in pool.map(_one, batches):
+            out.update(res)
+    return out
+
+
+def _best(depth, side):
+    try:
+        return float(depth[side][0]["price"])
+    except (KeyError, IndexError, TypeError):
+        return np.nan
+
+
+# ---------------- snapshot ----------------
+class OptionChainSnapshot:
+    def __init__(self, kite, store: InstrumentStore, rate: float = 0.065, div_yield: float = 0.0,
+                 batch_size: int = QUOTE_BATCH, max_workers: int = 4, bucket="kite:quote"):
+        self.kite = kite
+        self.store = store
+        self.rate = rate
+        self.div_yield = div_yield
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.bucket = bucket
+
+    def snapshot(self, underlying: str, expiry=None, spot: float = None, strike_window: int = None,
+                 spot_symbol: str = None, exchange: str = "NFO", now: dt.datetime = None) -> pd.DataFrame:
+        """
+        Long table: one row per contract with quote fields, iv and greeks.
+        expiry=None -> nearest expiry; expiry="all" -> every listed expiry.
+        """
+        from live.kite_option_chain import INDEX_SPOT_SYMBOLS
+        name = underlying.upper()
+        if isinstance(expiry, str) and expiry == "all":
+            rows = np.concatenate([self.store.option_chain(name, e, exchange=exchange)
+                                   for e in self.store.expiries(name, exchange)] or [np.array([], dtype=np.int64)])
+        else:
+            rows = self.store.option_chain(name, expiry, spot, strike_window, exchange)
+        cols = self.store.cols
+        keys = [f"{exchange}:{s}" for s in cols["tradingsymbol"][rows]]
+        spot_key = spot_symbol or INDEX_SPOT_SYMBOLS.get(name, f"NSE:{name}")
+        quotes = fetch_batched(self.kite.quote, ([spot_key] if spot is None else []) + keys,
+                               self.batch_size, self.max_workers, self.bucket)
+        if spot is None:
+            spot = float(quotes.get(spot_key, {}).get("last_price", np.nan))
+            if strike_window is not None and np.isfinite(spot) and not (isinstance(expiry, str) and expiry == "all"):
+                # the window needs the spot; narrow the already-fetched rows instead of refetching
+                keep = self.store.option_chain(name, expiry, spot, strike_window, exchange)
+                keep_set = set(keep.tolist())
+                mask = np.fromiter((r in keep_set for r in rows), dtype=bool, count=len(rows))
+                rows = rows[mask]
+                keys = [k for k, m in zip(keys, mask) if m]
+
+        n = len(keys)
+        last = np.full(n, np.nan)
+        bid = np.full(n, np.nan)
+        ask = np.full(n, np.nan)
+        oi = np.zeros(n)
+        volume = np.zeros(n)
+        for i, k in enumerate(keys):
+            q = quotes.get(k)
+            if not q:
+                continue
+            last[i] = q.get("last_price", np.nan)
+            depth = q.get("depth")
+            bid[i], ask[i] = _best(depth, "buy"), _best(depth, "sell")
+            oi[i] = q.get("oi", 0) or 0
+            volume[i] = q.get("volume", 0) or 0
+        # mid when both sides are quoted, else last traded price
+        two_sided = (bid > 0) & (ask > 0)
+        price = np.where(two_sided, 0.5 * (bid + ask), last)
+
+        strike = cols["strike"][rows]
+        expiry_arr = cols["expiry"][rows]
+        is_call = cols["instrument_type"][rows] == "CE"
+        T = year_fraction(expiry_arr, now)
+        iv = implied_vol(price, spot, strike, T, self.rate, is_call, self.div_yield)
+        greeks = bs_greeks(spot, strike, np.maximum(T, 1e-9), self.rate, iv, is_call, self.div_yield)
+        df = pd.DataFrame({
+            "expiry": expiry_arr, "strike": strike, "type": cols["instrument_type"][rows],
+            "tradingsymbol": cols["tradingsymbol"][rows], "instrument_token": cols["instrument_token"][rows],
+            "lot_size": cols["lot_size"][rows], "last_price": last, "bid": bid, "ask": ask, "price": price,
+            "oi": oi, "volume": volume, "T": T, "iv": iv, **greeks,
+        })
+        df.attrs.update(underlying=name, spot=spot, rate=self.rate, as_of=str(now or dt.datetime.now(IST)))
+        return df
+
+
+def chain_wide(df: pd.DataFrame, fields=("last_price", "bid", "ask", "oi", "iv", "delta", "gamma", "vega", "theta")):
+    """strike x (CE/PE, field) view of a single-expiry snapshot."""
+    wide = df.pivot_table(index="strike", columns="type", values=list(fields), aggfunc="first")
+    return wide.swaplevel(0, 1, axis=1).sort_index(axis=1, level=0)
+
+
+# ---------------- benchmark stub ----------------
+class StubKite:
+    """Quotes priced from Black-Scholes with a simple smile; `latency` seconds per call."""
+
+    def __init__(self, store: InstrumentStore, spot: float, spot_key: str, latency: float = 0.05,
+                 rate: float = 0.065, now: dt.datetime = None):
+        self.latency = latency
+        self.calls = 0
+        self._quotes = {spot_key: {"last_price": spot}}
+        cols = store.cols
+        rows = np.flatnonzero(np.isin(cols["instrument_type"], ["CE", "PE"]))
+        K, is_call = cols["strike"][rows], cols["instrument_type"][rows] == "CE"
+        T = np.maximum(year_fraction(cols["expiry"][rows], now), 1e-4)
+        vol = 0.13 + 0.4 * np.log(K / spot) ** 2
+        px = np.round(bs_price(spot, K, T, rate, vol, is_call), 2)
+        for r, p in zip(rows, px):
+            key = f"{cols['exchange'][r]}:{cols['tradingsymbol'][r]}"
+            self._quotes[key] = {"last_price": float(p), "oi": 1000, "volume": 10,
+                                 "depth": {"buy": [{"price": max(p - 0.05, 0.05), "quantity": 50}],
+                                           "sell": [{"price": p + 0.05, "quantity": 50}]}}
+
+    def quote(self, keys):
+        time.sleep(self.latency)
+        self.calls += 1
+        return {k: self._quotes[k] for k in keys if k in self._quotes}
+
+    ltp = quote
+
+
+def synthetic_nifty_store(spot=24800.0, step=50, strikes_each_side=60, weeks=8):
+    today = dt.datetime.now(IST).date()
+    recs, tok = [], 1
+    for w in range(weeks):
+        e = today + dt.timedelta(days=7 * w + 1)
+        for k in range(-strikes_each_side, strikes_each_side + 1):
+            for t in ("CE", "PE"):
+                strike = spot + k * step
+                recs.append({"instrument_token": tok, "tradingsymbol": f"NIFTY{e:%y%m%d}{strike:.0f}{t}",
+                             "name": "NIFTY", "expiry": e, "strike": strike, "tick_size": 0.05, "lot_size": 75,
+                             "instrument_type": t, "segment": "NFO-OPT", "exchange": "NFO"})
+                tok += 1
+    return InstrumentStore.from_records(recs)
+
+
+def bench(latency=0.05):
+    spot = 24813.0
+    store = synthetic_nifty_store()
+    kite = StubKite(store, spot, "NSE:NIFTY 50", latency=latency)
+    snap = OptionChainSnapshot(kite, store, bucket=None)
+    for expiry in (None, "all"):
+        t = time.perf_counter()
+        df = snap.snapshot("NIFTY", expiry=expiry)
+        el = time.perf_counter() - t
+        print(f"expiry={expiry or 'nearest'}: {len(df)} contracts, {kite.calls} quote calls so far, "
+              f"{el * 1e3:.0f} ms, iv solved {df['iv'].notna().mean() * 100:.1f}%")
+    near = snap.snapshot("NIFTY", strike_window=3)
+    print(chain_wide(near, ("price", "iv", "delta")).round(4).to_string())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("underlying", help="e.g. NIFTY, BANKNIFTY, RELIANCE, or 'bench'")
+    ap.add_argument("--expiry", default=None, help="YYYY-MM-DD, 'all', or nearest if omitted")
+    ap.add_argument("--window", type=int, default=None)
+    ap.add_argument("--rate", type=float, default=0.065)
+    args = ap.parse_args()
+    if args.underlying == "bench":
+        bench()
+    else:
+        from live.kite_option_chain import KiteHelper
+        kh = KiteHelper()
+        if not kh.kite:
+            raise SystemExit("Kite credentials required (KITE_API_KEY / KITE_ACCESS_TOKEN)")
+        snap = OptionChainSnapshot(kh.kite, kh.instrument_store(), rate=args.rate)
+        df = snap.snapshot(args.underlying, args.expiry, strike_window=args.window)
+        print(chain_wide(df).to_string() if args.expiry != "all" else df.to_string())
@@ -0,0 +1,132 @@
+# live/order_queue.py
+"""
+Bounded order queue between the webhook handler and the broker.
+- submit() only enqueues, so the HTTP request is acknowledged without waiting on the broker
+- a fixed pool of worker threads drains the queue into executor.place_order(), or hands the
+  order to executor.place_order_async() and moves on when the executor offers it
+- a full queue rejects new signals (the caller answers 429) instead of growing without bound
+- results are kept by signal id (most recent `keep_results`), so a retried alert with the
+  same id is not placed twice and clients can poll for the outcome
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class OrderQueue:
+    def __init__(self, executor, maxsize: int = 1000, workers: int = 4, keep_results: int = 10000,
+                 on_done=None):
+        """on_done(record) is called from the worker after each order completes (or fails)."""
+        self.executor = executor
+        self.on_done = on_done
+        self.maxsize = maxsize
+        self.keep_results = keep_results
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._results = OrderedDict()  # signal_id -> status dict
+        self._lock = threading.Lock()
+        self._stats = {"accepted": 0, "rejected": 0, "duplicates": 0, "done": 0, "failed": 0}
+        self._workers = [threading.Thread(target=self._work, name=f"order-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._workers:
+            t.start()
+
+    # ---------- producer side ----------
+    def submit(self, symbol, side, size_pct=1.0, signal_id=None, qty=None):
+        """
+        Enqueue an order. Returns (signal_id, status) where status is
+        "queued", "duplicate" (id already known) or "rejected" (queue full).
+        """
+        signal_id = str(signal_id) if signal_id else uuid.uuid4().hex
+        with self._lock:
+            if signal_id in self._results:
+                self._stats["duplicates"] += 1
+                return signal_id, "duplicate"
+            rec = {"signal_id": signal_id, "symbol": symbol, "side": side, "size_pct": size_pct,
+                   "qty": qty, "status": "queued", "queued_at": time.time()}
+            try:
+                self._queue.put_nowait(rec)
+            except queue.Full:
+                self._stats["rejected"] += 1
+                return signal_id, "rejected"
+            self._remember(signal_id, rec)
+            self._stats["accepted"] += 1
+        return signal_id, "queued"
+
+    def _remember(self, signal_id, rec):
+        self._results[signal_id] = rec
+        while len(self._results) > self.keep_results:
+            self._results.popitem(last=False)
+
+    # ---------- consumer side ----------
+    def _work(self):
+        while True:
+            rec = self._queue.get()
+            if rec is None:
+                self._queue.task_done()
+                return
+            with self._lock:
+                rec["status"] = "placing"
+            place_async = getattr(self.executor, "place_order_async", None)
+            if place_async is not None:
+                # e.g. CoalescingExecutor: the worker moves on, the order completes when its batch flushes
+                try:
+                    fut = place_async(rec["symbol"], rec["side"], rec["size_pct"], signal_id=rec["signal_id"],
+                                      qty=rec["qty"])
+                except Exception as e:
+                    logger.exception("Order %s failed", rec["signal_id"])
+                    self._complete(rec, {"error": str(e)})
+                    continue
+                fut.add_done_callback(lambda f, rec=rec: self._complete(rec, f.result()))
+                continue
+            try:
+                res = self.executor.place_order(rec["symbol"], rec["side"], rec["size_pct"],
+                                                signal_id=rec["signal_id"], qty=rec["qty"])
+            except Exception as e:
+                logger.exception("Order %s failed", rec["signal_id"])
+                res = {"error": str(e)}
+            self._complete(rec, res)
+
+    def _complete(self, rec, res):
+        failed = isinstance(res, dict) and "error" in res
+        with self._lock:
+            rec.update(status="failed" if failed else "done", result=res, done_at=time.time())
+            self._stats["failed" if failed else "done"] += 1
+            done = dict(rec)
+        if self.on_done is not None:
+            try:
+                self.on_done(done)
+            except Exception:
+                logger.exception("on_done callback failed for %s", rec["signal_id"])
+        self._queue.task_done()
+
+    # ---------- inspection ----------
+    def result(self, signal_id):
+        """Copy of the status record for a signal id, or None if unknown (or already forgotten)."""
+        with self._lock:
+            rec = self._results.get(str(signal_id))
+            return dict(rec) if rec is not None else None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "depth": self._queue.qsize(), "maxsize": self.maxsize,
+                    "workers": len(self._workers)}
+
+    def join(self):
+        """Block until every queued order has been processed (including ones still in an async executor)."""
+        self._queue.join()
+
+    def shutdown(self, wait: bool = True):
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for t in self._workers:
+                t.join()
@@ -0,0 +1,212 @@
+# live/replay_engine.py
+"""
+Replays recorded or synthetic bars through the live pipeline and measures it.
+Per symbol and bar: fetch -> patterns -> features -> signal -> risk -> execute
+- fetch:    fetch_market_data(patterns=False) served by the replay provider (set_replay_provider),
+            trimmed to the last `lookback` bars
+- patterns: PatternStream.update (O(1) per bar, same values as detect_patterns)
+- features: IndicatorState.update (O(1) per bar)
+- signal:   the active model from the registry if given, else the pattern final_signal
+- risk:     RiskManager.check_and_reserve, marks and fills
+- execute:  KiteExecutor.place_order against the provider's simulated Kite client
+speed: 1 = real time, 60 = one minute per second, 0 = as fast as possible.
+The report has throughput, per-stage latency and how many symbols fit in one bar interval.
+
+Usage:
+python -m live.replay_engine --symbols 50 --bars 500 --speed 0
+python -m live.replay_engine --source data/cache/bars --interval 15m --model-registry models/registry
+"""
+
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bar_store import interval_to_timedelta
+from candlestick_patterns import PatternStream
+from live.kite_executor import KiteExecutor
+from live.risk_manager import RiskManager
+from replay_provider import ReplayProvider
+from scripts.features import IndicatorState
+from universal_fetcher import fetch_market_data, set_replay_provider
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["fetch", "patterns", "features", "signal", "risk", "execute"]
+
+
+class ReplayEngine:
+    def __init__(self, provider: ReplayProvider, symbols=None, model=None, risk: RiskManager = None,
+                 executor=None, speed: float = 0.0, lookback: int = 60, warmup: int = 60, qty: float = 1.0,
+                 period: str = "7d"):
+        """period: history requested from fetch_market_data per bar, as StrategyLoop does."""
+        self.provider = provider
+        self.symbols = symbols or provider.symbols()
+        self.model = model
+        self.risk = risk or RiskManager({"risk": {"capital": 1e9, "max_position_pct": 100.0,
+                                                  "max_gross_exposure_pct": 1e6}})
+        self.executor = executor or KiteExecutor({}, kite=provider)
+        self.speed = speed
+        self.lookback = lookback
+        self.period = period
+        self.warmup = warmup
+        self.qty = qty
+        self.interval_s = interval_to_timedelta(provider.interval).total_seconds()
+        self.states = {}    # symbol -> IndicatorState
+        self.patterns = {}  # symbol -> PatternStream
+        self.timings = {s: [] for s in STAGES}
+        self.bar_wall = []  # wall time to process all symbols for one bar time
+        self.counts = {"symbol_bars": 0, "signals": 0, "orders": 0, "blocked": 0}
+
+    def _warm_up(self, timeline):
+        """Seed indicator state from the first `warmup` bar times; returns where the replay starts."""
+        start = min(self.warmup, len(timeline))
+        if start:
+            self.provider.set_clock(int(timeline[start - 1]))
+            for sym in self.symbols:
+                hist = self.provider.ohlcv(sym)
+                if len(hist):
+                    self.states[sym] = IndicatorState.from_history(hist)
+                    self.patterns[sym] = PatternStream()
+                    self.patterns[sym].seed(hist)
+        return start
+
+    def _step_symbol(self, sym, ts):
+        t = self.timings
+        t0 = time.perf_counter()
+        window = fetch_market_data(sym, interval=self.provider.interval, period=self.period,
+                                   patterns=False).iloc[-self.lookback:]
+        t1 = time.perf_counter()
+        o, h, l, c, v = window.to_numpy()[-1]
+        stream = self.patterns.get(sym)
+        if stream is None:
+            stream = self.patterns[sym] = PatternStream()
+            stream.seed(window.iloc[:-1])
+        _values, final_signal = stream.update(o, h, l, c)
+        t2 = time.perf_counter()
+        state = self.states.get(sym)
+        if state is None:
+            # first bar seen for this symbol: seed from the window (it already holds this bar)
+            state = self.states[sym] = IndicatorState.from_history(window)
+            row = None
+        else:
+            row = state.update(o, h, l, c, v)
+        t3 = time.perf_counter()
+        if self.model is not None and row is not None:
+            signal = int(self.model.predict(row.reshape(1, -1))[0])
+        else:
+            signal = int(final_signal)
+        t4 = time.perf_counter()
+        self.risk.mark(sym, c)
+        rid = None
+        if signal != 0:
+            self.counts["signals"] += 1
+            ok, _reason, rid = self.risk.check_and_reserve(sym, "BUY" if signal > 0 else "SELL", self.qty, c)
+            if not ok:
+                self.counts["blocked"] += 1
+        t5 = time.perf_counter()
+        if rid is not None:
+            res = self.executor.place_order(sym, "BUY" if signal > 0 else "SELL", signal_id=f"{sym}@{ts}")
+            if isinstance(res, dict) and "error" in res:
+                self.risk.release(rid)
+            else:
+                self.risk.fill(rid)
+                self.counts["orders"] += 1
+        t6 = time.perf_counter()
+        for stage, a, b in zip(STAGES, (t0, t1, t2, t3, t4, t5), (t1, t2, t3, t4, t5, t6)):
+            t[stage].append(b - a)
+        self.counts["symbol_bars"] += 1
+
+    def run(self, max_bars: int = None) -> dict:
+        timeline = self.provider.timeline()
+        start = self._warm_up(timeline)
+        stop = len(timeline) if max_bars is None else min(len(timeline), start + max_bars)
+        set_replay_provider(self.provider)
+        try:
+            wall0 = time.perf_counter()
+            for i in range(start, stop):
+                ts = int(timeline[i])
+                self.provider.set_clock(ts)
+                b0 = time.perf_counter()
+                for sym in self.symbols:
+                    if self.provider.bar_at(sym, ts) is not None:
+                        self._step_symbol(sym, ts)
+                elapsed = time.perf_counter() - b0
+                self.bar_wall.append(elapsed)
+                if self.speed > 0:
+                    # pace bar times at interval / speed of wall clock
+                    pause = self.interval_s / self.speed - elapsed
+                    if pause > 0:
+                        time.sleep(pause)
+            wall = time.perf_counter() - wall0
+        finally:
+            set_replay_provider(None)
+            self.provider.set_clock(None)
+        return self.report(wall, stop - start)
+
+    def report(self, wall, n_bars) -> dict:
+        stages = {}
+        per_symbol_bar = 0.0
+        for s in STAGES:
+            a = np.asarray(self.timings[s]) * 1e6
+            if a.size:
+                stages[s] = {"mean_us": float(a.mean()), "p50_us": float(np.percentile(a, 50)),
+                             "p99_us": float(np.percentile(a, 99))}
+                per_symbol_bar += a.mean() / 1e6
+        bw = np.asarray(self.bar_wall) * 1e3
+        return {
+            "bars": n_bars,
+            "symbols": len(self.symbols),
+            "wall_s": wall,
+            "symbol_bars_per_s": self.counts["symbol_bars"] / wall if wall > 0 else None,
+            "bar_ms_p50": float(np.percentile(bw, 50)) if bw.size else None,
+            "bar_ms_p99": float(np.percentile(bw, 99)) if bw.size else None,
+            "stages": stages,
+            # symbols one process could keep up with if all of them close on the same bar
+            "symbols_per_interval": int(self.interval_s / per_symbol_bar) if per_symbol_bar else None,
+            **self.counts,
+            "risk": self.risk.summary(),
+        }
+
+
+def print_report(r):
+    print(f"{r['bars']} bars x {r['symbols']} symbols in {r['wall_s']:.2f} s "
+          f"({r['symbol_bars_per_s']:,.0f} symbol-bars/s), per bar p50 {r['bar_ms_p50']:.1f} ms "
+          f"p99 {r['bar_ms_p99']:.1f} ms")
+    print(f"{'stage':<10}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    for s, v in r["stages"].items():
+        print(f"{s:<10}{v['mean_us']:>10.1f}{v['p50_us']:>10.1f}{v['p99_us']:>10.1f}")
+    print(f"signals {r['signals']}, orders {r['orders']}, blocked by risk {r['blocked']}")
+    print(f"capacity: ~{r['symbols_per_interval']:,} symbols per bar interval in one process")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", default="synthetic", help="'synthetic', a bar cache dir, or a CSV dir")
+    ap.add_argument("--interval", default="15m")
+    ap.add_argument("--symbols", type=int, default=20, help="synthetic: number of series")
+    ap.add_argument("--bars", type=int, default=500, help="bars to replay (after warm-up)")
+    ap.add_argument("--speed", type=float, default=0.0, help="1 = real time, 0 = as fast as possible")
+    ap.add_argument("--model-registry", default=None, help="use the active model from this registry")
+    ap.add_argument("--json", default=None, help="write the report here")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.source == "synthetic":
+        provider = ReplayProvider.synthetic(args.symbols, args.bars + 60, args.interval)
+    elif any(p.suffix == ".csv" for p in Path(args.source).iterdir()):
+        provider = ReplayProvider.from_csv_dir(args.source, args.interval)
+    else:
+        provider = ReplayProvider.from_bar_store(args.source, args.interval)
+    model = None
+    if args.model_registry:
+        from live.model_registry import ModelRegistry
+        model = ModelRegistry(args.model_registry).load()
+    report = ReplayEngine(provider, model=model, speed=args.speed).run(max_bars=args.bars)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -1,21 +1,345 @@
 # live/risk_manager.py
+"""
+Portfolio risk state for the live server.
+- per-symbol positions (qty, avg price, last price) with gross/net exposure and unrealized
+  P&L kept as running totals, so every update and pre-trade check is O(1)
+- check_and_reserve() checks and books the order's exposure under one lock, so concurrent
+  order workers cannot both pass a check that only one of them fits in
+- reservations are turned into positions by fill() / fill_net() or dropped by release()
+- the state is snapshotted to JSON (atomic replace) and restored at startup; reservations
+  are not restored, since the orders behind them died with the previous process
+
+Usage:
+python -m live.risk_manager bench      # pre-trade check latency vs number of open positions
+"""
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
 import yaml
 
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+
+class Position:
+    __slots__ = ("qty", "avg_price", "last_price", "realized")
+
+    def __init__(self, qty=0.0, avg_price=0.0, last_price=0.0, realized=0.0):
+        self.qty = qty
+        self.avg_price = avg_price
+        self.last_price = last_price
+        self.realized = realized
+
+    @property
+    def exposure(self):
+        return self.qty * self.last_price
+
+    @property
+    def unrealized(self):
+        return self.qty * (self.last_price - self.avg_price)
+
+
 class RiskManager:
     def __init__(self, cfg):
         self.cfg = cfg
-        self.max_risk_pct = cfg.get("risk", {}).get("max_risk_per_trade_pct", 1.0)
-        self.daily_max_loss_pct = cfg.get("risk", {}).get("daily_max_loss_pct", 3.0)
+        rcfg = cfg.get("risk", {})
+        self.max_risk_pct = rcfg.get("max_risk_per_trade_pct", 1.0)
+        self.daily_max_loss_pct = rcfg.get("daily_max_loss_pct", 3.0)
+        self.capital = float(rcfg.get("capital", 100000.0))
+        self.max_position_pct = rcfg.get("max_position_pct", 20.0)
+        self.max_gross_exposure_pct = rcfg.get("max_gross_exposure_pct", 200.0)
+        self.max_positions = rcfg.get("max_positions", 10000)
+        self.snapshot_path = rcfg.get("snapshot_path")
         # In a real implementation you'd fetch account balances, P&L history etc.
-        self.today_loss = 0.0
+        self.today_loss = 0.0  # loss booked through register_loss(), in % of capital
+
+        self._lock = threading.RLock()
+        self.positions = {}      # symbol -> Position
+        self.reservations = {}   # reservation id -> (symbol, signed qty, price, reserved gross)
+        self.pending_qty = {}    # symbol -> signed qty of open reservations
+        self.pending_only = 0    # symbols in pending_qty without an open position
+        self.gross = 0.0         # sum |qty * last|
+        self.net = 0.0           # sum qty * last
+        self.unrealized = 0.0
+        self.realized = 0.0      # realized today
+        self.reserved_gross = 0.0
+        self.day = dt.datetime.now(IST).date()
+        self._changes = 0        # bumped on every state change; autosnapshot() writes when it moved
+        self._saver = None
+        if self.snapshot_path and Path(self.snapshot_path).exists():
+            self.restore(self.snapshot_path)
 
+    # ---------- legacy checks ----------
     def allowed_trade(self, size_pct):
         # Basic checks
-        if size_pct*100 > self.max_risk_pct:
-            return False
-        if self.today_loss >= self.daily_max_loss_pct:
-            return False
-        return True
+        with self._lock:
+            self._roll_day()
+            if size_pct*100 > self.max_risk_pct:
+                inc("trades_blocked_total", reason="risk_per_trade")
+                return False
+            if self.daily_loss_pct() >= self.daily_max_loss_pct:
+                inc("trades_blocked_total", reason="daily_loss_limit")
+                return False
+            return True
 
     def register_loss(self, loss_pct):
-        self.today_loss += loss_pct
+        with self._lock:
+            self.today_loss += loss_pct
+
+    # ---------- state ----------
+    def _roll_day(self):
+        today = dt.datetime.now(IST).date()
+        if today != self.day:
+            self.day = today
+            self.today_loss = 0.0
+            self.realized = 0.0
+
+    def daily_loss_pct(self):
+        """Today's loss (realized + open unrealized + booked) in % of capital; 0 when in profit."""
+        pnl = self.realized + self.unrealized
+        return max(0.0, -pnl / self.capital * 100.0) + self.today_loss
+
+    def _set(self, sym, pos, qty, avg, last, realized_delta=0.0):
+        """Move one position to new values, keeping the running totals in step (O(1))."""
+        old_exp, old_unr = pos.exposure, pos.unrealized
+        pos.qty, pos.avg_price, pos.last_price = qty, avg, last
+        pos.realized += realized_delta
+        self.gross += abs(pos.exposure) - abs(old_exp)
+        self.net += pos.exposure - old_exp
+        self.unrealized += pos.unrealized - old_unr
+        self.realized += realized_delta
+        self._changes += 1
+        if qty == 0:
+            del self.positions[sym]
+            if sym in self.pending_qty:
+                self.pending_only += 1
+
+    def mark(self, symbol, price):
+        """Update the last price of an open position."""
+        with self._lock:
+            pos = self.positions.get(symbol)
+            if pos is not None:
+                self._set(symbol, pos, pos.qty, pos.avg_price, float(price))
+
+    # ---------- pre-trade ----------
+    def check_and_reserve(self, symbol, side, qty, price, reservation_id=None):
+        """
+        Atomically check an order against the limits and, if it passes, reserve its exposure.
+        Returns (ok, reason, reservation_id). reason is None when ok, and "duplicate" when
+        reservation_id is already reserved (the existing reservation is left untouched).
+        """
+        ok, reason, rid = self._check_and_reserve(symbol, side, qty, price, reservation_id)
+        if not ok and reason != "duplicate":
+            inc("trades_blocked_total", reason=reason)
+        return ok, reason, rid
+
+    def _check_and_reserve(self, symbol, side, qty, price, reservation_id):
+        signed = float(qty) if side.upper() == "BUY" else -float(qty)
+        price = float(price)
+        notional = abs(signed) * price
+        with self._lock:
+            if reservation_id is not None and reservation_id in self.reservations:
+                return False, "duplicate", reservation_id
+            self._roll_day()
+            if notional / self.capital * 100.0 > self.max_position_pct:
+                return False, "order_too_large", None
+            if self.daily_loss_pct() >= self.daily_max_loss_pct:
+                return False, "daily_loss_limit", None
+            pos = self.positions.get(symbol)
+            # pending reservations on the symbol count as if already filled
+            cur = (pos.qty if pos is not None else 0.0) + self.pending_qty.get(symbol, 0.0)
+            new_qty = cur + signed
+            # a symbol with only a pending reservation already takes up a position slot
+            if (pos is None and symbol not in self.pending_qty
+                    and len(self.positions) + self.pending_only >= self.max_positions):
+                return False, "max_positions", None
+            if abs(new_qty) * price / self.capital * 100.0 > self.max_position_pct:
+                return False, "position_limit", None
+            # only the part of the order that adds exposure counts against the gross limit
+            added = max(0.0, abs(new_qty) - abs(cur)) * price
+            if (self.gross + self.reserved_gross + added) / self.capital * 100.0 > self.max_gross_exposure_pct:
+                return False, "gross_exposure_limit", None
+            rid = reservation_id or uuid.uuid4().hex
+            self.reservations[rid] = (symbol, signed, price, added)
+            self.reserved_gross += added
+            self._add_pending(symbol, signed)
+            self._changes += 1
+            return True, None, rid
+
+    def _add_pending(self, symbol, signed):
+        was_pending = symbol in self.pending_qty
+        q = self.pending_qty.get(symbol, 0.0) + signed
+        if q:
+            self.pending_qty[symbol] = q
+        else:
+            self.pending_qty.pop(symbol, None)
+        if symbol not in self.positions:
+            self.pending_only += (symbol in self.pending_qty) - was_pending
+
+    def release(self, reservation_id):
+        """Drop a reservation (order rejected / cancelled)."""
+        with self._lock:
+            res = self.reservations.pop(reservation_id, None)
+            if res is not None:
+                self.reserved_gross -= res[3]
+                self._add_pending(res[0], -res[1])
+                self._changes += 1
+
+    def fill(self, reservation_id, qty=None, price=None):
+        """Apply a (full or partial) fill of a reserved order and release the reservation."""
+        with self._lock:
+            res = self.reservations.pop(reservation_id, None)
+            if res is None:
+                raise KeyError(f"unknown reservation {reservation_id}")
+            symbol, signed, rprice, added = res
+            self.reserved_gross -= added
+            self._add_pending(symbol, -signed)
+            fill_qty = signed if qty is None else (abs(float(qty)) if signed > 0 else -abs(float(qty)))
+            self.apply_fill(symbol, fill_qty, rprice if price is None else float(price))
+
+    def fill_net(self, reservation_ids):
+        """
+        Settle reservations that were netted into one broker order: all of them are released
+        and only the residual qty per symbol is booked, at the average reserved price of the
+        side it ends up on. Ids that are no longer reserved are skipped.
+        """
+        with self._lock:
+            net = {}  # symbol -> [signed qty, buy qty, buy notional, sell qty, sell notional]
+            for rid in reservation_ids:
+                res = self.reservations.pop(rid, None)
+                if res is None:
+                    continue
+                symbol, signed, rprice, added = res
+                self.reserved_gross -= added
+                self._add_pending(symbol, -signed)
+                self._changes += 1
+                acc = net.setdefault(symbol, [0.0, 0.0, 0.0, 0.0, 0.0])
+                acc[0] += signed
+                side = 1 if signed > 0 else 3
+                acc[side] += abs(signed)
+                acc[side + 1] += abs(signed) * rprice
+            for symbol, (q, bq, bn, sq, sn) in net.items():
+                if q > 0:
+                    self.apply_fill(symbol, q, bn / bq)
+                elif q < 0:
+                    self.apply_fill(symbol, q, sn / sq)
+
+    def apply_fill(self, symbol, signed_qty, price):
+        """Book a fill of signed_qty (+buy / -sell) at price."""
+        with self._lock:
+            pos = self.positions.get(symbol)
+            if pos is None:
+                pos = self.positions[symbol] = Position(last_price=price)
+                if symbol in self.pending_qty:
+                    self.pending_only -= 1
+            q, avg = pos.qty, pos.avg_price
+            new_q = q + signed_qty
+            realized = 0.0
+            if q == 0 or (q > 0) == (signed_qty > 0):
+                new_avg = (q * avg + signed_qty * price) / new_q if new_q else 0.0
+            else:
+                closed = min(abs(signed_qty), abs(q))
+                realized = closed * (price - avg) * (1 if q > 0 else -1)
+                # flipped through zero: the remainder opens at the fill price
+                new_avg = avg if new_q * q > 0 else (price if new_q else 0.0)
+            self._set(symbol, pos, new_q, new_avg, price, realized)
+
+    def summary(self):
+        with self._lock:
+            return {"positions": len(self.positions), "gross": self.gross, "net": self.net,
+                    "unrealized": self.unrealized, "realized_today": self.realized,
+                    "reserved_gross": self.reserved_gross, "reservations": len(self.reservations),
+                    "daily_loss_pct": self.daily_loss_pct(), "day": str(self.day)}
+
+    # ---------- persistence ----------
+    def snapshot(self, path=None):
+        path = Path(path or self.snapshot_path)
+        with self._lock:
+            state = {"day": str(self.day), "today_loss": self.today_loss, "realized": self.realized,
+                     "positions": {s: [p.qty, p.avg_price, p.last_price, p.realized] for s, p in self.positions.items()},
+                     "reservations": {k: list(v) for k, v in self.reservations.items()},
+                     "saved_at": time.time()}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
+
+    def autosnapshot(self, interval_s=2.0):
+        """Background thread writing a snapshot every interval_s while the state keeps changing."""
+        def _loop():
+            saved = self._changes
+            while True:
+                time.sleep(interval_s)
+                if self._changes != saved:
+                    saved = self._changes
+                    try:
+                        self.snapshot()
+                    except OSError:
+                        logger.exception("Risk snapshot failed")
+        if self.snapshot_path and self._saver is None:
+            self._saver = threading.Thread(target=_loop, name="risk-snapshot", daemon=True)
+            self._saver.start()
+
+    def restore(self, path):
+        state = json.loads(Path(path).read_text())
+        with self._lock:
+            self.positions, self.reservations, self.pending_qty = {}, {}, {}
+            self.pending_only = 0
+            self.gross = self.net = self.unrealized = self.reserved_gross = 0.0
+            for s, (q, avg, last, realized) in state["positions"].items():
+                pos = self.positions[s] = Position(realized=realized)
+                self._set(s, pos, q, avg, last)
+            self.realized = state.get("realized", 0.0)
+            self.today_loss = state.get("today_loss", 0.0)
+            self.day = dt.date.fromisoformat(state["day"])
+            self._roll_day()
+        stale = len(state.get("reservations", {}))
+        if stale:
+            logger.warning("Dropped %d reservations from the snapshot: their orders are gone", stale)
+        logger.info("Restored risk state: %d positions", len(self.positions))
+
+
+def bench(sizes=(10, 100, 1000, 5000, 20000), n=20000):
+    """Median / p99 latency of check_and_reserve + release as the book grows."""
+    import numpy as np
+    print(f"{'positions':>10} {'p50 us':>8} {'p99 us':>8} {'snapshot ms':>12} {'restore ms':>11}")
+    for size in sizes:
+        risk = RiskManager({"risk": {"capital": 1e12, "max_position_pct": 100, "max_gross_exposure_pct": 1e6,
+                                     "max_positions": 10 ** 9}})
+        for i in range(size):
+            risk.apply_fill(f"SYM{i}", 10, 100.0 + i % 7)
+        lat = np.empty(n)
+        for j in range(n):
+            sym = f"SYM{j % size}"
+            t = time.perf_counter()
+            ok, _, rid = risk.check_and_reserve(sym, "BUY", 1, 101.0)
+            risk.release(rid)
+            lat[j] = time.perf_counter() - t
+        path = Path(f"/tmp/risk_bench_{os.getpid()}.json")
+        t = time.perf_counter()
+        risk.snapshot(path)
+        t_snap = time.perf_counter() - t
+        t = time.perf_counter()
+        risk.restore(path)
+        t_rest = time.perf_counter() - t
+        path.unlink()
+        print(f"{size:>10} {np.percentile(lat, 50) * 1e6:8.2f} {np.percentile(lat, 99) * 1e6:8.2f} "
+              f"{t_snap * 1e3:12.1f} {t_rest * 1e3:11.1f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["bench"])
+    args = ap.parse_args()
+    bench()
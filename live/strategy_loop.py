@@ -0,0 +1,318 @@
+# live/strategy_loop.py
+"""
+Long-running strategy scheduler, the continuous form of scripts/demo_multi_asset_strategy.py.
+- symbols are grouped by exchange session (resample.session_for); each group sleeps until its
+  next bar close (resample.next_close) plus settle_s for the provider to publish the bar, so
+  NSE symbols wake at 09:30, 09:45 ... IST and crypto around the clock
+- a cycle refreshes only its own group, through fetch_market_data(patterns=False) and the bar
+  cache, so only the missing tail is downloaded; a symbol that had no new bar (holiday, halt,
+  slow provider) is polled less often, backing off up to max_backoff cycles
+- bars pushed from a tick aggregator (on_bar / push_bar) need no fetch at all
+- candlestick patterns (PatternStream), the MA crossover and the combined signal are updated
+  per new bar and only for symbols that changed, so a steady-state cycle costs O(changed
+  symbols), not O(universe x history)
+- suggested trades pass RiskManager.allowed_trade and go to the executor: OrderQueue.submit if
+  it is one, else place_order in worker threads
+- every cycle's refresh / evaluate / dispatch time is logged, kept in .cycles and recorded as
+  metrics spans (metrics.py)
+
+Usage:
+python -m live.strategy_loop --config config_example.yml --interval 15m
+python -m live.strategy_loop --replay 200 --bars 200      # synthetic replay, no waiting
+"""
+
+import argparse
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from bar_store import _index_to_ns, interval_to_timedelta
+from candlestick_patterns import PatternStream
+from metrics import observe
+from resample import Session, bucket_of, next_close, session_for
+from scripts.demo_multi_asset_strategy import suggest_trade
+from scripts.features import _RollingMean
+from universal_fetcher import fetch_market_data_many, load_instrument_registry
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolSignals:
+    """
+    Incremental simple_ma_signal() and candlestick final_signal for one symbol: the same values
+    the demo computes from the full frame, updated in O(1) per bar.
+    """
+
+    __slots__ = ("patterns", "fast", "slow", "slow_n", "ma_fast", "ma_slow", "final_signal", "bars", "last_ts")
+
+    def __init__(self, fast: int = 8, slow: int = 21):
+        self.patterns = PatternStream()
+        self.fast = _RollingMean(fast)
+        self.slow = _RollingMean(slow)
+        self.slow_n = slow
+        self.ma_fast = self.ma_slow = float("nan")
+        self.final_signal = 0
+        self.bars = 0
+        self.last_ts = None
+
+    def update(self, ts: int, o: float, h: float, l: float, c: float):
+        _values, self.final_signal = self.patterns.update(o, h, l, c)
+        self.ma_fast = self.fast.update(float(c))
+        self.ma_slow = self.slow.update(float(c))
+        self.bars += 1
+        self.last_ts = ts
+
+    def ai_signal(self) -> int:
+        if self.bars < self.slow_n + 2:
+            return 0
+        if self.ma_fast > self.ma_slow:
+            return 1
+        if self.ma_fast < self.ma_slow:
+            return -1
+        return 0
+
+
+class StrategyLoop:
+    def __init__(self, symbols: Iterable[Union[str, Tuple[str, str]]], interval: str = "15m", executor=None,
+                 risk=None, period: str = "7d", settle_s: float = 2.0, max_workers: int = 8,
+                 max_backoff: int = 8, poll: bool = True, fast: int = 8, slow: int = 21, clock=time.time_ns):
+        """
+        symbols: universe symbols or (universe_symbol, provider_hint) pairs from the registry.
+        period: history fetched per refresh (served from the bar cache after the first one).
+        poll: refresh due symbols from the provider; False = only bars pushed via on_bar().
+        clock: () -> UTC ns, for tests and replays.
+        """
+        self.hints = {}
+        for item in symbols:
+            sym, hint = (item, None) if isinstance(item, str) else (item[0], item[1])
+            self.hints.setdefault(sym, hint or None)
+        self.interval = interval
+        self.bar_ns = interval_to_timedelta(interval).value
+        if executor is None:
+            from live.kite_executor import KiteExecutor
+            executor = KiteExecutor({})  # paper mode
+        self.executor = executor
+        self.risk = risk
+        self.period = period
+        self.settle_s = settle_s
+        self.max_workers = max_workers
+        self.max_backoff = max_backoff
+        self.poll = poll
+        self.fast, self.slow = fast, slow
+        self.clock = clock
+        self.groups: Dict[Session, List[str]] = {}
+        for sym in self.hints:
+            self.groups.setdefault(session_for(sym), []).append(sym)
+        self.states: Dict[str, SymbolSignals] = {}
+        self._backoff = {}  # symbol -> [cycles to skip, consecutive misses]
+        self._pushed = {}   # symbol -> [(ts, o, h, l, c, v)] from on_bar, not yet evaluated
+        self._push_lock = threading.Lock()
+        self.cycles = deque(maxlen=10000)
+        self._stop = None
+
+    # ---------- bars in ----------
+    def push_bar(self, symbol: str, ts: int, o: float, h: float, l: float, c: float, v: float = 0.0):
+        """Hand in a closed bar (e.g. from live/tick_aggregator.py); thread-safe."""
+        if symbol not in self.hints:
+            return
+        with self._push_lock:
+            self._pushed.setdefault(symbol, []).append((int(ts), o, h, l, c, v))
+
+    def on_bar(self, bar):
+        """Callback for tick_aggregator.run_feed: takes Bar tuples of this loop's interval."""
+        if bar.interval == self.interval:
+            self.push_bar(bar.symbol, bar.start, bar.open, bar.high, bar.low, bar.close, bar.volume)
+
+    def _take_pushed(self, symbols) -> Dict[str, list]:
+        with self._push_lock:
+            return {s: self._pushed.pop(s) for s in symbols if s in self._pushed}
+
+    def _due(self, symbol: str) -> bool:
+        b = self._backoff.get(symbol)
+        if b is None or b[0] <= 0:
+            return True
+        b[0] -= 1
+        return False
+
+    def _record_poll(self, symbol: str, got_bar: bool):
+        if got_bar:
+            self._backoff.pop(symbol, None)
+            return
+        b = self._backoff.setdefault(symbol, [0, 0])
+        b[1] += 1
+        b[0] = min(2 ** (b[1] - 1), self.max_backoff) - 1
+
+    def _fetch(self, symbols: List[str]) -> List[Tuple[str, pd.DataFrame]]:
+        return list(fetch_market_data_many([(s, self.hints[s]) for s in symbols], interval=self.interval,
+                                           period=self.period, max_workers=self.max_workers, patterns=False))
+
+    def _new_bars(self, symbol: str, df: pd.DataFrame, session: Session, close_ns: int) -> list:
+        """Rows of df newer than the symbol's last evaluated bar whose bucket has closed by close_ns."""
+        if df is None or df.empty:
+            return []
+        ns = _index_to_ns(df.index)
+        st = self.states.get(symbol)
+        lo = 0 if st is None or st.last_ts is None else int(np.searchsorted(ns, st.last_ts, side="right"))
+        out = []
+        values = df[["open", "high", "low", "close", "volume"]].to_numpy(dtype=np.float64)
+        for i in range(lo, len(ns)):
+            ts = int(ns[i])
+            b = bucket_of(ts, self.interval, session)
+            # complete_at, not the bucket end: a 1d bar is complete at the session close, not midnight
+            done_at = (b[2] if b[2] is not None else b[1]) if b is not None else ts + self.bar_ns
+            if done_at > close_ns:
+                break  # still forming
+            out.append((ts, *values[i]))
+        return out
+
+    # ---------- one cycle ----------
+    async def cycle(self, session: Session, symbols: List[str], close_ns: int) -> dict:
+        """Refresh, evaluate and dispatch for the bars of `symbols` that closed by close_ns."""
+        t0 = time.perf_counter()
+        new = self._take_pushed(symbols)
+        polled = []
+        if self.poll:
+            polled = [s for s in symbols if s not in new and self._due(s)]
+            if polled:
+                for sym, df in await asyncio.to_thread(self._fetch, polled):
+                    bars = self._new_bars(sym, df, session, close_ns)
+                    self._record_poll(sym, bool(bars))
+                    if bars:
+                        new[sym] = bars
+        t1 = time.perf_counter()
+
+        trades = []
+        for sym, bars in new.items():
+            st = self.states.get(sym)
+            if st is None:
+                st = self.states[sym] = SymbolSignals(self.fast, self.slow)
+            for ts, o, h, l, c, _v in bars:
+                if st.last_ts is None or ts > st.last_ts:
+                    st.update(ts, o, h, l, c)
+            trade = suggest_trade(sym, st.ai_signal(), st.final_signal)
+            if trade:
+                trade["bar"] = pd.Timestamp(st.last_ts, tz="UTC").isoformat()
+                trades.append(trade)
+        t2 = time.perf_counter()
+
+        sent = await self._dispatch(trades)
+        t3 = time.perf_counter()
+
+        report = {"close": pd.Timestamp(close_ns, tz="UTC").isoformat(), "session": session.tz,
+                  "symbols": len(symbols), "polled": len(polled), "changed": len(new), "trades": len(trades),
+                  "sent": sent, "refresh_ms": (t1 - t0) * 1e3, "evaluate_ms": (t2 - t1) * 1e3,
+                  "dispatch_ms": (t3 - t2) * 1e3, "total_ms": (t3 - t0) * 1e3}
+        self.cycles.append(report)
+        for stage, seconds in (("strategy_refresh", t1 - t0), ("strategy_evaluate", t2 - t1),
+                               ("strategy_dispatch", t3 - t2)):
+            observe(stage, seconds, interval=self.interval)
+        logger.info("%s %s close %s: %d/%d polled, %d changed, %d trades; refresh %.1f ms, evaluate %.2f ms, "
+                    "dispatch %.1f ms", self.interval, session.tz, report["close"], len(polled), len(symbols),
+                    len(new), len(trades), report["refresh_ms"], report["evaluate_ms"], report["dispatch_ms"])
+        return report
+
+    async def _dispatch(self, trades: List[dict]) -> int:
+        jobs = []
+        for t in trades:
+            size = t["size_pct"] / 100.0  # percent -> fraction, as the webhook passes size_pct
+            if self.risk is not None and not self.risk.allowed_trade(size):
+                continue
+            signal_id = f"{t['symbol']}@{t['bar']}"
+            if hasattr(self.executor, "submit"):
+                self.executor.submit(t["symbol"], t["side"], size, signal_id=signal_id)
+                jobs.append(None)
+            else:
+                jobs.append(asyncio.to_thread(self.executor.place_order, t["symbol"], t["side"], size, signal_id))
+        await asyncio.gather(*(j for j in jobs if j is not None))
+        return len(jobs)
+
+    # ---------- scheduling ----------
+    async def _run_group(self, session: Session, symbols: List[str], max_cycles: Optional[int]):
+        n = 0
+        while max_cycles is None or n < max_cycles:
+            now = self.clock()
+            close = next_close(now, self.interval, session)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=(close - now) / 1e9 + self.settle_s)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.cycle(session, symbols, close)
+            except Exception:
+                logger.exception("Strategy cycle failed for %s at %s", session.tz, close)
+            n += 1
+
+    async def run(self, max_cycles: Optional[int] = None):
+        """Run every session group until stop() (or max_cycles cycles per group)."""
+        self._stop = asyncio.Event()
+        logger.info("Strategy loop: %d symbols, %s bars, sessions %s", len(self.hints), self.interval,
+                    {s.tz: len(v) for s, v in self.groups.items()})
+        await asyncio.gather(*(self._run_group(s, syms, max_cycles) for s, syms in self.groups.items()))
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def replay(self, provider, bars: int, warmup: int = 60) -> List[dict]:
+        """
+        Drive cycles from a replay_provider.ReplayProvider timeline as fast as possible (no sleeping).
+        The provider must be installed with universal_fetcher.set_replay_provider().
+        """
+        timeline = provider.timeline()
+        start = min(warmup, len(timeline))
+        for ts in timeline[start:start + bars].tolist():
+            provider.set_clock(ts)
+            for session, symbols in self.groups.items():
+                await self.cycle(session, symbols, ts + self.bar_ns)
+        provider.set_clock(None)
+        return list(self.cycles)
+
+
+def summarize(cycles: List[dict]) -> dict:
+    if not cycles:
+        return {}
+    df = pd.DataFrame(cycles)
+    return {"cycles": len(df), "changed_mean": float(df["changed"].mean()),
+            **{f"{c}_p50": float(df[c].median()) for c in ("refresh_ms", "evaluate_ms", "dispatch_ms", "total_ms")}}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", default="config_example.yml")
+    ap.add_argument("--interval", default=None, help="default: the config's interval")
+    ap.add_argument("--symbols", nargs="*", default=None, help="universe symbols (default: whole registry)")
+    ap.add_argument("--settle", type=float, default=2.0, help="seconds to wait after a bar close")
+    ap.add_argument("--replay", type=int, default=0, help="replay N synthetic symbols instead of live data")
+    ap.add_argument("--bars", type=int, default=200, help="replay: bars to run")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    cfg = yaml.safe_load(open(args.config))
+    interval = args.interval or cfg.get("interval", "15m")
+    from live.kite_executor import KiteExecutor
+    from live.risk_manager import RiskManager
+    executor = KiteExecutor(cfg if cfg.get("mode") == "live" else {})
+    risk = RiskManager(cfg)
+    if args.replay:
+        from replay_provider import ReplayProvider
+        from universal_fetcher import set_replay_provider
+        logging.getLogger().setLevel(logging.WARNING)
+        provider = ReplayProvider.synthetic(args.replay, args.bars + 60, interval)
+        set_replay_provider(provider)
+        loop = StrategyLoop(provider.symbols(), interval, executor=executor, risk=risk, period="30d")
+        print(summarize(asyncio.run(loop.replay(provider, args.bars))))
+    else:
+        symbols = args.symbols or [(r["universe_symbol"], r["provider_hint"]) for r in load_instrument_registry()]
+        loop = StrategyLoop(symbols, interval, executor=executor, risk=risk, settle_s=args.settle)
+        try:
+            asyncio.run(loop.run())
+        except KeyboardInterrupt:
+            pass
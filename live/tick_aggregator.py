@@ -0,0 +1,443 @@
+# live/tick_aggregator.py
+"""
+Streaming tick -> OHLCV bars for many symbols and intervals at once, so the live loop learns
+about a new bar from the ticks it already has instead of re-polling hundreds of bars.
+- feeds yield batches of (symbol, ts_ns, price, qty) ticks: KiteTickerFeed (Kite websocket),
+  CcxtTradesFeed (ccxt trades, polled within the exchange's token bucket) and SimulatedFeed
+  (random walk with out-of-order ticks, no network) for tests and benchmarks
+- buckets come from resample.bucket_of, so NSE bars are anchored at 09:15 IST like the
+  resampled history and ticks outside session hours are dropped
+- a bar is emitted only once its bucket has closed: when a tick at or past the bucket end
+  arrives (or flush() passes the end on a timer, for quiet symbols)
+- late ticks: out-of-order ticks inside the forming bucket are aggregated (open and close
+  stay the earliest / latest-timestamped prices); with grace_ms > 0 a closed bucket is held
+  that long (in tick time) and still takes late ticks; ticks for already emitted bars are
+  counted and dropped
+- per (symbol, interval) state is two fixed-size lists (forming and held bucket); the
+  in-bucket path is a range check and a few compares, ~0.5 us per tick and interval
+
+Usage:
+python -m live.tick_aggregator --simulate --symbols 200 --ticks 1000000 --intervals 1m 5m 15m
+python -m live.tick_aggregator --ccxt BINANCE:BTC/USDT BINANCE:ETH/USDT --intervals 1m
+"""
+
+import argparse
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from bar_store import OHLCV_COLUMNS, _ns_to_index
+from rate_limit import get_bucket
+from resample import Session, _parse_interval, bucket_of, session_for
+
+logger = logging.getLogger(__name__)
+
+Bar = namedtuple("Bar", "symbol interval start open high low close volume ticks")  # start: UTC ns
+
+# bucket record: [start, end, open, high, low, close, volume, ticks, ts of open, ts of close]
+_START, _END, _OPEN, _HIGH, _LOW, _CLOSE, _VOL, _N, _FIRST, _LAST = range(10)
+_NONE = ()
+
+
+class _SymbolState:
+    __slots__ = ("session", "cur", "held", "emitted", "max_ts")
+
+    def __init__(self, session: Session, n_intervals: int):
+        self.session = session
+        self.cur = [None] * n_intervals   # forming bucket per interval
+        self.held = [None] * n_intervals  # closed bucket waiting out the grace period
+        self.emitted = [0] * n_intervals  # end of the newest emitted bucket
+        self.max_ts = 0
+
+
+class TickAggregator:
+    def __init__(self, intervals: Sequence[str], grace_ms: float = 0.0,
+                 session: Optional[Callable[[str], Session]] = None):
+        """
+        intervals: bar intervals to build, e.g. ["1m", "5m", "15m"].
+        grace_ms: how long (in tick time) a closed bucket still accepts late ticks before it is
+        emitted; keep it below the shortest interval.
+        session: symbol -> Session (default resample.session_for on the universe symbol).
+        """
+        self.intervals = list(intervals)
+        for iv in self.intervals:
+            _parse_interval(iv)
+        self.grace_ns = int(grace_ms * 1e6)
+        self.session_for = session or session_for
+        self._symbols: Dict[str, _SymbolState] = {}
+        self.stats = {"ticks": 0, "bars": 0, "late_in_bucket": 0, "late_in_grace": 0,
+                      "late_dropped": 0, "outside_session": 0}
+
+    def _state(self, symbol: str) -> _SymbolState:
+        st = self._symbols.get(symbol)
+        if st is None:
+            st = self._symbols[symbol] = _SymbolState(self.session_for(symbol), len(self.intervals))
+        return st
+
+    def update(self, symbol: str, ts: int, price: float, qty: float = 0.0) -> List[Bar]:
+        """Add one tick (ts in UTC ns). Returns the bars it closed (usually none)."""
+        st = self._symbols.get(symbol) or self._state(symbol)
+        self.stats["ticks"] += 1
+        if ts > st.max_ts:
+            st.max_ts = ts
+        out = _NONE
+        cur_list = st.cur
+        for i, cur in enumerate(cur_list):
+            if cur is not None and cur[_START] <= ts < cur[_END]:
+                if price > cur[_HIGH]:
+                    cur[_HIGH] = price
+                elif price < cur[_LOW]:
+                    cur[_LOW] = price
+                if ts >= cur[_LAST]:
+                    cur[_CLOSE] = price
+                    cur[_LAST] = ts
+                else:
+                    self.stats["late_in_bucket"] += 1
+                    if ts < cur[_FIRST]:
+                        cur[_OPEN] = price
+                        cur[_FIRST] = ts
+                cur[_VOL] += qty
+                cur[_N] += 1
+            else:
+                out = self._boundary(symbol, st, i, ts, price, qty, out)
+            held = st.held[i]
+            if held is not None and st.max_ts - self.grace_ns >= held[_END]:
+                st.held[i] = None
+                out = self._emit(symbol, st, i, held, out)
+        return out
+
+    def _boundary(self, symbol, st, i, ts, price, qty, out):
+        """Tick outside the forming bucket: late, in the held bucket, or the start of a new one."""
+        cur, held = st.cur[i], st.held[i]
+        if held is not None and held[_START] <= ts < held[_END]:
+            _add(held, ts, price, qty)
+            self.stats["late_in_grace"] += 1
+            return out
+        if ts < st.emitted[i] or (cur is not None and ts < cur[_START]):
+            self.stats["late_dropped"] += 1
+            return out
+        bucket = bucket_of(ts, self.intervals[i], st.session)
+        if bucket is None:
+            if i == 0:
+                self.stats["outside_session"] += 1
+            return out
+        if cur is not None:
+            if held is not None:
+                out = self._emit(symbol, st, i, held, out)
+            st.held[i] = cur
+        st.cur[i] = [bucket[0], bucket[1], price, price, price, price, qty, 1, ts, ts]
+        return out
+
+    def _emit(self, symbol, st, i, rec, out):
+        self.stats["bars"] += 1
+        if rec[_END] > st.emitted[i]:
+            st.emitted[i] = rec[_END]
+        bar = Bar(symbol, self.intervals[i], rec[_START], rec[_OPEN], rec[_HIGH], rec[_LOW],
+                  rec[_CLOSE], rec[_VOL], rec[_N])
+        if out is _NONE:
+            return [bar]
+        out.append(bar)
+        return out
+
+    def update_many(self, ticks: Iterable) -> List[Bar]:
+        """Add a batch of (symbol, ts_ns, price, qty) ticks; returns the closed bars in order."""
+        closed = []
+        update = self.update
+        for symbol, ts, price, qty in ticks:
+            bars = update(symbol, ts, price, qty)
+            if bars:
+                closed.extend(bars)
+        return closed
+
+    def flush(self, now_ns: Optional[int] = None) -> List[Bar]:
+        """
+        Emit buckets that have ended by now_ns (minus the grace period), for symbols whose next
+        tick has not come yet, e.g. on a timer at each bar close or at the session close.
+        now_ns None emits every bucket, forming ones included (end of a feed).
+        """
+        out = []
+        cutoff = None if now_ns is None else int(now_ns) - self.grace_ns
+        for symbol, st in self._symbols.items():
+            for i in range(len(self.intervals)):
+                for slot in (st.held, st.cur):
+                    rec = slot[i]
+                    if rec is not None and (cutoff is None or cutoff >= rec[_END]):
+                        slot[i] = None
+                        out = self._emit(symbol, st, i, rec, out)
+        out.sort(key=lambda b: (b.start, b.symbol))
+        return out
+
+    def current(self, symbol: str, interval: str) -> Optional[Bar]:
+        """The forming bar of (symbol, interval), or None."""
+        st = self._symbols.get(symbol)
+        rec = st.cur[self.intervals.index(interval)] if st is not None else None
+        if rec is None:
+            return None
+        return Bar(symbol, interval, rec[_START], rec[_OPEN], rec[_HIGH], rec[_LOW], rec[_CLOSE], rec[_VOL], rec[_N])
+
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+
+def _add(rec, ts, price, qty):
+    if price > rec[_HIGH]:
+        rec[_HIGH] = price
+    elif price < rec[_LOW]:
+        rec[_LOW] = price
+    if ts >= rec[_LAST]:
+        rec[_CLOSE] = price
+        rec[_LAST] = ts
+    elif ts < rec[_FIRST]:
+        rec[_OPEN] = price
+        rec[_FIRST] = ts
+    rec[_VOL] += qty
+    rec[_N] += 1
+
+
+def bars_to_frame(bars: Iterable[Bar], symbol: str = None, interval: str = None, tz: str = "UTC") -> pd.DataFrame:
+    """OHLCV frame (bar_store layout) of the bars for one symbol/interval."""
+    rows = [b for b in bars if (symbol is None or b.symbol == symbol) and (interval is None or b.interval == interval)]
+    keys = np.array([b.start for b in rows], dtype=np.int64)
+    values = np.array([(b.open, b.high, b.low, b.close, b.volume) for b in rows], dtype=np.float64).reshape(-1, 5)
+    return pd.DataFrame(values, index=_ns_to_index(keys, tz), columns=OHLCV_COLUMNS)
+
+
+# ---------------- feeds ----------------
+
+class SimulatedFeed:
+    """
+    Random-walk ticks for n symbols, no network. late_frac of the ticks are delivered up to
+    max_delay_ms late, so their timestamps go backwards. Iterating yields batches.
+    """
+    realtime = False
+
+    def __init__(self, symbols, n_ticks: int = 1_000_000, ticks_per_s: float = 1000.0,
+                 start: str = "2024-01-02 00:00", batch: int = 10_000, late_frac: float = 0.0,
+                 max_delay_ms: float = 500.0, seed: int = 0):
+        self.symbols = [f"SIM:S{i:04d}" for i in range(symbols)] if isinstance(symbols, int) else list(symbols)
+        self.n_ticks = n_ticks
+        self.ticks_per_s = ticks_per_s
+        self.start_ns = int(pd.Timestamp(start, tz="UTC").value)
+        self.batch = batch
+        self.late_frac = late_frac
+        self.max_delay_ns = int(max_delay_ms * 1e6)
+        self.seed = seed
+
+    def __iter__(self) -> Iterator[List[tuple]]:
+        rng = np.random.default_rng(self.seed)
+        n_sym = len(self.symbols)
+        price = np.full(n_sym, 100.0)
+        gap_ns = 1e9 / self.ticks_per_s
+        t0 = self.start_ns
+        for lo in range(0, self.n_ticks, self.batch):
+            n = min(self.batch, self.n_ticks - lo)
+            which = rng.integers(0, n_sym, n)
+            ts = t0 + np.cumsum(rng.exponential(gap_ns, n)).astype(np.int64)
+            t0 = int(ts[-1])
+            steps = rng.normal(0.0, 0.0005, n)
+            px = np.empty(n)
+            # per-symbol random walk in tick order
+            for j in range(n):
+                k = which[j]
+                price[k] *= 1.0 + steps[j]
+                px[j] = price[k]
+            qty = rng.integers(1, 100, n).astype(np.float64)
+            if self.late_frac:
+                late = rng.random(n) < self.late_frac
+                # delivered later than stamped: same order of arrival, older timestamp
+                ts = np.where(late, ts - rng.integers(0, self.max_delay_ns + 1, n), ts)
+            syms = self.symbols
+            yield [(syms[k], t, p, q) for k, t, p, q in zip(which.tolist(), ts.tolist(), px.tolist(), qty.tolist())]
+
+    def close(self):
+        pass
+
+
+IST_OFFSET_S = 19800  # Kite timestamps are naive IST
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _kite_ts_ns(dt_ist: Optional[datetime]) -> int:
+    if dt_ist is None:
+        return time.time_ns()
+    d = dt_ist - _EPOCH
+    return (d.days * 86400 + d.seconds - IST_OFFSET_S) * 10**9 + d.microseconds * 1000
+
+
+class KiteTickerFeed:
+    """
+    Kite websocket ticks (kiteconnect.KiteTicker, quote mode) for {instrument_token: universe
+    symbol}; tokens can be looked up in live/instrument_store.py. Traded quantity per tick is
+    the change in the day's cumulative volume, so trades between two ticks are not lost.
+    """
+    realtime = True
+
+    def __init__(self, cfg, tokens: Dict[int, str], max_queue: int = 100_000, poll_s: float = 0.25):
+        from kiteconnect import KiteTicker  # only live feeds need it
+        z = cfg.get("zerodha", {})
+        self.tokens = {int(k): v for k, v in tokens.items()}
+        self.poll_s = poll_s
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._volume = {}
+        self._closed = threading.Event()
+        self.dropped = 0
+        self.ws = KiteTicker(z.get("api_key"), z.get("access_token"))
+        self.ws.on_ticks = self._on_ticks
+        self.ws.on_connect = self._on_connect
+        self.ws.on_close = lambda ws, code, reason: logger.warning("Kite ticker closed: %s %s", code, reason)
+
+    def _on_connect(self, ws, response):
+        tokens = list(self.tokens)
+        ws.subscribe(tokens)
+        ws.set_mode(ws.MODE_QUOTE, tokens)
+
+    def _on_ticks(self, ws, ticks):
+        batch = []
+        for t in ticks:
+            sym = self.tokens.get(t.get("instrument_token"))
+            if sym is None or "last_price" not in t:
+                continue
+            total = t.get("volume_traded")
+            if total is not None:
+                prev = self._volume.get(sym)
+                self._volume[sym] = total
+                qty = float(total - prev) if prev is not None and total >= prev else float(t.get("last_traded_quantity", 0))
+            else:
+                qty = float(t.get("last_traded_quantity", 0))
+            batch.append((sym, _kite_ts_ns(t.get("exchange_timestamp")), float(t["last_price"]), qty))
+        if batch:
+            try:
+                self._queue.put_nowait(batch)
+            except queue.Full:
+                self.dropped += len(batch)
+                logger.warning("Tick queue full, dropped %d ticks", len(batch))
+
+    def __iter__(self) -> Iterator[List[tuple]]:
+        self.ws.connect(threaded=True)
+        while not self._closed.is_set():
+            try:
+                yield self._queue.get(timeout=self.poll_s)
+            except queue.Empty:
+                yield []  # lets the consumer run its bar-close timer
+
+    def close(self):
+        self._closed.set()
+        self.ws.close()
+
+
+class CcxtTradesFeed:
+    """
+    Public trades of universe symbols (e.g. BINANCE:BTC/USDT) polled with ccxt fetch_trades,
+    each call paced by the exchange's token bucket. Trades seen in the previous poll are skipped
+    by (timestamp, id).
+    """
+    realtime = True
+
+    def __init__(self, symbols: Sequence[str], poll_s: float = 1.0, limit: int = 1000):
+        from universal_fetcher import get_ccxt_exchange, get_router
+        self.routes = [get_router().resolve(s) for s in symbols]
+        self.exchanges = {r.exchange: get_ccxt_exchange(r.exchange) for r in self.routes}
+        self.poll_s = poll_s
+        self.limit = limit
+        self._since = {}  # univ symbol -> (last ms, ids at that ms)
+        self._closed = threading.Event()
+
+    def _poll(self, route) -> List[tuple]:
+        get_bucket(route.bucket).acquire()
+        since, seen = self._since.get(route.univ_symbol, (None, set()))
+        try:
+            trades = self.exchanges[route.exchange].fetch_trades(route.symbol, since=since, limit=self.limit)
+        except Exception as e:
+            logger.warning("fetch_trades %s failed: %s", route.univ_symbol, e)
+            return []
+        out = []
+        for tr in trades:
+            ms = tr.get("timestamp")
+            if ms is None or (since is not None and (ms < since or (ms == since and tr.get("id") in seen))):
+                continue
+            out.append((route.univ_symbol, int(ms) * 1_000_000, float(tr["price"]), float(tr.get("amount") or 0.0)))
+        if trades:
+            last = max(tr["timestamp"] for tr in trades if tr.get("timestamp") is not None)
+            ids = {tr.get("id") for tr in trades if tr.get("timestamp") == last}
+            self._since[route.univ_symbol] = (last, ids | seen if last == since else ids)
+        return out
+
+    def __iter__(self) -> Iterator[List[tuple]]:
+        while not self._closed.is_set():
+            t0 = time.monotonic()
+            batch = []
+            for route in self.routes:
+                batch.extend(self._poll(route))
+            batch.sort(key=lambda t: t[1])
+            yield batch
+            self._closed.wait(max(0.0, self.poll_s - (time.monotonic() - t0)))
+
+    def close(self):
+        self._closed.set()
+
+
+def run_feed(feed, aggregator: TickAggregator, on_bar: Callable[[Bar], None], flush_every_s: float = 1.0,
+             max_ticks: Optional[int] = None) -> dict:
+    """
+    Drive aggregator from feed, calling on_bar for every closed bar. Real-time feeds also close
+    buckets on the wall clock every flush_every_s, so a quiet symbol's bar is not held until its
+    next tick. Returns the aggregator stats plus wall time and ticks per second.
+    """
+    t0 = time.perf_counter()
+    last_flush = time.monotonic()
+    try:
+        for batch in feed:
+            for bar in aggregator.update_many(batch):
+                on_bar(bar)
+            if feed.realtime and time.monotonic() - last_flush >= flush_every_s:
+                last_flush = time.monotonic()
+                for bar in aggregator.flush(time.time_ns()):
+                    on_bar(bar)
+            if max_ticks is not None and aggregator.stats["ticks"] >= max_ticks:
+                break
+    finally:
+        feed.close()
+    if not feed.realtime:
+        for bar in aggregator.flush():
+            on_bar(bar)
+    wall = time.perf_counter() - t0
+    return {**aggregator.stats, "wall_s": wall, "ticks_per_s": aggregator.stats["ticks"] / wall if wall > 0 else None}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--intervals", nargs="+", default=["1m", "5m", "15m"])
+    ap.add_argument("--grace-ms", type=float, default=0.0)
+    ap.add_argument("--simulate", action="store_true", help="synthetic ticks, no network")
+    ap.add_argument("--symbols", type=int, default=100, help="simulate: number of symbols")
+    ap.add_argument("--ticks", type=int, default=1_000_000, help="simulate: number of ticks")
+    ap.add_argument("--late-frac", type=float, default=0.01, help="simulate: share of late ticks")
+    ap.add_argument("--ccxt", nargs="*", default=None, help="universe symbols to stream via ccxt trades")
+    ap.add_argument("--print-bars", action="store_true")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.ccxt:
+        feed = CcxtTradesFeed(args.ccxt)
+    else:
+        feed = SimulatedFeed(args.symbols, n_ticks=args.ticks, late_frac=args.late_frac)
+    agg = TickAggregator(args.intervals, grace_ms=args.grace_ms)
+    counts = {}
+
+    def _on_bar(bar):
+        counts[bar.interval] = counts.get(bar.interval, 0) + 1
+        if args.print_bars:
+            print(bar)
+
+    try:
+        report = run_feed(feed, agg, _on_bar)
+    except KeyboardInterrupt:
+        report = dict(agg.stats)
+    print({**report, "bars_by_interval": counts})
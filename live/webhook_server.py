@@ -5,14 +5,29 @@ TradingView alert should send JSON like:
 {
   "action": "BUY",
   "symbol": "AAPL",
-  "size_pct": 1.0
-}
+  "size_pct": 1.0,
+  "id": "optional-unique-signal-id",
+  "qty": 10, "price": 2450.5          # optional: order quantity (1 if omitted); with price,
+}                                     #   enables the exposure-aware risk check
+With webhook.mode = "async" (config) the alert is validated, risk-checked and queued, and
+answered with 202 right away; order workers place it in the background. Poll
+GET /orders/<signal_id> for the result and GET /queue for depth. A full queue answers 429.
+With execution.coalesce_window_ms > 0 in sync mode the alert is answered 202 "coalescing"
+without an order result: same-symbol alerts within the window are netted by qty and sent as
+one order when the window closes; the outcome is logged and kept in the executor's history.
+GET /metrics serves per-stage latency histograms and counters in Prometheus text format.
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 import yaml
 import argparse
-from live.kite_executor import KiteExecutor
+import time
+import uuid
+from live.kite_executor import KiteExecutor, CoalescingExecutor
 from live.risk_manager import RiskManager
+from live.order_queue import OrderQueue
+from live.model_registry import ModelRegistry, ModelHandle, DEFAULT_REGISTRY
+from scripts.features import FEATURE_COLS, add_technical_indicators
+from metrics import gauge, inc, observe, render_prometheus, span
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -21,10 +36,30 @@ app = Flask(__name__)
 cfg = None
 executor = None
 risk = None
+models = None  # ModelHandle, preloaded at boot
+orders = None  # OrderQueue in async mode, None for synchronous order placement
+
+gauge("order_queue_depth", lambda: orders.depth() if orders is not None else 0, "Orders waiting for a worker")
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def _record_request(resp):
+    endpoint = request.endpoint or "unknown"
+    observe("request", time.perf_counter() - g.t0, endpoint=endpoint)
+    inc("http_requests_total", endpoint=endpoint, status=resp.status_code)
+    return resp
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    data = request.get_json()
+    with span("parse"):
+        data = request.get_json()
     logging.info("Received webhook: %s", data)
     # Basic validation
     if not data or "action" not in data:
@@ -32,23 +67,189 @@ def webhook():
     action = data["action"].upper()
     symbol = data.get("symbol", cfg.get("symbol"))
     size_pct = float(data.get("size_pct", 1.0))
+    qty = float(data["qty"]) if "qty" in data else None
+    if action not in ("BUY", "SELL"):
+        return jsonify({"status":"unknown_action"}), 400
     # Risk checks
-    if not risk.allowed_trade(size_pct):
+    with span("risk"):
+        allowed = risk.allowed_trade(size_pct)
+    if not allowed:
         return jsonify({"status":"blocked_by_risk"}), 403
-    if action == "BUY":
-        res = executor.place_order(symbol, "BUY", size_pct)
-    elif action == "SELL":
-        res = executor.place_order(symbol, "SELL", size_pct)
-    else:
-        return jsonify({"status":"unknown_action"}), 400
+    signal_id = str(data.get("id") or uuid.uuid4().hex)
+    if orders is not None and orders.result(signal_id) is not None:
+        return jsonify({"status":"duplicate","signal_id":signal_id,"queue_depth":orders.depth()}), 202
+    reserved = False
+    if "qty" in data and "price" in data:
+        # exposure-aware check; the reservation is settled when the order completes
+        with span("risk"):
+            ok, reason, _ = risk.check_and_reserve(symbol, action, qty, float(data["price"]),
+                                                   reservation_id=signal_id)
+        if reason == "duplicate":
+            # same id still in flight: leave its reservation alone
+            return jsonify({"status":"duplicate","signal_id":signal_id}), 202
+        if not ok:
+            return jsonify({"status":"blocked_by_risk","reason":reason}), 403
+        reserved = True
+    if orders is not None:
+        with span("enqueue"):
+            signal_id, status = orders.submit(symbol, action, size_pct, signal_id=signal_id, qty=qty)
+        if reserved and status != "queued":
+            risk.release(signal_id)  # the reservation this request just made
+        if status == "rejected":
+            resp = jsonify({"status":"queue_full","signal_id":signal_id,"queue_depth":orders.depth()})
+            return resp, 429, {"Retry-After": "1"}
+        return jsonify({"status":status,"signal_id":signal_id,"queue_depth":orders.depth()}), 202
+    if hasattr(executor, "place_order_async"):
+        # coalescing: the order goes out when its batch window closes, not inside this request
+        with span("execute"):
+            fut = executor.place_order_async(symbol, action, size_pct, signal_id=signal_id, qty=qty)
+        if reserved:
+            fut.add_done_callback(lambda f: settle_reservation(
+                {"signal_id": signal_id, "result": f.result(),
+                 "status": "failed" if "error" in f.result() else "done"}))
+        return jsonify({"status":"coalescing","signal_id":signal_id}), 202
+    with span("execute"):
+        res = executor.place_order(symbol, action, size_pct, signal_id=signal_id, qty=qty)
+    if reserved:
+        settle_reservation({"signal_id": signal_id, "result": res,
+                            "status": "failed" if isinstance(res, dict) and "error" in res else "done"})
     return jsonify({"status":"ok","result":res})
 
+def settle_reservation(rec):
+    """
+    Order finished: book the reserved exposure as a fill, or drop it if the order failed.
+    A coalesced batch settles all its signals at once from what the broker was sent: the net
+    residual qty is booked when an order was placed, and nothing when the signals netted out.
+    """
+    res = rec.get("result")
+    if isinstance(res, dict) and "signals" in res:
+        if res["status"] == "placed":
+            risk.fill_net(res["signals"])
+        else:
+            for sid in res["signals"]:
+                risk.release(sid)
+        return
+    rid = rec["signal_id"]
+    if rid not in risk.reservations:
+        return
+    if rec["status"] == "failed":
+        risk.release(rid)
+    else:
+        risk.fill(rid)
+
+@app.route("/orders/<signal_id>", methods=["GET"])
+def order_status(signal_id):
+    if orders is None:
+        return jsonify({"error":"async ingestion disabled"}), 404
+    rec = orders.result(signal_id)
+    if rec is None:
+        return jsonify({"error":"unknown signal id"}), 404
+    return jsonify(rec)
+
+@app.route("/queue", methods=["GET"])
+def queue_status():
+    if orders is None:
+        return jsonify({"mode":"sync"})
+    return jsonify({"mode":"async", **orders.stats()})
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    version, _ = models.get() if models else (None, None)
+    if version is None:
+        return jsonify({"ready": False}), 503
+    return jsonify({"ready": True, "model_version": version})
+
+def latest_features(symbol, interval):
+    """Feature row (FEATURE_COLS order) for the most recent complete indicator bar of a symbol."""
+    from universal_fetcher import fetch_market_data  # heavy import, only needed on this path
+    df = fetch_market_data(symbol, interval=interval, period="30d")
+    if df is None or df.empty:
+        return None
+    with span("features"):
+        feats = add_technical_indicators(df[["open","high","low","close","volume"]])
+    if feats.empty:
+        return None
+    return feats[FEATURE_COLS].iloc[-1].to_numpy(dtype=float)
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    """
+    {"features": {"close": .., "volume": .., ...}} or {"features": [..]} in FEATURE_COLS order,
+    or {"symbol": "NSE:RELIANCE", "interval": "15m"} to compute the latest features server-side.
+    """
+    version, model = models.get() if models else (None, None)
+    if model is None:
+        return jsonify({"error":"model not ready"}), 503
+    data = request.get_json() or {}
+    feats = data.get("features")
+    try:
+        if isinstance(feats, dict):
+            row = [float(feats[c]) for c in FEATURE_COLS]
+        elif feats is not None:
+            row = [float(x) for x in feats]
+            if len(row) != len(FEATURE_COLS):
+                raise ValueError(f"expected {len(FEATURE_COLS)} features")
+        elif data.get("symbol"):
+            row = latest_features(data["symbol"], data.get("interval", cfg.get("interval", "15m")))
+            if row is None:
+                return jsonify({"error":"no data"}), 404
+        else:
+            return jsonify({"error":"bad payload"}), 400
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"bad features: {e}"}), 400
+    with span("predict"):
+        proba = model.predict_proba([row])[0]
+    pred = int(model.classes[proba.argmax()])
+    return jsonify({"model_version": version, "prediction": pred,
+                    "proba": {str(int(c)): float(p) for c, p in zip(model.classes, proba)}})
+
+@app.route("/models/activate", methods=["POST"])
+def activate_model():
+    """Hot-swap: {"version": "v0003"} (omit version to reload the manifest's active one)."""
+    data = request.get_json() or {}
+    try:
+        if data.get("version"):
+            version = models.activate(data["version"])
+        else:
+            version = models.swap()
+    except (KeyError, FileNotFoundError) as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"status":"ok","model_version": version})
+
+def load_models(cfg):
+    """Preload the active model so the first /predict does not pay for loading."""
+    handle = ModelHandle(ModelRegistry(cfg.get("model_registry", DEFAULT_REGISTRY)))
+    try:
+        handle.swap()
+    except FileNotFoundError as e:
+        logging.warning("No model loaded at boot: %s", e)
+    handle.watch(cfg.get("model_reload_interval_sec", 5.0))
+    return handle
+
+def make_order_queue(cfg, executor):
+    """OrderQueue for webhook.mode == "async", else None (orders placed inside the request)."""
+    wcfg = cfg.get("webhook", {})
+    if wcfg.get("mode", "sync") != "async":
+        return None
+    return OrderQueue(executor, maxsize=wcfg.get("queue_size", 1000), workers=wcfg.get("order_workers", 4),
+                      on_done=settle_reservation)
+
 def start_server(config_path):
-    global cfg, executor, risk
+    global cfg, executor, risk, models, orders
     cfg = yaml.safe_load(open(config_path))
     executor = KiteExecutor(cfg)
+    window_ms = cfg.get("execution", {}).get("coalesce_window_ms", 0)
+    if window_ms:
+        executor = CoalescingExecutor(executor, window_s=window_ms / 1000.0)
     risk = RiskManager(cfg)
-    app.run(host=cfg["server"]["host"], port=cfg["server"]["port"])
+    risk.autosnapshot()
+    models = load_models(cfg)
+    orders = make_order_queue(cfg, executor)
+    try:
+        app.run(host=cfg["server"]["host"], port=cfg["server"]["port"], threaded=True)
+    finally:
+        if risk.snapshot_path:
+            risk.snapshot()
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
@@ -0,0 +1,283 @@
+# metrics.py
+"""
+In-process latency histograms and counters for the hot paths (alert -> order, fetch -> predict).
+- span("stage", provider=...) times a block into a fixed-bucket histogram; @timed does the same
+  for a function. One perf_counter pair, a bisect and a locked add: ~1 us, fine to leave on
+- inc("fetch_failures_total", provider=...) for counters, gauge() for values read at scrape time
+- render_prometheus() gives the Prometheus text format (served at /metrics by the webhook
+  server); snapshot() / dump_json() for batch scripts
+- METRICS_DISABLED=1 turns span/inc into no-ops
+
+Usage:
+from metrics import span, inc
+with span("fetch", provider="yfinance"):
+    df = fetch(...)
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+PREFIX = "trading_"
+# seconds; 100 us .. 10 s covers a risk check up to a slow provider download
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+enabled = os.getenv("METRICS_DISABLED", "") not in ("1", "true", "yes")
+# HELP text for metrics incremented from several places, so call sites need not repeat it
+HELP = {
+    "stage_latency_seconds": "Latency of hot-path stages",
+    "fetch_failures_total": "Market-data fetches that raised",
+    "fetch_empty_total": "Market-data fetches that returned no bars",
+    "provider_request_errors_total": "Failed backfill window requests (including retried ones)",
+    "trades_blocked_total": "Trades rejected by the risk manager",
+    "order_errors_total": "Broker order placements that raised",
+    "http_requests_total": "Webhook server requests by endpoint and status",
+}
+
+
+def _key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def _fmt_labels(key: Tuple, extra: Tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, esc)) + "}"
+
+
+def _fmt_num(v: float) -> str:
+    return repr(float(v)) if v != float("inf") else "+Inf"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts (len(buckets) + 1), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, key: Tuple = ()):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(c), total, n) for k, (c, total, n) in self._series.items()]
+        for key, counts, total, n in sorted(series):
+            cum = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', _fmt_num(le)),))} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_num(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {n}")
+        return lines
+
+    def snapshot(self):
+        out = []
+        with self._lock:
+            series = [(k, list(c), total, n) for k, (c, total, n) in self._series.items()]
+        for key, counts, total, n in sorted(series):
+            out.append({"labels": dict(key), "count": n, "sum": total, "mean": total / n if n else None,
+                        "p50": _quantile(self.buckets, counts, n, 0.5),
+                        "p99": _quantile(self.buckets, counts, n, 0.99),
+                        "buckets": dict(zip(map(_fmt_num, self.buckets + (float("inf"),)), counts))})
+        return out
+
+
+def _quantile(buckets, counts, n, q) -> Optional[float]:
+    """Upper bound of the bucket holding the q-quantile (what histogram_quantile would bracket)."""
+    if not n:
+        return None
+    target = q * n
+    cum = 0
+    for le, c in zip(buckets + (float("inf"),), counts):
+        cum += c
+        if cum >= target:
+            return le if le != float("inf") else None
+    return None
+
+
+class Counter:
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1, key: Tuple = ()):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"] + \
+               [f"{self.name}{_fmt_labels(k)} {_fmt_num(v)}" for k, v in items]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(k), "value": v} for k, v in sorted(self._values.items())]
+
+
+class Gauge:
+    """Value read when metrics are rendered, e.g. gauge("order_queue_depth", fn=orders.depth)."""
+
+    def __init__(self, name: str, help: str = "", fn: Callable[[], float] = None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def value(self):
+        try:
+            return float(self.fn())
+        except Exception:
+            return None
+
+    def render(self):
+        v = self.value()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        return lines + ([f"{self.name} {_fmt_num(v)}"] if v is not None else [])
+
+    def snapshot(self):
+        return [{"labels": {}, "value": self.value()}]
+
+
+class Registry:
+    def __init__(self, prefix: str = PREFIX):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kw):
+        full = self.prefix + name
+        m = self._metrics.get(full)
+        if m is None:
+            with self._lock:
+                m = self._metrics.get(full)
+                if m is None:
+                    m = self._metrics[full] = cls(full, help or HELP.get(name, ""), **kw)
+        return m
+
+    def histogram(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, fn: Callable[[], float], help: str = "") -> Gauge:
+        g = self._get(Gauge, name, help, fn=fn)
+        g.fn = fn
+        return g
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {name: {"type": type(m).__name__.lower(), "help": m.help, "series": m.snapshot()}
+                for name, m in sorted(self._metrics.items())}
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = Registry()
+STAGE_HISTOGRAM = "stage_latency_seconds"
+
+
+class _Span:
+    __slots__ = ("hist", "key", "t0")
+
+    def __init__(self, hist, key):
+        self.hist = hist
+        self.key = key
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, self.key)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str, **labels):
+    """Time a block into trading_stage_latency_seconds{stage=..., **labels}."""
+    if not enabled:
+        return _NO_SPAN
+    labels["stage"] = stage
+    return _Span(REGISTRY.histogram(STAGE_HISTOGRAM), _key(labels))
+
+
+def observe(stage: str, seconds: float, **labels):
+    """Record an already measured duration for a stage."""
+    if enabled:
+        labels["stage"] = stage
+        REGISTRY.histogram(STAGE_HISTOGRAM).observe(seconds, _key(labels))
+
+
+def timed(stage: str, **labels):
+    """Decorator form of span()."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with span(stage, **labels):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
+
+
+def inc(name: str, n: float = 1, help: str = "", **labels):
+    """Add n to counter trading_<name>{labels}."""
+    if enabled:
+        REGISTRY.counter(name, help).inc(n, _key(labels))
+
+
+def gauge(name: str, fn: Callable[[], float], help: str = ""):
+    return REGISTRY.gauge(name, fn, help)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+
+def snapshot() -> dict:
+    return REGISTRY.snapshot()
+
+
+def dump_json(path: str):
+    """Write snapshot() to path (for batch scripts)."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "metrics": snapshot()},
+                                     indent=2))
@@ -0,0 +1,77 @@
+# rate_limit.py
+"""
+Per-provider token buckets shared by every fetcher thread in the process.
+- one bucket per provider key: "yfinance", "kite", "ccxt:<exchange>"
+- rates are requests/second with a small burst; override with configure()
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# provider -> (requests per second, burst). "ccxt" is the default for every ccxt exchange.
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "yfinance": (2.0, 4),
+    "kite": (3.0, 3),       # Kite Connect historical API: 3 req/s
+    "kite:quote": (1.0, 1), # quote / ltp / ohlc: 1 req/s
+    "kite:ltp": (1.0, 1),
+    "ccxt": (10.0, 10),
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket. acquire() blocks until a token is available."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available. Returns the time spent waiting (seconds)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def configure(provider: str, rate: float, capacity: Optional[float] = None):
+    """Set (or replace) the limit for a provider key, e.g. configure("ccxt:binance", 20, 20)."""
+    with _buckets_lock:
+        _buckets[provider] = TokenBucket(rate, capacity)
+
+
+def get_bucket(provider: str) -> TokenBucket:
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            family = provider.split(":", 1)[0]
+            rate, burst = DEFAULT_RATE_LIMITS.get(provider, DEFAULT_RATE_LIMITS.get(family, (1.0, 1)))
+            bucket = _buckets[provider] = TokenBucket(rate, burst)
+        return bucket
@@ -0,0 +1,176 @@
+# replay_provider.py
+"""
+Offline market data for replay and load tests.
+- serves OHLCV bars from the bar cache (bar_store.py), a directory of CSVs or synthetic
+  series (benchmarks/synthetic.py)
+- a replay clock hides every bar after the current time, so consumers see the market
+  exactly as it was at that moment
+- also answers the Kite client calls the live code uses (ltp, quote, place_order,
+  instruments), so KiteHelper / KiteExecutor can run against it unchanged
+
+Plug it behind fetch_market_data with universal_fetcher.set_replay_provider(provider).
+"""
+
+import itertools
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_store import (OHLCV_COLUMNS, BarStore, _index_to_ns, _ns_to_index, _ts_to_ns,
+                       interval_to_timedelta, period_to_timedelta)
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayProvider:
+    def __init__(self, frames: Dict[str, pd.DataFrame], interval: str = "15m", spread_bps: float = 2.0):
+        self.interval = interval
+        self.spread_bps = spread_bps
+        self._data = {}  # symbol -> (int64 ns index, (n, 5) float array, tz)
+        for sym, df in frames.items():
+            if df is None or df.empty:
+                continue
+            tz = str(df.index.tz) if getattr(df.index, "tz", None) is not None else None
+            self._data[sym] = (_index_to_ns(df.index), df[OHLCV_COLUMNS].to_numpy(dtype=np.float64), tz)
+        self.clock_ns = None  # None = no clock, everything is visible
+        self.orders = []
+        self._order_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # ---------- sources ----------
+    @classmethod
+    def from_bar_store(cls, root: str = None, interval: str = "15m", symbols: Optional[List[str]] = None):
+        store = BarStore(root) if root else BarStore()
+        if symbols is None:
+            symbols = []
+            for meta_path in store.root.glob(f"*/{interval}/meta.json"):
+                meta = store.read_meta(meta_path.parent.parent.name, interval)
+                symbols.append(meta.get("symbol", meta_path.parent.parent.name))
+        return cls({s: store.load(s, interval) for s in symbols}, interval)
+
+    @classmethod
+    def from_csv_dir(cls, path: str, interval: str = "15m"):
+        """One <symbol>.csv per symbol (first column = timestamp); '__' in a file name stands for ':'."""
+        frames = {}
+        for f in sorted(Path(path).glob("*.csv")):
+            df = pd.read_csv(f, index_col=0, parse_dates=True)
+            df.columns = [c.lower() for c in df.columns]
+            frames[f.stem.replace("__", ":")] = df
+        return cls(frames, interval)
+
+    @classmethod
+    def synthetic(cls, n_symbols: int = 10, n_bars: int = 5000, interval: str = "15m", seed: int = 0):
+        from benchmarks.synthetic import universe
+        freq = interval_to_timedelta(interval)
+        return cls(dict(universe(n_symbols, n_bars, seed=seed, freq=freq)), interval)
+
+    # ---------- clock ----------
+    def symbols(self) -> List[str]:
+        return list(self._data)
+
+    def timeline(self) -> np.ndarray:
+        """Sorted unique bar times (int64 UTC ns) across all symbols."""
+        if not self._data:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate([idx for idx, _, _ in self._data.values()]))
+
+    def set_clock(self, ts):
+        """Bars stamped after ts become invisible. ts: Timestamp, int ns, or None to clear."""
+        self.clock_ns = None if ts is None else (ts if isinstance(ts, (int, np.integer)) else _ts_to_ns(ts))
+
+    def _visible(self, idx) -> int:
+        return len(idx) if self.clock_ns is None else int(np.searchsorted(idx, self.clock_ns, side="right"))
+
+    # ---------- bars ----------
+    def ohlcv(self, symbol: str, interval: str = None, period: str = None, start=None, end=None,
+              lookback: int = None) -> pd.DataFrame:
+        """Bars up to the clock; limited by period / [start, end) / the last `lookback` bars."""
+        if interval and interval != self.interval:
+            logger.warning("Replay data is %s, %s requested for %s", self.interval, interval, symbol)
+        entry = self._data.get(symbol)
+        if entry is None:
+            return pd.DataFrame()
+        idx, values, tz = entry
+        hi = self._visible(idx)
+        if end is not None:
+            hi = min(hi, int(np.searchsorted(idx, _ts_to_ns(end), side="left")))
+        lo = 0
+        if start is not None:
+            lo = int(np.searchsorted(idx, _ts_to_ns(start), side="left"))
+        elif period is not None and period_to_timedelta(period) is not None and hi > 0:
+            lo = int(np.searchsorted(idx, idx[hi - 1] - period_to_timedelta(period).value, side="right"))
+        if lookback is not None:
+            lo = max(lo, hi - lookback)
+        lo = min(lo, hi)
+        return pd.DataFrame(values[lo:hi], index=_ns_to_index(idx[lo:hi], tz), columns=OHLCV_COLUMNS)
+
+    def last_bar(self, symbol: str):
+        """(ns, open, high, low, close, volume) of the newest visible bar, or None."""
+        entry = self._data.get(symbol)
+        if entry is None:
+            return None
+        idx, values, _ = entry
+        i = self._visible(idx) - 1
+        return None if i < 0 else (int(idx[i]), *map(float, values[i]))
+
+    def bar_at(self, symbol: str, ts_ns: int):
+        """OHLCV row stamped exactly ts_ns, or None."""
+        entry = self._data.get(symbol)
+        if entry is None:
+            return None
+        idx, values, _ = entry
+        i = int(np.searchsorted(idx, ts_ns))
+        return values[i] if i < len(idx) and idx[i] == ts_ns else None
+
+    # ---------- Kite client interface ----------
+    def _symbol_for(self, key: str):
+        if key in self._data:
+            return key
+        bare = key.split(":", 1)[-1]
+        return bare if bare in self._data else None
+
+    def ltp(self, keys):
+        out = {}
+        for k in keys:
+            sym = self._symbol_for(k)
+            bar = self.last_bar(sym) if sym else None
+            if bar is not None:
+                out[k] = {"instrument_token": 0, "last_price": bar[4]}
+        return out
+
+    def quote(self, keys):
+        out = {}
+        half = self.spread_bps / 2e4
+        for k in keys:
+            sym = self._symbol_for(k)
+            bar = self.last_bar(sym) if sym else None
+            if bar is None:
+                continue
+            _, o, h, l, c, v = bar
+            out[k] = {"instrument_token": 0, "last_price": c, "volume": v, "oi": 0,
+                      "ohlc": {"open": o, "high": h, "low": l, "close": c},
+                      "depth": {"buy": [{"price": c * (1 - half), "quantity": 1, "orders": 1}],
+                                "sell": [{"price": c * (1 + half), "quantity": 1, "orders": 1}]}}
+        return out
+
+    def place_order(self, tradingsymbol=None, transaction_type="BUY", quantity=1, exchange=None, **kwargs):
+        """Fills immediately at the last visible close; returns the order id."""
+        key = f"{exchange}:{tradingsymbol}" if exchange else tradingsymbol
+        sym = self._symbol_for(key) or self._symbol_for(tradingsymbol)
+        bar = self.last_bar(sym) if sym else None
+        with self._lock:
+            order_id = str(next(self._order_ids))
+            self.orders.append({"order_id": order_id, "symbol": sym or tradingsymbol, "side": transaction_type,
+                                "quantity": quantity, "price": bar[4] if bar else None,
+                                "time_ns": bar[0] if bar else None})
+        return order_id
+
+    def instruments(self, exchange=None):
+        return []
+
+    def set_access_token(self, token):
+        pass
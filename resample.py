@@ -0,0 +1,399 @@
+# resample.py
+"""
+Multi-timeframe OHLCV from one base interval.
+- fetch the finest interval once (e.g. 15m) and derive 1h / 1d / 1wk bars locally
+  instead of one provider call per interval
+- session-aware: NSE/BSE intraday buckets are anchored at the 09:15 IST open (09:15, 10:15,
+  ... 15:15) and daily/weekly bars follow the IST calendar and leave out intraday bars outside
+  market hours; crypto and everything else use 24h UTC days
+- bars are labelled with their bucket start, like the base bars
+- resample_ohlcv builds the (few) bucket edges for the covered range, finds them in the
+  sorted base index with searchsorted and aggregates with numpy reduceat, so millions of
+  1m bars take milliseconds; Resampler updates higher timeframes incrementally per base bar
+
+Usage:
+from resample import resample_ohlcv, session_for
+h1 = resample_ohlcv(df_15m, "1h", session_for("NSE:RELIANCE"))
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from bar_store import OHLCV_COLUMNS, _index_to_ns, _ns_to_index
+
+MINUTE_NS = 60 * 10**9
+DAY_NS = 24 * 60 * MINUTE_NS
+_UNIT_NS = {"m": MINUTE_NS, "h": 60 * MINUTE_NS, "d": DAY_NS, "wk": 7 * DAY_NS}
+
+
+class Session:
+    """
+    Trading hours in a local time zone; open/close None = trades around the clock.
+    weekdays: local days that trade (0 = Monday); default Monday-Friday when hours are set,
+    every day otherwise. There is no holiday calendar.
+    """
+
+    def __init__(self, tz: str = "UTC", open: Optional[str] = None, close: Optional[str] = None,
+                 weekdays: Optional[Iterable[int]] = None):
+        self.tz = tz
+        self.zone = ZoneInfo(tz)
+        self.open_ns = _hhmm_ns(open) if open else 0
+        self.close_ns = _hhmm_ns(close) if close else DAY_NS
+        self.fixed_offset = _fixed_offset(self.zone)
+        if weekdays is None:
+            weekdays = range(5) if self.has_hours else range(7)
+        self.weekdays = frozenset(weekdays)
+
+    @property
+    def has_hours(self) -> bool:
+        return self.open_ns > 0 or self.close_ns < DAY_NS
+
+    def is_trading_day(self, ts_ns: int) -> bool:
+        """Whether the local calendar day of a UTC timestamp is one of the session's weekdays."""
+        # the epoch was a Thursday
+        return ((ts_ns + self.offset_at(ts_ns)) // DAY_NS + 3) % 7 in self.weekdays
+
+    def in_session(self, ts_ns: int) -> bool:
+        """Whether a UTC timestamp falls inside trading hours."""
+        tod = (ts_ns + self.offset_at(ts_ns)) % DAY_NS
+        return self.open_ns <= tod < self.close_ns
+
+    def in_session_mask(self, ts_ns: np.ndarray) -> np.ndarray:
+        """Vector form of in_session for UTC ns."""
+        if self.fixed_offset is not None:
+            local = ts_ns + self.fixed_offset
+        else:
+            idx = pd.DatetimeIndex(ts_ns.astype("datetime64[ns]")).tz_localize("UTC").tz_convert(self.tz)
+            local = idx.tz_localize(None).asi8
+        tod = local % DAY_NS
+        return (tod >= self.open_ns) & (tod < self.close_ns)
+
+    def offset_at(self, ts_ns: int) -> int:
+        """Local time minus UTC (ns) at a UTC timestamp."""
+        if self.fixed_offset is not None:
+            return self.fixed_offset
+        when = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=ts_ns // 1000)
+        return int(when.astimezone(self.zone).utcoffset().total_seconds()) * 10**9
+
+    def to_utc(self, local_ns: np.ndarray) -> np.ndarray:
+        """Local wall-clock ns -> UTC ns (DST gaps shift forward)."""
+        if self.fixed_offset is not None:
+            return local_ns - self.fixed_offset
+        idx = pd.DatetimeIndex(local_ns.astype("datetime64[ns]")).tz_localize(
+            self.tz, ambiguous=np.zeros(len(local_ns), dtype=bool), nonexistent="shift_forward")
+        return _index_to_ns(idx)
+
+    def __repr__(self):
+        return f"Session({self.tz!r}, open={self.open_ns // MINUTE_NS}m, close={self.close_ns // MINUTE_NS}m)"
+
+
+def _hhmm_ns(text: str) -> int:
+    h, m = text.split(":")
+    return (int(h) * 60 + int(m)) * MINUTE_NS
+
+
+def _fixed_offset(zone: ZoneInfo) -> Optional[int]:
+    """UTC offset in ns if the zone never changes it (IST, UTC), else None."""
+    jan = datetime(2024, 1, 15, tzinfo=timezone.utc).astimezone(zone).utcoffset()
+    jul = datetime(2024, 7, 15, tzinfo=timezone.utc).astimezone(zone).utcoffset()
+    return int(jan.total_seconds()) * 10**9 if jan == jul else None
+
+
+SESSIONS: Dict[str, Session] = {
+    "NSE": Session("Asia/Kolkata", "09:15", "15:30"),
+    "BSE": Session("Asia/Kolkata", "09:15", "15:30"),
+    "INDEX": Session("Asia/Kolkata", "09:15", "15:30"),  # INDEX:NIFTY / SENSEX
+    "UTC": Session("UTC"),
+}
+
+
+def session_for(univ_symbol: str) -> Session:
+    """Session of a universe symbol: NSE/BSE/INDEX -> IST market hours, anything else 24h UTC."""
+    if univ_symbol.endswith((".NS", ".BO")):
+        return SESSIONS["NSE"]
+    prefix = univ_symbol.split(":", 1)[0].upper() if ":" in univ_symbol else ""
+    return SESSIONS.get(prefix, SESSIONS["UTC"])
+
+
+def _parse_interval(interval: str) -> Tuple[int, str]:
+    m = re.fullmatch(r"(\d+)\s*(m|h|d|wk|mo)", str(interval).strip().lower())
+    if not m:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return int(m.group(1)), m.group(2)
+
+
+def _steps(first: int, last: int, step: int) -> np.ndarray:
+    """first, first + step, ... up to last (inclusive); integer arithmetic, np.arange's float
+    length calculation drops the last element for large ns values"""
+    return first + step * np.arange((last - first) // step + 1, dtype=np.int64)
+
+
+def _month_ns(months: np.ndarray) -> np.ndarray:
+    return np.asarray(months, dtype=np.int64).astype("datetime64[M]").astype("datetime64[ns]").astype(np.int64)
+
+
+def bucket_edges(lo_ns: int, hi_ns: int, interval: str, session: Session) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (starts, ends) in UTC ns of every bucket of `interval` overlapping [lo_ns, hi_ns].
+    Intraday buckets start at the session open and are cut at the session close; days,
+    weeks (Monday) and months follow the session's local calendar.
+    """
+    n, unit = _parse_interval(interval)
+    lo = int(lo_ns) + session.offset_at(int(lo_ns))
+    hi = int(hi_ns) + session.offset_at(int(hi_ns))
+    if unit in ("m", "h"):
+        step = n * _UNIT_NS[unit]
+        days = _steps(lo - lo % DAY_NS, hi - hi % DAY_NS, DAY_NS)[:, None]
+        offsets = np.arange(session.open_ns, session.close_ns, step, dtype=np.int64)[None, :]
+        starts = (days + offsets).ravel()
+        ends = np.minimum(starts + step, (days + session.close_ns + 0 * offsets).ravel())
+    elif unit in ("d", "wk"):
+        span = n * _UNIT_NS[unit]
+        # the epoch was a Thursday: shift so weeks start on Monday
+        shift = 3 * DAY_NS if unit == "wk" else 0
+        first = (lo + shift) - (lo + shift) % span - shift
+        starts = _steps(first, hi, span)
+        ends = starts + span
+    else:
+        m0 = int(np.datetime64(lo, "ns").astype("datetime64[M]").astype(np.int64))
+        m1 = int(np.datetime64(hi, "ns").astype("datetime64[M]").astype(np.int64))
+        months = _steps(m0 - m0 % n, m1, n)
+        starts, ends = _month_ns(months), _month_ns(months + n)
+    return session.to_utc(starts), session.to_utc(ends)
+
+
+def bucket_of(ts_ns: int, interval: str, session: Session) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    (start, end, complete_at) in UTC ns of the bucket holding ts_ns, or None outside session
+    hours (intraday only). complete_at: when the bucket's last base bar has ended (the session
+    close for daily buckets), or None when only the next bucket tells (weeks, months).
+    Scalar counterpart of bucket_edges for per-bar updates.
+    """
+    n, unit = _parse_interval(interval)
+    off = session.offset_at(ts_ns)
+    local = ts_ns + off
+    day = local - local % DAY_NS
+    if unit in ("m", "h"):
+        step = n * _UNIT_NS[unit]
+        tod = local - day
+        if tod < session.open_ns or tod >= session.close_ns:
+            return None
+        start = day + session.open_ns + (tod - session.open_ns) // step * step
+        end = min(start + step, day + session.close_ns)
+        return start - off, end - off, end - off
+    if unit in ("d", "wk"):
+        span = n * _UNIT_NS[unit]
+        shift = 3 * DAY_NS if unit == "wk" else 0
+        start = (local + shift) - (local + shift) % span - shift
+        if unit == "wk":
+            return start - off, start + span - off, None
+        return start - off, start + span - off, start + span - DAY_NS + session.close_ns - off
+    month = int(np.datetime64(local, "ns").astype("datetime64[M]").astype(np.int64))
+    month -= month % n
+    start, end = _month_ns([month, month + n])
+    return int(start) - off, int(end) - off, None
+
+
+def next_close(ts_ns: int, interval: str, session: Session) -> int:
+    """
+    UTC ns of the first bar close of `interval` after ts_ns: the end of the intraday bucket
+    (skipping to the next session open outside hours), or the session close for daily bars.
+    Intraday and daily closes on days outside session.weekdays (weekends) are skipped.
+    """
+    n, unit = _parse_interval(interval)
+    by_day = unit in ("m", "h", "d") and len(session.weekdays) < 7
+    b = bucket_of(ts_ns, interval, session)
+    if (b is not None and (b[2] if b[2] is not None else b[1]) > ts_ns
+            and not (by_day and not session.is_trading_day(b[0]))):
+        return b[2] if b[2] is not None else b[1]
+    horizon = 8 * DAY_NS if unit in ("m", "h", "d") else (7 * n + 1) * DAY_NS if unit == "wk" else (31 * n + 1) * DAY_NS
+    starts, ends = bucket_edges(ts_ns, ts_ns + horizon, interval, session)
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if by_day and not session.is_trading_day(start):
+            continue
+        b = bucket_of(start, interval, session)
+        close = b[2] if b is not None and b[2] is not None else end
+        if close > ts_ns:
+            return close
+    raise ValueError(f"No {interval} bar close within {horizon // DAY_NS} days of {ts_ns}")
+
+
+def _index_ints(index) -> Tuple[np.ndarray, int]:
+    """(UTC epoch integers of a DatetimeIndex in its own unit, ns per unit) - no conversion pass."""
+    idx = pd.DatetimeIndex(index)
+    unit = getattr(idx, "unit", "ns")
+    return idx.asi8, {"s": 10**9, "ms": 10**6, "us": 10**3, "ns": 1}[unit]
+
+
+def aggregate_segments(values: np.ndarray, i0: np.ndarray, i1: np.ndarray) -> np.ndarray:
+    """OHLCV of rows [i0[k], i1[k]) for each k (non-empty, ascending, non-overlapping) -> (k, 5)."""
+    if len(i0) and (i1[-1] != len(values) or (i1[:-1] != i0[1:]).any()):
+        # drop rows outside every segment (out of session hours) so segments become contiguous
+        mark = np.zeros(len(values) + 1, dtype=np.int64)
+        np.add.at(mark, i0, 1)
+        np.add.at(mark, i1, -1)
+        values = values[np.cumsum(mark[:-1]) > 0]
+        lengths = i1 - i0
+        i1 = np.cumsum(lengths)
+        i0 = i1 - lengths
+    out = np.empty((len(i0), 5))
+    if not len(i0):
+        return out
+    out[:, 0] = values[i0, 0]
+    out[:, 1] = np.maximum.reduceat(values[:, 1], i0)
+    out[:, 2] = np.minimum.reduceat(values[:, 2], i0)
+    out[:, 3] = values[i1 - 1, 3]
+    out[:, 4] = np.add.reduceat(values[:, 4], i0)
+    return out
+
+
+def _drops_off_hours(interval: str, base_ns: Optional[int], session: Session) -> bool:
+    """Day/week/month buckets of a session with hours only take intraday base bars in hours."""
+    return (session.has_hours and base_ns is not None and base_ns < DAY_NS
+            and _parse_interval(interval)[1] in ("d", "wk", "mo"))
+
+
+def _base_ns(ts: np.ndarray, unit_ns: int) -> Optional[int]:
+    """Base bar length guessed from the smallest step between bars (None for a single bar)."""
+    if len(ts) < 2:
+        return None
+    return int(np.diff(ts).min()) * unit_ns
+
+
+def _resample_arrays(ts: np.ndarray, unit_ns: int, values: np.ndarray, interval: str,
+                     session: Session, base_ns: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (bucket starts UTC ns, (k, 5) OHLCV) for sorted epoch ints ts in units of unit_ns.
+    base_ns: base bar length; intraday bars outside session hours are left out of d/wk/mo buckets.
+    """
+    if len(ts) and _drops_off_hours(interval, base_ns, session):
+        keep = session.in_session_mask(ts.astype(np.int64) * unit_ns)
+        ts, values = ts[keep], values[keep]
+    if not len(ts):
+        return np.array([], dtype=np.int64), np.empty((0, 5))
+    starts, ends = bucket_edges(int(ts[0]) * unit_ns, int(ts[-1]) * unit_ns, interval, session)
+    # ceil: a bucket edge inside a coarse unit starts at the next representable time
+    i0 = np.searchsorted(ts, -(-starts // unit_ns))
+    i1 = np.searchsorted(ts, -(-ends // unit_ns))
+    nonempty = i1 > i0
+    return starts[nonempty], aggregate_segments(values, i0[nonempty], i1[nonempty])
+
+
+def resample_ohlcv(df: pd.DataFrame, interval: str, session: Optional[Session] = None) -> pd.DataFrame:
+    """OHLCV of df (sorted base bars) at a higher interval; the last bar may still be forming."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    tz = str(df.index.tz) if getattr(df.index, "tz", None) is not None else None
+    ts, unit_ns = _index_ints(df.index)
+    keys, out = _resample_arrays(ts, unit_ns, df[OHLCV_COLUMNS].to_numpy(dtype=np.float64), interval,
+                                 session or SESSIONS["UTC"], _base_ns(ts, unit_ns))
+    return pd.DataFrame(out, index=_ns_to_index(keys, tz), columns=OHLCV_COLUMNS)
+
+
+def resample_many(df: pd.DataFrame, intervals: Iterable[str], session: Optional[Session] = None) -> Dict[str, pd.DataFrame]:
+    """{interval: frame} for every interval."""
+    return {iv: resample_ohlcv(df, iv, session) for iv in intervals}
+
+
+class Resampler:
+    """
+    Incremental higher-timeframe bars for one symbol. Feed base bars in time order with update()
+    (or update_frame() for a batch); both return the bars that closed. A bucket closes as soon as
+    a base bar reaches its end (intraday and daily buckets), or when a bar lands in a later bucket.
+    Bars for a bucket that already closed are dropped rather than reopening it, and d/wk/mo
+    buckets skip intraday bars outside session hours, as resample_ohlcv does.
+    """
+
+    def __init__(self, base_interval: str, intervals: Iterable[str], session: Optional[Session] = None):
+        n, unit = _parse_interval(base_interval)
+        self.base_ns = n * _UNIT_NS.get(unit, DAY_NS)
+        self.intervals = list(intervals)
+        self.session = session or SESSIONS["UTC"]
+        self._current = {iv: None for iv in self.intervals}  # iv -> [start, end, complete_at, o, h, l, c, v]
+        self._closed = {iv: None for iv in self.intervals}   # iv -> start of the last bucket emitted
+        self._off_hours = {iv: _drops_off_hours(iv, self.base_ns, self.session) for iv in self.intervals}
+
+    def update(self, ts, o: float, h: float, l: float, c: float, v: float) -> List[Tuple[str, int, tuple]]:
+        """Add one base bar (ts: Timestamp or UTC ns). Returns [(interval, bucket start ns, (o, h, l, c, v))] closed."""
+        ts_ns = int(ts) if isinstance(ts, (int, np.integer)) else _ts_ns(ts)
+        closed = []
+        in_session = None
+        for iv in self.intervals:
+            if self._off_hours[iv]:
+                if in_session is None:
+                    in_session = self.session.in_session(ts_ns)
+                if not in_session:
+                    continue
+            cur = self._current[iv]
+            if cur is not None and not (cur[0] <= ts_ns < cur[1]):
+                closed.append((iv, cur[0], tuple(cur[3:])))
+                self._closed[iv] = cur[0]
+                cur = None
+            if cur is None:
+                bucket = bucket_of(ts_ns, iv, self.session)
+                if bucket is None or bucket[0] == self._closed[iv]:
+                    self._current[iv] = None
+                    continue
+                start, end, complete_at = bucket
+                cur = [start, end, complete_at, o, h, l, c, v]
+            else:
+                cur[4] = max(cur[4], h)
+                cur[5] = min(cur[5], l)
+                cur[6] = c
+                cur[7] += v
+            if cur[2] is not None and ts_ns + self.base_ns >= cur[2]:
+                closed.append((iv, cur[0], tuple(cur[3:])))
+                self._closed[iv] = cur[0]
+                cur = None
+            self._current[iv] = cur
+        return closed
+
+    def update_frame(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Add many base bars at once (vectorized); returns {interval: closed bars}."""
+        out = {}
+        if df is None or df.empty:
+            return out
+        ts, unit_ns = _index_ints(df.index)
+        values = df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+        tz = str(df.index.tz) if getattr(df.index, "tz", None) is not None else None
+        last_ns = int(ts[-1]) * unit_ns
+        for iv in self.intervals:
+            keys, bars = _resample_arrays(ts, unit_ns, values, iv, self.session, self.base_ns)
+            cur = self._current[iv]
+            if cur is None and len(keys) and keys[0] == self._closed[iv]:
+                keys, bars = keys[1:], bars[1:]
+            if cur is not None:
+                if len(keys) and keys[0] == cur[0]:
+                    first = bars[0]
+                    bars[0] = (cur[3], max(cur[4], first[1]), min(cur[5], first[2]), first[3], cur[7] + first[4])
+                else:
+                    keys = np.r_[cur[0], keys]
+                    bars = np.vstack([np.asarray(cur[3:], dtype=np.float64), bars])
+            n_closed = len(keys)
+            self._current[iv] = None
+            if n_closed:
+                # the newest bucket stays open unless the last base bar reached its end
+                bucket = bucket_of(int(keys[-1]), iv, self.session)
+                complete_at = bucket[2] if bucket else None
+                if complete_at is None or last_ns + self.base_ns < complete_at:
+                    self._current[iv] = [int(keys[-1]), bucket[1], complete_at, *map(float, bars[-1])]
+                    n_closed -= 1
+            if n_closed:
+                self._closed[iv] = int(keys[n_closed - 1])
+            out[iv] = pd.DataFrame(bars[:n_closed], index=_ns_to_index(keys[:n_closed], tz), columns=OHLCV_COLUMNS)
+        return out
+
+    def current(self, interval: str) -> Optional[Tuple[int, tuple]]:
+        """(bucket start ns, (o, h, l, c, v)) of the forming bar, or None."""
+        cur = self._current.get(interval)
+        return None if cur is None else (cur[0], tuple(cur[3:]))
+
+
+def _ts_ns(ts) -> int:
+    ts = pd.Timestamp(ts)
+    return int(ts.value) if ts.tzinfo is not None else int(ts.tz_localize("UTC").value)
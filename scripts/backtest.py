@@ -2,10 +2,102 @@
 import yaml
 import pandas as pd
 from scripts.data_fetch import fetch_ohlcv
-from scripts.features import build_features_and_labels
+from scripts.feature_store import cached_features_and_labels
 from scripts.model import load_model
 import numpy as np
 
+def run_backtest(close, pred, initial_capital: float = 10000.0, size_frac: float = 0.01, index=None):
+    """
+    Array-based backtest with the same rules as the original bar loop:
+    - flat and pred != 0 -> enter pred (long 1 / short -1) at this close
+    - in a position and pred != position -> close it (no re-entry on the same bar)
+    - size = size_frac of current capital at the current price (also at exit, as before)
+    Returns (equity DataFrame with 'capital' and 'position', trades DataFrame, stats dict).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    pred = np.asarray(pred).astype(np.int64)
+    n = len(close)
+    if index is None:
+        index = pd.RangeIndex(n)
+    if n == 0:
+        return pd.DataFrame({"capital": [], "position": []}, index=index), _trades_frame([]), _stats(initial_capital, np.array([]), pd.DataFrame())
+    if not np.all(np.isfinite(close) & (close > 0)):
+        raise ValueError("close prices must be positive and finite")
+
+    # runs of identical predictions
+    starts = np.flatnonzero(np.r_[True, pred[1:] != pred[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    vals = pred[starts]
+    r_idx = np.arange(len(starts))
+
+    # in a position at the end of a run?
+    #  pred == 0 run -> always flat; nonzero run of >= 2 bars -> always in (entered at start or start+1);
+    #  nonzero 1-bar run -> flips the previous state (enter if flat, else only the exit happens)
+    anchor = (vals == 0) | (lengths >= 2)
+    last_anchor = np.maximum.accumulate(np.where(anchor, r_idx, -1))
+    anchor_state = np.where(last_anchor >= 0, vals[np.maximum(last_anchor, 0)] != 0, False)
+    flips = (r_idx - last_anchor) % 2 == 1
+    in_end = np.where(anchor, vals != 0, anchor_state ^ flips)
+    in_start = np.r_[False, in_end[:-1]]
+
+    # per-run entry bar (-1 = no entry in this run)
+    entry_bar = np.where(vals == 0, -1,
+                         np.where(~in_start, starts, np.where(lengths >= 2, starts + 1, -1)))
+
+    position = np.repeat(vals, lengths)
+    exit_bars = starts[in_start]
+    position[exit_bars] = 0  # a run that starts while in a position only exits on its first bar
+    entry_px = np.repeat(np.where(entry_bar >= 0, close[np.maximum(entry_bar, 0)], 0.0), lengths)
+
+    # capital changes only at exits: capital *= 1 + pos * (exit - entry) * size_frac / exit
+    prev_pos = position[exit_bars - 1]
+    prev_entry = entry_px[exit_bars - 1]
+    exit_px = close[exit_bars]
+    growth = 1.0 + (exit_px - prev_entry) * prev_pos * (size_frac / exit_px)
+    cap_after = initial_capital * np.cumprod(growth)
+    is_exit = np.zeros(n, dtype=bool)
+    is_exit[exit_bars] = True
+    capital = np.r_[initial_capital, cap_after][np.cumsum(is_exit)]
+
+    shares = capital * size_frac / close
+    equity = capital + np.where(position != 0, position * (close - entry_px) * shares, 0.0)
+    df_out = pd.DataFrame({"capital": equity, "position": position}, index=index)
+
+    # trade list (closed trades only)
+    entered = entry_bar[np.r_[in_start[1:], False] & (entry_bar >= 0)]
+    cap_before = np.r_[initial_capital, cap_after[:-1]]
+    idx = pd.Index(index)
+    trades = _trades_frame({
+        "entry_time": idx[entered],
+        "exit_time": idx[exit_bars],
+        "side": np.where(prev_pos > 0, "LONG", "SHORT"),
+        "entry_price": prev_entry,
+        "exit_price": exit_px,
+        "shares": cap_before * size_frac / exit_px,
+        "pnl": cap_after - cap_before,
+        "return": prev_pos * (exit_px - prev_entry) / prev_entry,
+    })
+    return df_out, trades, _stats(initial_capital, equity, trades)
+
+def _trades_frame(cols):
+    return pd.DataFrame(cols, columns=["entry_time", "exit_time", "side", "entry_price", "exit_price",
+                                       "shares", "pnl", "return"])
+
+def _stats(initial_capital, equity, trades):
+    end = float(equity[-1]) if len(equity) else initial_capital
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    max_dd = float(np.max(1.0 - equity / peak)) if len(equity) else 0.0
+    n_trades = len(trades)
+    return {
+        "start_capital": initial_capital,
+        "end_capital": end,
+        "total_return": end / initial_capital - 1.0,
+        "max_drawdown": max_dd,
+        "n_trades": n_trades,
+        "win_rate": float((trades["pnl"] > 0).mean()) if n_trades else 0.0,
+        "avg_pnl": float(trades["pnl"].mean()) if n_trades else 0.0,
+    }
+
 def backtest(cfg_path):
     cfg = yaml.safe_load(open(cfg_path))
     sym = cfg.get("symbol", "AAPL")
@@ -14,40 +106,19 @@ def backtest(cfg_path):
     model_path = cfg.get("model_path", "models/rf_model.pkl")
 
     df = fetch_ohlcv(sym, interval=interval, days=days)
-    X, y, df_all = build_features_and_labels(df)
+    X, y, df_all = cached_features_and_labels(df)
     model = load_model(model_path)
 
     preds = pd.Series(model.predict(X), index=X.index)
     df_all = df_all.loc[preds.index].copy()
     df_all["pred"] = preds
 
-    # Simple position logic: go long if pred==1, short if pred==-1 else flat
-    initial_capital = 10000.0
-    capital = initial_capital
-    position = 0
-    entry_price = 0
-    capital_hist = []
-    for i, row in df_all.iterrows():
-        pred = row["pred"]
-        price = row["close"]
-        # simple position sizing: fixed fraction of capital per trade
-        trade_size = capital * 0.01  # 1% per trade
-        shares = trade_size / price if price>0 else 0
-
-        # If flat and pred signals long/short -> enter
-        if position == 0 and pred != 0 and shares>0:
-            position = pred
-            entry_price = price
-        # If in position and prediction changed to hold or reversed -> close
-        elif position != 0 and pred != position:
-            pnl = (price - entry_price) * position * shares
-            capital += pnl
-            position = 0
-            entry_price = 0
-        capital_hist.append(capital + (position * (price - entry_price) * shares if position!=0 else 0))
-
-    df_out = pd.DataFrame({"capital": capital_hist}, index=df_all.index[:len(capital_hist)])
-    print("Start cap:", initial_capital, "End cap:", df_out["capital"].iloc[-1])
+    # Simple position logic: go long if pred==1, short if pred==-1 else flat (1% per trade)
+    df_out, trades, stats = run_backtest(df_all["close"].to_numpy(), df_all["pred"].to_numpy(),
+                                         initial_capital=10000.0, size_frac=0.01, index=df_all.index)
+    df_out = df_out[["capital"]]
+    print("Start cap:", stats["start_capital"], "End cap:", stats["end_capital"])
+    print("Trades:", stats["n_trades"], "Win rate: %.2f" % stats["win_rate"], "Max DD: %.2f%%" % (100 * stats["max_drawdown"]))
     return df_out
 
 if __name__ == "__main__":
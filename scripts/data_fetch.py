@@ -2,19 +2,35 @@
 import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
+from backfill import backfill_period
+from universal_fetcher import universe_symbol_for_yf
 
-def fetch_ohlcv(symbol: str, interval: str = "15m", days: int = 365):
+def _download(symbol: str, interval: str, **kwargs):
+    df = yf.download(tickers=symbol, interval=interval, progress=False, **kwargs)
+    if df is None or df.empty:
+        return pd.DataFrame()
+    df = df.rename(columns={
+        "Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"
+    })
+    df.index = pd.to_datetime(df.index)
+    return df[["open", "high", "low", "close", "volume"]]
+
+def fetch_ohlcv(symbol: str, interval: str = "15m", days: int = 365, use_cache: bool = True):
     """
     Uses yfinance to fetch data. For Indian NSE tickers use e.g. "TCS.NS"
     interval examples: "1m","5m","15m","1h","1d"
+    use_cache: keep bars in the local bar store and only download what is missing; long intraday
+    ranges are split into yfinance-sized windows and fetched in parallel (backfill.py). Bars are
+    cached under the universe symbol ("NSE:TCS"), shared with universal_fetcher
     """
     period_days = days
     period = f"{period_days}d"
-    df = yf.download(tickers=symbol, period=period, interval=interval, progress=False)
+    if use_cache:
+        df = backfill_period(universe_symbol_for_yf(symbol), interval, period,
+                             lambda s, e: _download(symbol, interval, start=s, end=e),
+                             provider="yfinance", record_empty=False)
+    else:
+        df = _download(symbol, interval, period=period)
     if df.empty:
         raise ValueError("No data fetched — check symbol/interval")
-    df = df.rename(columns={
-        "Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"
-    })
-    df.index = pd.to_datetime(df.index)
     return df[["open", "high", "low", "close", "volume"]]
@@ -0,0 +1,302 @@
+# scripts/dataset.py
+"""
+Out-of-core training dataset over many symbols.
+- each symbol's bars are streamed from the bar cache (bar_store.py) in chunks of chunk_rows;
+  every chunk is run through build_features_and_labels with `warmup` earlier bars in front
+  (MA50 needs 50; RSI14 / ATR14 are recursive, and their start-up error decays by 13/14 per
+  bar, below float32 resolution after ~300) and future_bars later bars behind for the labels,
+  and only the chunk's own rows are kept, so the rows match a single whole-series call
+- rows are written straight into memory-mapped .npy files: X (float32, FEATURE_COLS), y (int8),
+  ts (UTC ns) and sym (index into meta.json "symbols"); one symbol's rows are contiguous and
+  time-ordered. meta.json is written last and marks the dataset complete
+- Dataset.time_split cuts all symbols at one timestamp (each symbol's last future_bars train
+  rows, whose label windows cross it, are purged); gather() copies at most max_rows of a split into memory and batches() walks
+  it in fixed-size views, so peak memory is set by those limits, not by the dataset size
+
+Usage:
+python -m scripts.dataset build --symbols NSE:RELIANCE NSE:TCS --interval 15m --days 730 --out data/datasets/nse_15m
+python -m scripts.dataset build --registry --interval 15m --days 59 --out data/datasets/universe_15m
+python -m scripts.dataset info data/datasets/universe_15m
+"""
+
+import argparse
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, _index_to_ns, get_store
+from scripts.features import FEATURE_COLS, FEATURE_VERSION, build_features_and_labels
+
+logger = logging.getLogger(__name__)
+
+WARMUP_BARS = 512
+Ranges = List[Tuple[int, int]]
+
+
+def _store_source(store: BarStore, symbol: str, interval: str):
+    """(rows, load(lo, hi) -> bars [lo, hi)) for a cached series."""
+    index = np.load(store._dir(symbol, interval) / "index.npy", mmap_mode="r")
+    n = len(index)
+
+    def load(lo, hi):
+        return store.load(symbol, interval, start=pd.Timestamp(int(index[lo]), tz="UTC"),
+                          end=pd.Timestamp(int(index[hi]), tz="UTC") if hi < n else None)
+    return n, load
+
+
+def _frame_source(df: pd.DataFrame):
+    return len(df), lambda lo, hi: df.iloc[lo:hi]
+
+
+def build_dataset(sources: Iterable[Union[str, Tuple[str, pd.DataFrame]]], out: str, interval: str = "15m",
+                  future_bars: int = 3, threshold: float = 0.001, chunk_rows: int = 200_000,
+                  warmup: int = WARMUP_BARS, store: Optional[BarStore] = None) -> "Dataset":
+    """
+    Build the dataset at `out` (replaced if it exists).
+    sources: symbols already in the bar cache (see fetch_to_cache), or (symbol, OHLCV frame) pairs.
+    """
+    if warmup < 50:
+        raise ValueError("warmup must cover the 50-bar moving average")
+    store = store or get_store()
+    entries = []
+    for src in sources:
+        if isinstance(src, str):
+            if not store.read_meta(src, interval).get("rows"):
+                logger.warning("No cached %s bars for %s, skipping", interval, src)
+                continue
+            entries.append((src, *_store_source(store, src, interval)))
+        else:
+            entries.append((src[0], *_frame_source(src[1])))
+    capacity = sum(n for _, n, _ in entries)
+
+    out = Path(out)
+    tmp = out.with_name(out.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    # sized for every bar; the warm-up rows dropped at each series start stay unused at the end
+    X = np.lib.format.open_memmap(tmp / "X.npy", mode="w+", dtype=np.float32, shape=(capacity, len(FEATURE_COLS)))
+    y = np.lib.format.open_memmap(tmp / "y.npy", mode="w+", dtype=np.int8, shape=(capacity,))
+    ts = np.lib.format.open_memmap(tmp / "ts.npy", mode="w+", dtype=np.int64, shape=(capacity,))
+    sym = np.lib.format.open_memmap(tmp / "sym.npy", mode="w+", dtype=np.int32, shape=(capacity,))
+
+    t0 = time.perf_counter()
+    pos = 0
+    symbols = []
+    for code, (name, n, load) in enumerate(entries):
+        start = pos
+        for lo in range(0, n, chunk_rows):
+            hi = min(lo + chunk_rows, n)
+            frame = load(max(0, lo - warmup), min(n, hi + future_bars))
+            own = _index_to_ns(frame.index)
+            first, last = own[lo - max(0, lo - warmup)], own[hi - 1 - max(0, lo - warmup)]
+            Xc, yc, _ = build_features_and_labels(frame, future_bars=future_bars, threshold=threshold)
+            rows = _index_to_ns(Xc.index)
+            keep = (rows >= first) & (rows <= last)
+            k = int(keep.sum())
+            X[pos:pos + k] = Xc.to_numpy(dtype=np.float32)[keep]
+            y[pos:pos + k] = yc.to_numpy()[keep]
+            ts[pos:pos + k] = rows[keep]
+            sym[pos:pos + k] = code
+            pos += k
+        symbols.append({"symbol": name, "start": start, "stop": pos})
+        logger.info("%s: %d rows (%d bars)", name, pos - start, n)
+    for arr in (X, y, ts, sym):
+        arr.flush()
+    del X, y, ts, sym
+
+    meta = {"rows": pos, "capacity": capacity, "features": FEATURE_COLS, "feature_version": FEATURE_VERSION,
+            "interval": interval, "future_bars": future_bars, "threshold": threshold, "warmup": warmup,
+            "symbols": symbols, "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "build_seconds": round(time.perf_counter() - t0, 2)}
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+    shutil.rmtree(out, ignore_errors=True)
+    tmp.rename(out)
+    logger.info("Dataset %s: %d rows x %d features from %d symbols", out, pos, len(FEATURE_COLS), len(symbols))
+    return Dataset(out)
+
+
+def fetch_to_cache(symbols: Iterable[str], interval: str, days: int, max_workers: int = 8) -> List[str]:
+    """Download/refresh the bars of `symbols` into the bar cache; returns the symbols that have data."""
+    from universal_fetcher import fetch_market_data_many
+    ok = []
+    for s, df in fetch_market_data_many(list(symbols), interval=interval, period=f"{days}d",
+                                        max_workers=max_workers, patterns=False):
+        if df is None or df.empty:
+            logger.warning("No data for %s", s)
+        else:
+            ok.append(s)
+    return ok
+
+
+class Dataset:
+    """Read side of build_dataset(): memory-mapped arrays plus split / gather helpers."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            raise FileNotFoundError(f"No complete dataset at {self.path}")
+        self.meta = json.loads(meta_path.read_text())
+        n = self.meta["rows"]
+        self.X = np.load(self.path / "X.npy", mmap_mode="r")[:n]
+        self.y = np.load(self.path / "y.npy", mmap_mode="r")[:n]
+        self.ts = np.load(self.path / "ts.npy", mmap_mode="r")[:n]
+        self.sym = np.load(self.path / "sym.npy", mmap_mode="r")[:n]
+        self.symbols = [s["symbol"] for s in self.meta["symbols"]]
+        self.features = self.meta["features"]
+
+    @classmethod
+    def from_arrays(cls, X: np.ndarray, y: np.ndarray, ts: np.ndarray, symbol: str = "", interval: str = "15m",
+                    future_bars: int = 3, threshold: float = 0.001) -> "Dataset":
+        """One symbol's rows (ts sorted) held in memory or shared memory, behind the same interface."""
+        self = cls.__new__(cls)
+        self.path = None
+        self.X, self.y, self.ts = X, y, ts
+        self.sym = np.zeros(len(ts), dtype=np.int32)
+        self.meta = {"rows": len(ts), "features": list(FEATURE_COLS), "interval": interval,
+                     "future_bars": future_bars, "threshold": threshold,
+                     "symbols": [{"symbol": symbol, "start": 0, "stop": len(ts)}], "built": None}
+        self.symbols = [symbol]
+        self.features = self.meta["features"]
+        return self
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def ranges_between(self, start_ns: int, end_ns: int) -> Ranges:
+        """Per-symbol row ranges with start_ns <= ts < end_ns."""
+        out = []
+        for s in self.meta["symbols"]:
+            lo, hi = s["start"], s["stop"]
+            t = self.ts[lo:hi]
+            a, b = lo + np.searchsorted(t, [start_ns, end_ns], side="left")
+            if b > a:
+                out.append((int(a), int(b)))
+        return out
+
+    def ranges_before(self, cutoff_ns: int, purge_rows: int = 0, window_rows: Optional[int] = None) -> Ranges:
+        """
+        Per-symbol row ranges with ts < cutoff_ns, minus each symbol's last purge_rows rows and,
+        when window_rows is set, only the window_rows rows before those. Counted in rows, not
+        time, so session gaps (overnight, weekends) do not shrink the purge.
+        """
+        out = []
+        for s in self.meta["symbols"]:
+            lo, hi = s["start"], s["stop"]
+            b = lo + int(np.searchsorted(self.ts[lo:hi], cutoff_ns, side="left")) - purge_rows
+            a = lo if window_rows is None else max(lo, b - window_rows)
+            if b > a:
+                out.append((int(a), int(b)))
+        return out
+
+    def time_quantiles(self, q) -> np.ndarray:
+        """Quantiles of the row times (of a strided sample of at most 1M rows: 8 MB)."""
+        step = max(1, len(self.ts) // 1_000_000)
+        return np.quantile(self.ts[::step], q).astype(np.int64)
+
+    def time_split(self, test_frac: float = 0.2, purge_bars: Optional[int] = None,
+                   cutoff=None) -> Tuple[Ranges, Ranges, int]:
+        """
+        (train ranges, test ranges, cutoff ns): every symbol is cut at the same timestamp, by default
+        the (1 - test_frac) quantile of all row times. Each symbol's last purge_bars rows (default
+        future_bars) before the cutoff are dropped from train, since their labels look past it.
+        """
+        if cutoff is None:
+            cutoff = int(self.time_quantiles(1.0 - test_frac))
+        else:
+            cutoff = int(pd.Timestamp(cutoff).tz_localize("UTC").value if pd.Timestamp(cutoff).tzinfo is None
+                         else pd.Timestamp(cutoff).value)
+        purge = self.meta["future_bars"] if purge_bars is None else purge_bars
+        hi = np.iinfo(np.int64).max
+        return self.ranges_before(cutoff, purge), self.ranges_between(cutoff, hi), cutoff
+
+    def symbol_ranges(self, symbols: Iterable[str]) -> Ranges:
+        wanted = set(symbols)
+        return [(s["start"], s["stop"]) for s in self.meta["symbols"] if s["symbol"] in wanted]
+
+    def gather(self, ranges: Ranges, max_rows: Optional[int] = None, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (X float32, y) of the rows in ranges, in memory. Above max_rows a uniform sample (kept in
+        dataset order) is taken, so memory stays at max_rows x features x 4 bytes.
+        """
+        total = sum(hi - lo for lo, hi in ranges)
+        take = total if max_rows is None or total <= max_rows else int(max_rows)
+        X = np.empty((take, self.X.shape[1]), dtype=np.float32)
+        y = np.empty(take, dtype=np.int8)
+        pick = None
+        if take < total:
+            logger.info("Sampling %d of %d rows", take, total)
+            pick = np.sort(np.random.default_rng(seed).choice(total, size=take, replace=False))
+        pos = seen = 0
+        for lo, hi in ranges:
+            if pick is None:
+                X[pos:pos + hi - lo] = self.X[lo:hi]
+                y[pos:pos + hi - lo] = self.y[lo:hi]
+                pos += hi - lo
+            else:
+                a, b = np.searchsorted(pick, [seen, seen + hi - lo])
+                rows = pick[a:b] - seen + lo
+                X[pos:pos + len(rows)] = self.X[rows]
+                y[pos:pos + len(rows)] = self.y[rows]
+                pos += len(rows)
+            seen += hi - lo
+        return X, y
+
+    def batches(self, ranges: Ranges, batch_rows: int = 100_000) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(X, y) memory-mapped views of at most batch_rows rows, over the ranges in order."""
+        for lo, hi in ranges:
+            for a in range(lo, hi, batch_rows):
+                b = min(a + batch_rows, hi)
+                yield self.X[a:b], self.y[a:b]
+
+    def describe(self) -> dict:
+        m = self.meta
+        return {"path": str(self.path), "rows": m["rows"], "symbols": len(m["symbols"]), "interval": m["interval"],
+                "features": m["features"], "future_bars": m["future_bars"], "threshold": m["threshold"],
+                "from": str(pd.Timestamp(int(self.ts.min()), tz="UTC")) if m["rows"] else None,
+                "to": str(pd.Timestamp(int(self.ts.max()), tz="UTC")) if m["rows"] else None,
+                "X_mb": round(self.X.nbytes / 1e6, 1), "built": m["built"]}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build")
+    p_build.add_argument("--symbols", nargs="*", default=None, help="universe symbols")
+    p_build.add_argument("--registry", action="store_true", help="every symbol in the instrument registry")
+    p_build.add_argument("--interval", default="15m")
+    p_build.add_argument("--days", type=int, default=365, help="history to fetch into the bar cache first")
+    p_build.add_argument("--no-fetch", action="store_true", help="use what is already cached")
+    p_build.add_argument("--future-bars", type=int, default=3)
+    p_build.add_argument("--threshold", type=float, default=0.001)
+    p_build.add_argument("--chunk-rows", type=int, default=200_000)
+    p_build.add_argument("--out", required=True)
+    p_info = sub.add_parser("info")
+    p_info.add_argument("path")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.cmd == "build":
+        symbols = list(args.symbols or [])
+        if args.registry:
+            from universal_fetcher import load_instrument_registry
+            symbols += [r["universe_symbol"] for r in load_instrument_registry()]
+        if not symbols:
+            ap.error("give --symbols or --registry")
+        if not args.no_fetch:
+            symbols = fetch_to_cache(symbols, args.interval, args.days)
+        ds = build_dataset(symbols, args.out, interval=args.interval, future_bars=args.future_bars,
+                           threshold=args.threshold, chunk_rows=args.chunk_rows)
+        print(json.dumps(ds.describe(), indent=2))
+    elif args.cmd == "info":
+        print(json.dumps(Dataset(args.path).describe(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,21 @@
 """
 Demo multi-asset strategy:
 - Loads instrument_registry.csv
-- Fetches OHLCV via universal_fetcher.fetch_market_data()
+- Fetches OHLCV concurrently via universal_fetcher.fetch_market_data_many() (per-provider rate limits)
 - Uses candlestick 'final_signal' + simple MA crossover as a proxy for AI signal
 - Prints suggested trades with size_pct (paper mode)
+- One-shot; live/strategy_loop.py runs the same signals continuously, at each bar close
 
 Usage:
 python scripts/demo_multi_asset_strategy.py
 """
 
-import csv
 import time
 import logging
 from pathlib import Path
-from universal_fetcher import fetch_market_data
+import numpy as np
+import pandas as pd
+from universal_fetcher import fetch_market_data_many, load_instrument_registry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,54 +39,68 @@ def simple_ma_signal(df, fast=8, slow=21):
     else:
         return 0
 
+def ma_signal_series(close, fast=8, slow=21):
+    """simple_ma_signal() evaluated at every bar: 1 / -1 / 0 (0 until both MAs exist)"""
+    close = pd.Series(close)
+    diff = (close.rolling(fast).mean() - close.rolling(slow).mean()).to_numpy()
+    return np.where(diff > 0, 1, np.where(diff < 0, -1, 0))
+
 def compute_size_pct(config_capital=100000, risk_per_trade_pct=1.0):
     """Simple fixed size for demo. Real: compute via ATR or margin."""
     return min(2.0, risk_per_trade_pct)  # return percent
 
-def run_demo():
+def evaluate_symbol(uni_sym, df):
+    """Combine candlestick final_signal with the MA proxy; returns a suggested trade dict or None."""
+    # Use candlestick final_signal if present
+    final_signal = 0
+    if "final_signal" in df.columns:
+        final_signal = int(df["final_signal"].iloc[-1])
+    # AI proxy: simple MA crossover
+    ai_signal = simple_ma_signal(df)
+    return suggest_trade(uni_sym, ai_signal, final_signal)
+
+def suggest_trade(uni_sym, ai_signal, final_signal):
+    """Trade dict for the combined MA / candlestick signal, or None (also used by live/strategy_loop.py)."""
+    # Combine rules: require AI + candle agreement to act
+    combined = 0
+    if ai_signal == final_signal and ai_signal != 0:
+        combined = ai_signal
+    else:
+        # Less strict option: take majority or weighted
+        if ai_signal != 0 and final_signal != 0 and ai_signal == final_signal:
+            combined = ai_signal
+        elif ai_signal != 0 and final_signal == 0:
+            combined = ai_signal  # allow AI-only
+        elif final_signal != 0 and ai_signal == 0:
+            combined = final_signal  # allow pattern-only in demo
+
+    if combined == 0:
+        return None
+    return {
+        "symbol": uni_sym,
+        "side": "BUY" if combined==1 else "SELL",
+        "size_pct": compute_size_pct(),
+        "reason": f"ai={ai_signal},candle={final_signal}"
+    }
+
+def run_demo(max_workers=8):
     if not REGISTRY_PATH.exists():
         logger.error("Registry file missing: %s", REGISTRY_PATH)
         return
     suggested_trades = []
-    with open(REGISTRY_PATH) as f:
-        reader = csv.reader([row for row in f if row.strip() and not row.strip().startswith("#")])
-        for row in reader:
-            try:
-                uni_sym = row[0].strip()
-            except Exception:
-                continue
-            logger.info("Fetching %s", uni_sym)
-            df = fetch_market_data(uni_sym, interval=DEFAULT_INTERVAL, period=DEFAULT_PERIOD)
-            if df is None or df.empty:
-                logger.warning("No data for %s", uni_sym)
-                continue
-            # Use candlestick final_signal if present
-            final_signal = 0
-            if "final_signal" in df.columns:
-                final_signal = int(df["final_signal"].iloc[-1])
-            # AI proxy: simple MA crossover
-            ai_signal = simple_ma_signal(df)
-            # Combine rules: require AI + candle agreement to act
-            combined = 0
-            if ai_signal == final_signal and ai_signal != 0:
-                combined = ai_signal
-            else:
-                # Less strict option: take majority or weighted
-                if ai_signal != 0 and final_signal != 0 and ai_signal == final_signal:
-                    combined = ai_signal
-                elif ai_signal != 0 and final_signal == 0:
-                    combined = ai_signal  # allow AI-only
-                elif final_signal != 0 and ai_signal == 0:
-                    combined = final_signal  # allow pattern-only in demo
-
-            if combined != 0:
-                suggested_trades.append({
-                    "symbol": uni_sym,
-                    "side": "BUY" if combined==1 else "SELL",
-                    "size_pct": compute_size_pct(),
-                    "reason": f"ai={ai_signal},candle={final_signal}"
-                })
-            time.sleep(0.5)  # polite pause to avoid rate limits
+    registry = load_instrument_registry(REGISTRY_PATH)
+    symbols = [(r["universe_symbol"], r["provider_hint"]) for r in registry]
+    t0 = time.perf_counter()
+    # fetches run concurrently, paced per provider (rate_limit.py); results arrive as each symbol completes
+    for uni_sym, df in fetch_market_data_many(symbols, interval=DEFAULT_INTERVAL, period=DEFAULT_PERIOD,
+                                              max_workers=max_workers):
+        if df is None or df.empty:
+            logger.warning("No data for %s", uni_sym)
+            continue
+        trade = evaluate_symbol(uni_sym, df)
+        if trade:
+            suggested_trades.append(trade)
+    logger.info("Sweep of %d symbols took %.2fs", len(symbols), time.perf_counter() - t0)
 
     logger.info("Suggested trades (paper):")
     for t in suggested_trades:
@@ -0,0 +1,231 @@
+# scripts/feature_store.py
+"""
+Content-addressed cache for build_features_and_labels().
+- key = sha256(OHLCV index + values, feature spec, label params)
+- entry = X as one 2D float64 .npy (loaded memory-mapped), y, the row index and the
+  df_all columns, plus meta.json (sizes, last access)
+- total size is bounded; least recently used entries are evicted first
+
+Usage:
+python -m scripts.feature_store ls
+python -m scripts.feature_store info <key>
+python -m scripts.feature_store prune --max-mb 500
+python -m scripts.feature_store clear
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import ta
+
+from scripts.features import FEATURE_COLS, FEATURE_VERSION, build_features_and_labels
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.getenv("FEATURE_STORE_DIR", "data/cache/features")
+DEFAULT_MAX_BYTES = int(os.getenv("FEATURE_STORE_MAX_BYTES", 2 * 1024 ** 3))
+OHLCV = ["open", "high", "low", "close", "volume"]
+
+
+def _index_ns(index) -> np.ndarray:
+    idx = pd.DatetimeIndex(index)
+    if idx.tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    return idx.values.astype("datetime64[ns]").view("int64")
+
+
+def feature_key(df: pd.DataFrame, future_bars: int, threshold: float) -> str:
+    """Hash of the input bars, the feature spec and the label parameters."""
+    h = hashlib.sha256()
+    h.update(_index_ns(df.index).tobytes())
+    tz = getattr(df.index, "tz", None)
+    h.update(str(tz).encode())
+    for col in OHLCV:
+        h.update(col.encode())
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+    spec = {"features": FEATURE_COLS, "version": FEATURE_VERSION, "ta": getattr(ta, "__version__", ""),
+            "future_bars": int(future_bars), "threshold": float(threshold)}
+    h.update(json.dumps(spec, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class FeatureStore:
+    def __init__(self, root: str = DEFAULT_ROOT, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def _meta(self, key):
+        path = self.root / key / "meta.json"
+        try:
+            return json.loads(path.read_text())
+        except Exception:
+            return None
+
+    def entries(self):
+        """[(key, meta)] for every complete entry."""
+        if not self.root.exists():
+            return []
+        out = []
+        for d in self.root.iterdir():
+            if d.is_dir() and not d.name.startswith("."):
+                meta = self._meta(d.name)
+                if meta is not None:
+                    out.append((d.name, meta))
+        return out
+
+    def get(self, key):
+        """(X, y, df_all) for a cached key, or None. X is backed by a memory-mapped matrix."""
+        meta = self._meta(key)
+        if meta is None:
+            return None
+        d = self.root / key
+        try:
+            tz = meta.get("tz")
+            index = pd.DatetimeIndex(np.load(d / "index.npy").astype("datetime64[ns]"))
+            if tz:
+                index = index.tz_localize("UTC").tz_convert(tz)
+            if meta.get("unit") and hasattr(index, "as_unit"):
+                index = index.as_unit(meta["unit"])
+            x_rows = np.load(d / "x_rows.npy")
+            X = pd.DataFrame(np.load(d / "X.npy", mmap_mode="r"), index=index[x_rows],
+                             columns=meta["x_columns"], copy=False)
+            y = pd.Series(np.load(d / "y.npy"), index=X.index, name="label")
+            df_all = pd.DataFrame({c: np.load(d / f"col_{i}.npy", mmap_mode="r")
+                                   for i, c in enumerate(meta["columns"])}, index=index)
+        except Exception as e:
+            logger.warning("Feature store entry %s unreadable, dropping it: %s", key, e)
+            self.delete(key)
+            return None
+        meta["last_access"] = time.time()
+        try:
+            (d / "meta.json").write_text(json.dumps(meta))
+        except OSError:
+            pass
+        return X, y, df_all
+
+    def put(self, key, X, y, df_all):
+        tmp = self.root / f".tmp-{key}-{os.getpid()}"
+        tmp.mkdir(parents=True, exist_ok=True)
+        np.save(tmp / "index.npy", _index_ns(df_all.index))
+        np.save(tmp / "x_rows.npy", df_all.index.get_indexer(X.index).astype(np.int64))
+        np.save(tmp / "X.npy", np.ascontiguousarray(X.to_numpy(dtype=np.float64)))
+        np.save(tmp / "y.npy", y.to_numpy())
+        for i, c in enumerate(df_all.columns):
+            np.save(tmp / f"col_{i}.npy", df_all[c].to_numpy())
+        size = sum(f.stat().st_size for f in tmp.iterdir())
+        tz = getattr(df_all.index, "tz", None)
+        meta = {"key": key, "rows": len(df_all), "x_columns": list(X.columns), "columns": list(df_all.columns),
+                "tz": str(tz) if tz is not None else None, "unit": getattr(df_all.index, "unit", None),
+                "bytes": size,
+                "created": time.time(), "last_access": time.time()}
+        (tmp / "meta.json").write_text(json.dumps(meta))
+        final = self.root / key
+        if final.exists():
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.replace(tmp, final)
+        self.evict()
+
+    def delete(self, key):
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def total_bytes(self):
+        return sum(m.get("bytes", 0) for _, m in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Drop least recently used entries until the store fits in max_bytes. Returns evicted keys."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e[1].get("last_access", 0))
+        total = sum(m.get("bytes", 0) for _, m in entries)
+        evicted = []
+        for key, meta in entries:
+            if total <= limit:
+                break
+            self.delete(key)
+            total -= meta.get("bytes", 0)
+            evicted.append(key)
+        if evicted:
+            logger.info("Feature store evicted %d entries", len(evicted))
+        return evicted
+
+
+_default_store = None
+
+
+def get_store() -> FeatureStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = FeatureStore()
+    return _default_store
+
+
+def cached_features_and_labels(df: pd.DataFrame, future_bars: int = 3, threshold: float = 0.001, store=None):
+    """Drop-in for build_features_and_labels() that reuses a cached result for identical inputs."""
+    store = store or get_store()
+    key = feature_key(df, future_bars, threshold)
+    hit = store.get(key)
+    if hit is not None:
+        logger.info("Feature store hit %s", key[:12])
+        return hit
+    X, y, df_all = build_features_and_labels(df, future_bars=future_bars, threshold=threshold)
+    try:
+        store.put(key, X, y, df_all)
+    except OSError as e:
+        logger.warning("Could not write feature store entry: %s", e)
+    return X, y, df_all
+
+
+# ------------------ CLI ------------------
+def main():
+    ap = argparse.ArgumentParser(description="Inspect and prune the feature store")
+    ap.add_argument("--root", default=DEFAULT_ROOT)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("ls")
+    p_info = sub.add_parser("info")
+    p_info.add_argument("key")
+    p_prune = sub.add_parser("prune")
+    p_prune.add_argument("--max-mb", type=float, default=None)
+    p_prune.add_argument("--older-than-days", type=float, default=None)
+    sub.add_parser("clear")
+    args = ap.parse_args()
+
+    store = FeatureStore(args.root)
+    if args.cmd == "ls":
+        entries = sorted(store.entries(), key=lambda e: e[1].get("last_access", 0), reverse=True)
+        for key, m in entries:
+            print(f"{key[:16]}  rows={m['rows']:>9}  {m['bytes'] / 1e6:8.1f} MB  "
+                  f"last_access={time.strftime('%Y-%m-%d %H:%M', time.localtime(m['last_access']))}")
+        print(f"{len(entries)} entries, {store.total_bytes() / 1e6:.1f} MB")
+    elif args.cmd == "info":
+        matches = [(k, m) for k, m in store.entries() if k.startswith(args.key)]
+        if not matches:
+            print("No entry", args.key)
+        for key, m in matches:
+            print(json.dumps(m, indent=2))
+    elif args.cmd == "prune":
+        removed = []
+        if args.older_than_days is not None:
+            cutoff = time.time() - args.older_than_days * 86400
+            for key, m in store.entries():
+                if m.get("last_access", 0) < cutoff:
+                    store.delete(key)
+                    removed.append(key)
+        if args.max_mb is not None:
+            removed += store.evict(int(args.max_mb * 1e6))
+        print("Removed", len(removed), "entries")
+    elif args.cmd == "clear":
+        n = len(store.entries())
+        shutil.rmtree(store.root, ignore_errors=True)
+        print("Removed", n, "entries")
+
+
+if __name__ == "__main__":
+    main()
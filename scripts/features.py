@@ -1,8 +1,13 @@
 # scripts/features.py
 import pandas as pd
 import numpy as np
+import math
 import ta  # technical indicators library
 
+FEATURE_COLS = ["close","volume","rsi14","ma20","ma50","atr14","returns"]
+# bump when indicator / label code changes: invalidates cached entries in scripts/feature_store.py
+FEATURE_VERSION = 1
+
 def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df["rsi14"] = ta.momentum.rsi(df["close"], window=14)
@@ -28,7 +33,145 @@ def build_features_and_labels(df: pd.DataFrame, future_bars: int = 3, threshold:
         else:
             return 0
     df["label"] = df["future_return"].apply(lambda x: label(x) if pd.notnull(x) else 0)
-    feature_cols = ["close","volume","rsi14","ma20","ma50","atr14","returns"]
-    X = df[feature_cols].dropna()
+    X = df[FEATURE_COLS].dropna()
     y = df.loc[X.index, "label"]
     return X, y, df
+
+
+# --------------- Incremental indicators for live bars ---------------
+class _EwmMean:
+    """pandas .ewm(alpha=..., adjust=False).mean() one value at a time (same float ops as the Cython kernel)."""
+
+    def __init__(self, alpha: float, min_periods: int):
+        com = (1 - alpha) / alpha
+        a = 1. / (1. + com)
+        self.old_wt = 1. - a
+        self.new_wt = a
+        self.min_periods = min_periods
+        self.weighted = math.nan
+        self.nobs = 0
+
+    def update(self, cur: float) -> float:
+        if cur == cur:
+            self.nobs += 1
+            if self.weighted != self.weighted:
+                self.weighted = cur
+            elif self.weighted != cur:
+                self.weighted = (self.old_wt * self.weighted + self.new_wt * cur) / (self.old_wt + self.new_wt)
+        return self.weighted if self.nobs >= self.min_periods else math.nan
+
+
+class _RollingMean:
+    """pandas .rolling(window).mean() one value at a time (Kahan add/remove, as in roll_mean)."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buf = [math.nan] * window
+        self.i = 0
+        self.sum_x = self.comp_add = self.comp_remove = 0.
+        self.nobs = self.neg_ct = 0
+        self.same = 0
+        self.prev = math.nan
+
+    def update(self, val: float) -> float:
+        if math.isinf(val):
+            val = math.nan  # rolling ops treat inf as NaN
+        if self.i == 0:
+            self.prev = val
+        slot = self.i % self.window
+        if self.i >= self.window:
+            old = self.buf[slot]
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_remove
+                t = self.sum_x + y
+                self.comp_remove = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1., old) < 0:
+                    self.neg_ct -= 1
+        self.buf[slot] = val
+        self.i += 1
+        if val == val:
+            self.nobs += 1
+            y = val - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1., val) < 0:
+                self.neg_ct += 1
+            self.same = self.same + 1 if val == self.prev else 1
+            self.prev = val
+        if self.nobs < self.window or self.nobs <= 0:
+            return math.nan
+        result = self.sum_x / self.nobs
+        if self.same >= self.nobs:
+            result = self.prev
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.
+        return result
+
+
+class IndicatorState:
+    """
+    Recursive state for the features in FEATURE_COLS: Wilder/EWM smoothing for RSI14,
+    Wilder ATR14, running (Kahan) sums for MA20/MA50 and the last close for returns.
+    update() is O(1) per bar and returns the same row build_features_and_labels() puts in X
+    for that bar (None while the indicators are still warming up), provided the state has
+    seen the same history from its first bar (see from_history()).
+    """
+
+    def __init__(self):
+        self.prev_close = math.nan
+        self.bars = 0
+        self._ema_up = _EwmMean(1 / 14, 14)
+        self._ema_dn = _EwmMean(1 / 14, 14)
+        self._ma20 = _RollingMean(20)
+        self._ma50 = _RollingMean(50)
+        self._tr_seed = []
+        self.atr = 0.
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame) -> "IndicatorState":
+        """Warm start: replay an OHLCV history through update()."""
+        state = cls()
+        for o, h, l, c, v in df[["open","high","low","close","volume"]].itertuples(index=False):
+            state.update(o, h, l, c, v)
+        return state
+
+    def update(self, open_: float, high: float, low: float, close: float, volume: float):
+        h, l, c = float(high), float(low), float(close)
+        pc = self.prev_close
+
+        # RSI (ta.momentum.rsi): diff -> up/down -> ewm(alpha=1/14, adjust=False)
+        diff = c - pc
+        up = diff if diff > 0 else 0.0
+        dn = -(diff if diff < 0 else 0.0)
+        emaup = self._ema_up.update(up)
+        emadn = self._ema_dn.update(dn)
+        rsi = 100.0 if emadn == 0 else 100 - (100 / (1 + emaup / emadn))
+
+        # ATR (ta.volatility.average_true_range): seed with the mean of the first 14 TRs, then Wilder
+        trs = [x for x in (h - l, abs(h - pc), abs(l - pc)) if x == x]
+        tr = max(trs) if trs else math.nan
+        if self.bars < 14:
+            self._tr_seed.append(tr)
+            if self.bars == 13:
+                seed = np.array(self._tr_seed, dtype=np.float64)
+                valid = ~np.isnan(seed)
+                self.atr = np.where(valid, seed, 0.).sum() / valid.sum()
+                self._tr_seed = []
+        else:
+            self.atr = (self.atr * (14 - 1) + tr) / float(14)
+
+        ma20 = self._ma20.update(c)
+        ma50 = self._ma50.update(c)
+        returns = c / pc - 1
+
+        self.prev_close = c
+        self.bars += 1
+        row = (c, float(volume), rsi, ma20, ma50, self.atr, returns)
+        if any(x != x for x in row) or open_ != open_ or h != h or l != l:
+            return None
+        return np.array(row, dtype=np.float64)
@@ -0,0 +1,237 @@
+# scripts/flat_forest.py
+"""
+Flattened inference for the StandardScaler + RandomForest pipeline from scripts/model.py.
+- compile_forest(): fitted Pipeline -> flat node arrays for all trees
+  (feature, threshold, children, per-leaf class probabilities) + scaler mean/scale
+- FlatForest.predict(): vectorized traversal; small batches walk all (row, tree) pairs at once,
+  large batches go tree by tree so each tree's nodes stay in cache
+- save()/load(): a directory of .npy files, loaded memory-mapped (near-instant)
+
+Predictions follow sklearn exactly: X is scaled in float64, cast to float32 (as the trees do),
+compared with the float64 thresholds, leaf probabilities are summed tree by tree and the
+argmax class is returned.
+
+Usage:
+python -m scripts.flat_forest export models/rf_model.pkl models/rf_model_flat
+python -m scripts.flat_forest bench models/rf_model.pkl        # agreement + latency vs sklearn
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+_ARRAYS = ["mean", "scale", "roots", "feature", "threshold", "children", "leaf_row", "leaf_value", "classes"]
+
+
+class FlatForest:
+    # below this many rows (live path) traverse (rows x trees) in one go: fewest numpy calls
+    BATCH_BY_TREE = 64
+
+    def __init__(self, mean, scale, roots, feature, threshold, children, leaf_row, leaf_value, classes):
+        self.mean = mean
+        self.scale = scale
+        self.roots = roots            # (T,) global node id of each tree's root
+        self.feature = feature        # (N,) feature index, -2 at leaves
+        self.threshold = threshold    # (N,) float64 split threshold
+        self.children = children      # (2N,) [left, right] child ids per node
+        self.leaf_row = leaf_row      # (N,) row in leaf_value, -1 for internal nodes
+        self.leaf_value = leaf_value  # (L, C) normalized class probabilities
+        self.classes = classes
+        self.n_trees = len(roots)
+        self.n_features = len(mean)
+
+    # ---------- inference ----------
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        Xs = (X - self.mean) / self.scale
+        # trees compare float32 features against float64 thresholds
+        return Xs.astype(np.float32).astype(np.float64)
+
+    def apply(self, X):
+        """Leaf node id reached in every tree: (n_rows, n_trees)."""
+        Xs = self.transform(X)
+        m, F = Xs.shape
+        xflat = Xs.ravel()
+        if m < self.BATCH_BY_TREE:
+            return self._apply_all_trees(xflat, m, F)
+        return self._apply_by_tree(xflat, m, F)
+
+    def _apply_all_trees(self, xflat, m, F):
+        T = self.n_trees
+        node = np.tile(np.asarray(self.roots, dtype=np.int64), m)
+        base = np.repeat(np.arange(m, dtype=np.int64) * F, T)
+        active = np.flatnonzero(self.feature[node] >= 0)
+        while active.size:
+            n = node[active]
+            go_right = xflat[base[active] + self.feature[n]] > self.threshold[n]
+            nxt = self.children[2 * n + go_right]
+            node[active] = nxt
+            active = active[self.feature[nxt] >= 0]
+        return node.reshape(m, T)
+
+    def _apply_by_tree(self, xflat, m, F):
+        # large batches: one tree at a time keeps that tree's nodes in cache
+        feature, threshold, children = self.feature, self.threshold, self.children
+        base = np.arange(m, dtype=np.int64) * F
+        out = np.empty((m, self.n_trees), dtype=np.int64)
+        for t, root in enumerate(self.roots):
+            node = np.full(m, root, dtype=np.int64)
+            active = np.arange(m) if feature[root] >= 0 else np.empty(0, dtype=np.int64)
+            while active.size:
+                n = node[active]
+                nxt = children[2 * n + (xflat[base[active] + feature[n]] > threshold[n])]
+                node[active] = nxt
+                active = active[feature[nxt] >= 0]
+            out[:, t] = node
+        return out
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        vals = self.leaf_value[self.leaf_row[leaves]]  # (m, T, C)
+        out = np.zeros((leaves.shape[0], self.leaf_value.shape[1]), dtype=np.float64)
+        for t in range(self.n_trees):  # tree-by-tree accumulation, like sklearn
+            out += vals[:, t]
+        out /= self.n_trees
+        return out
+
+    def predict(self, X):
+        return np.asarray(self.classes).take(np.argmax(self.predict_proba(X), axis=1))
+
+    # ---------- persistence ----------
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        meta = {"format": "flat_forest", "version": 1, "n_trees": self.n_trees,
+                "n_features": self.n_features, "n_nodes": int(len(self.feature))}
+        (path / "meta.json").write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, path, mmap: bool = True):
+        path = Path(path)
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None) for name in _ARRAYS}
+        return cls(**arrays)
+
+
+def compile_forest(model) -> FlatForest:
+    """Flatten a fitted Pipeline([('scaler', StandardScaler), ('rf', RandomForestClassifier)])."""
+    scaler, rf = model.named_steps["scaler"], model.named_steps["rf"]
+    if getattr(rf, "n_outputs_", 1) != 1:
+        raise ValueError("multi-output forests are not supported")
+    n_classes = int(rf.n_classes_)
+    roots, features, thresholds, children, leaf_rows, leaf_values = [], [], [], [], [], []
+    offset = leaf_offset = 0
+    for est in rf.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        left, right = tree.children_left.astype(np.int64), tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, -2, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        ch = np.empty(2 * n, dtype=np.int64)
+        ch[0::2] = np.where(is_leaf, np.arange(n), left) + offset
+        ch[1::2] = np.where(is_leaf, np.arange(n), right) + offset
+        children.append(ch)
+        rows = np.full(n, -1, dtype=np.int64)
+        rows[is_leaf] = np.arange(int(is_leaf.sum())) + leaf_offset
+        leaf_rows.append(rows)
+        # same normalization as DecisionTreeClassifier.predict_proba
+        proba = tree.value[is_leaf][:, 0, :n_classes].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        leaf_values.append(proba / normalizer)
+        offset += n
+        leaf_offset += int(is_leaf.sum())
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(scaler.n_features_in_)
+    scale = scaler.scale_ if scaler.with_std else np.ones(scaler.n_features_in_)
+    idx_dtype = np.int32 if offset < 2 ** 31 else np.int64
+    return FlatForest(
+        mean=np.asarray(mean, dtype=np.float64),
+        scale=np.asarray(scale, dtype=np.float64),
+        roots=np.asarray(roots, dtype=idx_dtype),
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        children=np.concatenate(children).astype(idx_dtype),
+        leaf_row=np.concatenate(leaf_rows).astype(idx_dtype),
+        leaf_value=np.concatenate(leaf_values),
+        classes=np.asarray(rf.classes_),
+    )
+
+
+def export_flat(model, path):
+    flat = compile_forest(model)
+    flat.save(path)
+    return flat
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).iterdir())
+
+
+def bench(model_path, n_rows=5000, seed=0):
+    """Check agreement with model.predict and compare load / per-row / batch latency."""
+    import joblib
+    t = time.perf_counter()
+    model = joblib.load(model_path)
+    t_load_pickle = time.perf_counter() - t
+    flat_path = os.path.splitext(model_path)[0] + "_flat"
+    export_flat(model, flat_path)
+    t = time.perf_counter()
+    flat = FlatForest.load(flat_path)
+    t_load_flat = time.perf_counter() - t
+
+    scaler = model.named_steps["scaler"]
+    rng = np.random.default_rng(seed)
+    X = scaler.mean_ + rng.normal(size=(n_rows, scaler.n_features_in_)) * scaler.scale_
+    if hasattr(model, "feature_names_in_"):
+        import pandas as pd
+        X = pd.DataFrame(X, columns=model.feature_names_in_)
+    t = time.perf_counter()
+    ref = model.predict(X)
+    t_batch_sk = time.perf_counter() - t
+    t = time.perf_counter()
+    got = flat.predict(np.asarray(X))
+    t_batch_flat = time.perf_counter() - t
+
+    k = 50
+    t = time.perf_counter()
+    for i in range(k):
+        model.predict(X[i:i + 1])
+    t_row_sk = (time.perf_counter() - t) / k
+    t = time.perf_counter()
+    for i in range(k):
+        flat.predict(X[i:i + 1])
+    t_row_flat = (time.perf_counter() - t) / k
+
+    print(f"agreement: {np.mean(ref == got) * 100:.3f}% of {n_rows} rows")
+    print(f"load:      pickle {t_load_pickle * 1e3:8.1f} ms   flat {t_load_flat * 1e3:8.1f} ms")
+    print(f"size:      pickle {os.path.getsize(model_path) / 1e6:8.1f} MB   flat {_dir_size(flat_path) / 1e6:8.1f} MB")
+    print(f"per row:   sklearn {t_row_sk * 1e3:7.2f} ms   flat {t_row_flat * 1e3:7.2f} ms")
+    print(f"batch:     sklearn {t_batch_sk * 1e3:7.1f} ms   flat {t_batch_flat * 1e3:7.1f} ms  ({n_rows} rows)")
+    return bool(np.all(ref == got))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_exp = sub.add_parser("export")
+    p_exp.add_argument("model_path")
+    p_exp.add_argument("out_dir")
+    p_bench = sub.add_parser("bench")
+    p_bench.add_argument("model_path")
+    p_bench.add_argument("--rows", type=int, default=5000)
+    args = ap.parse_args()
+    if args.cmd == "export":
+        import joblib
+        export_flat(joblib.load(args.model_path), args.out_dir)
+        print("Exported flat forest to", args.out_dir)
+    else:
+        bench(args.model_path, n_rows=args.rows)
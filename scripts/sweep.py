@@ -0,0 +1,254 @@
+# scripts/sweep.py
+"""
+Parallel parameter sweep over the instrument registry.
+- each symbol's OHLCV is fetched once and copied into shared memory
+- (symbol x parameter) tasks are spread over a process pool; workers attach to the
+  shared arrays by name, so no frames are pickled per task
+- every finished task is appended to a JSONL checkpoint; re-running with the same
+  checkpoint skips what is already done
+- results are collected into one table ranked by --metric
+
+Grid file (YAML), one block per signal type:
+  ma:    {fast: [5, 8], slow: [21, 34], size_frac: [0.01, 0.02]}
+  model: {future_bars: [3, 5], threshold: [0.001, 0.002], size_frac: [0.01]}
+
+Usage:
+python -m scripts.sweep --config config_example.yml --grid grid.yml --checkpoint sweeps/run1.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import metrics
+from scripts.backtest import run_backtest
+from scripts.demo_multi_asset_strategy import ma_signal_series
+from scripts.features import build_features_and_labels
+from scripts.model import build_model
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OHLCV = ["open", "high", "low", "close", "volume"]
+DEFAULT_GRID = {
+    "ma": {"fast": [5, 8, 13], "slow": [21, 34, 55], "size_frac": [0.01]},
+    "model": {"future_bars": [3, 5], "threshold": [0.001, 0.002], "size_frac": [0.01]},
+}
+
+
+# --------------- shared memory ---------------
+def to_shared(df: pd.DataFrame):
+    """Copy an OHLCV frame into one shared block: int64 index (ns) followed by 5 float64 columns."""
+    n = len(df)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 6 * n * 8))
+    idx = pd.DatetimeIndex(df.index)
+    tz = str(idx.tz) if idx.tz is not None else None
+    if tz:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    np.ndarray((n,), dtype=np.int64, buffer=shm.buf)[:] = idx.values.astype("datetime64[ns]").view("int64")
+    np.ndarray((5, n), dtype=np.float64, buffer=shm.buf, offset=n * 8)[:] = df[OHLCV].to_numpy(dtype=np.float64).T
+    return shm, {"name": shm.name, "rows": n, "tz": tz}
+
+
+def attach_shared(desc):
+    """Zero-copy view of a block created by to_shared(). Returns (shm, index int64 array, 5 x n float array)."""
+    # pool workers share the parent's resource tracker; the parent unlinks the block when done
+    shm = shared_memory.SharedMemory(name=desc["name"])
+    n = desc["rows"]
+    index = np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+    cols = np.ndarray((5, n), dtype=np.float64, buffer=shm.buf, offset=n * 8)
+    return shm, index, cols
+
+
+_worker_data = {}
+
+
+def _init_worker(descriptors):
+    for sym, desc in descriptors.items():
+        _worker_data[sym] = (desc,) + attach_shared(desc)
+
+
+def _frame(sym):
+    desc, _shm, index, cols = _worker_data[sym]
+    idx = pd.DatetimeIndex(index.astype("datetime64[ns]"))
+    if desc["tz"]:
+        idx = idx.tz_localize("UTC").tz_convert(desc["tz"])
+    return pd.DataFrame(dict(zip(OHLCV, cols)), index=idx)
+
+
+# --------------- tasks ---------------
+def expand_grid(grid):
+    """{'ma': {'fast': [..], ...}, 'model': {...}} -> list of param dicts with a 'signal' key"""
+    combos = []
+    for signal, params in grid.items():
+        keys = sorted(params)
+        for values in itertools.product(*(params[k] for k in keys)):
+            p = dict(zip(keys, values))
+            if signal == "ma" and p.get("fast", 0) >= p.get("slow", 1):
+                continue
+            p["signal"] = signal
+            combos.append(p)
+    return combos
+
+
+def task_key(sym, params, interval=None, period=None):
+    """Checkpoint key: the data (symbol, interval, period) as well as the parameters."""
+    return json.dumps([sym, interval, period, params], sort_keys=True)
+
+
+def run_task(sym, params, test_size=0.2):
+    """Backtest one (symbol, params) combination on the shared arrays."""
+    df = _frame(sym)
+    size_frac = params.get("size_frac", 0.01)
+    if params["signal"] == "ma":
+        pred = ma_signal_series(df["close"].to_numpy(), params["fast"], params["slow"])
+        close, index = df["close"].to_numpy(), df.index
+    elif params["signal"] == "model":
+        X, y, df_all = build_features_and_labels(df, future_bars=params["future_bars"], threshold=params["threshold"])
+        split = int(len(X) * (1 - test_size))
+        if split < 50 or split >= len(X):
+            raise ValueError(f"not enough rows for {sym}: {len(X)}")
+        model = build_model()
+        model.set_params(rf__n_jobs=1)  # the pool already uses every core
+        model.fit(X.iloc[:split], y.iloc[:split])
+        pred = model.predict(X.iloc[split:])
+        close, index = df_all.loc[X.index[split:], "close"].to_numpy(), X.index[split:]
+    else:
+        raise ValueError(f"unknown signal type: {params['signal']}")
+    _, trades, stats = run_backtest(close, pred, size_frac=size_frac, index=index)
+    return {"symbol": sym, **params, **stats}
+
+
+def _run_task_safe(sym, params):
+    try:
+        return run_task(sym, params)
+    except Exception as e:
+        return {"symbol": sym, **params, "error": str(e)}
+
+
+# --------------- driver ---------------
+def load_checkpoint(path):
+    done = {}
+    if path and Path(path).exists():
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    done[rec["key"]] = rec["result"]
+    return done
+
+
+def run_sweep(frames, grid=None, workers=None, checkpoint=None, metric="total_return",
+              interval=None, period=None):
+    """
+    frames: {symbol: OHLCV DataFrame} of the given interval / period. Returns the ranked results
+    DataFrame for the current symbols x grid only.
+    checkpoint: JSONL path; finished tasks are appended as they complete and skipped on resume.
+    """
+    combos = expand_grid(grid or DEFAULT_GRID)
+    done = load_checkpoint(checkpoint)
+    tasks = {task_key(sym, p, interval, period): (sym, p) for sym in frames for p in combos}
+    results = [done[k] for k in tasks if k in done]
+    todo = [t for k, t in tasks.items() if k not in done]
+    logger.info("Sweep: %d symbols x %d combos, %d already done, %d to run",
+                len(frames), len(combos), len(results), len(todo))
+    if todo:
+        results += _run_tasks(frames, todo, workers, checkpoint, interval, period)
+
+    table = pd.DataFrame(results)
+    if not table.empty and metric in table.columns:
+        table = table.sort_values(metric, ascending=False, na_position="last").reset_index(drop=True)
+    return table
+
+
+def _run_tasks(frames, todo, workers, checkpoint, interval, period):
+    """Run (symbol, params) tasks in the pool over shared-memory frames; returns their records."""
+    blocks, descriptors = [], {}
+    results = []
+    try:
+        for sym in {sym for sym, _ in todo}:
+            shm, desc = to_shared(frames[sym])
+            blocks.append(shm)
+            descriptors[sym] = desc
+        if checkpoint:
+            Path(checkpoint).parent.mkdir(parents=True, exist_ok=True)
+        ckpt = open(checkpoint, "a") if checkpoint else None
+        try:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                     initializer=_init_worker, initargs=(descriptors,)) as pool:
+                futures = {pool.submit(_run_task_safe, sym, p): (sym, p) for sym, p in todo}
+                for i, fut in enumerate(as_completed(futures), 1):
+                    sym, p = futures[fut]
+                    res = fut.result()
+                    results.append(res)
+                    if "error" in res:
+                        # failed tasks are not checkpointed, so a resumed sweep retries them
+                        logger.warning("Task %s %s failed: %s", sym, p, res["error"])
+                    elif ckpt:
+                        ckpt.write(json.dumps({"key": task_key(sym, p, interval, period), "result": res}) + "\n")
+                        ckpt.flush()
+                    if i % 50 == 0:
+                        logger.info("Sweep progress: %d/%d", i, len(todo))
+        finally:
+            if ckpt:
+                ckpt.close()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    return results
+
+
+def load_universe(interval, period, symbols=None):
+    """Fetch every registry symbol once (concurrently) and keep the OHLCV part."""
+    from universal_fetcher import fetch_market_data_many, load_instrument_registry
+    if symbols is None:
+        symbols = [(r["universe_symbol"], r["provider_hint"]) for r in load_instrument_registry()]
+    frames = {}
+    for sym, df in fetch_market_data_many(symbols, interval=interval, period=period):
+        if df is None or df.empty:
+            logger.warning("No data for %s, skipping", sym)
+            continue
+        frames[sym] = df[OHLCV].dropna()
+    return frames
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", default="config_example.yml")
+    ap.add_argument("--grid", default=None, help="YAML grid file (default: DEFAULT_GRID)")
+    ap.add_argument("--symbols", nargs="*", default=None, help="universe symbols (default: whole registry)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--checkpoint", default="sweeps/checkpoint.jsonl")
+    ap.add_argument("--out", default="sweeps/results.csv")
+    ap.add_argument("--metric", default="total_return")
+    ap.add_argument("--metrics-json", default=None, help="write stage latencies / counters here")
+    args = ap.parse_args()
+
+    cfg = yaml.safe_load(open(args.config))
+    interval = cfg.get("interval", "15m")
+    period = f"{cfg.get('history_days', 365)}d"
+    grid = yaml.safe_load(open(args.grid)) if args.grid else None
+
+    frames = load_universe(interval, period, args.symbols)
+    table = run_sweep(frames, grid, workers=args.workers, checkpoint=args.checkpoint, metric=args.metric,
+                      interval=interval, period=period)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(args.out, index=False)
+    print(table.head(20).to_string())
+    print("Saved", len(table), "results to", args.out)
+    if args.metrics_json:
+        metrics.dump_json(args.metrics_json)
+
+
+if __name__ == "__main__":
+    main()
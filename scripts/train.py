@@ -1,38 +1,113 @@
 # scripts/train.py
 import argparse
 import os
+import numpy as np
+import pandas as pd
 import yaml
+import metrics
 from scripts.data_fetch import fetch_ohlcv
-from scripts.features import build_features_and_labels
+from scripts.dataset import Dataset
+from scripts.feature_store import cached_features_and_labels
 from scripts.model import build_model, save_model
+from scripts.flat_forest import export_flat
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 
-def main(config_path):
+def train_on_dataset(path, test_frac=0.2, max_train_rows=2_000_000, batch_rows=200_000):
+    """
+    Fit on a multi-symbol dataset from scripts/dataset.py. All symbols are split at one time
+    cutoff; at most max_train_rows training rows are loaded and the test rows are predicted
+    in batches, so memory does not grow with the dataset.
+    """
+    ds = Dataset(path)
+    train, test, cutoff = ds.time_split(test_frac)
+    print(f"Dataset {path}: {len(ds)} rows, {len(ds.symbols)} symbols, test from {pd.Timestamp(cutoff, tz='UTC')}")
+    X_train, y_train = ds.gather(train, max_rows=max_train_rows)
+
+    model = build_model()
+    with metrics.span("fit"):
+        model.fit(X_train, y_train)
+    del X_train, y_train
+
+    y_test, preds = [], []
+    with metrics.span("predict"):
+        for X_batch, y_batch in ds.batches(test, batch_rows):
+            preds.append(model.predict(X_batch))
+            y_test.append(np.asarray(y_batch))
+    print("Classification report:")
+    print(classification_report(np.concatenate(y_test), np.concatenate(preds)))
+    return model
+
+def walk_forward(ds, cfg, n_folds, mode="expanding", out="runs/walk_forward"):
+    """Per-fold metrics and the out-of-sample backtest of scripts/walk_forward.py, saved to out."""
+    from scripts.walk_forward import backtest_oos, run_walk_forward, save_results, summarize
+    with metrics.span("walk_forward"):
+        folds, oos = run_walk_forward(ds, n_folds, mode, train_bars=cfg.get("wf_train_bars"),
+                                      cores=cfg.get("wf_cores"), max_train_rows=cfg.get("max_train_rows", 2_000_000))
+    summary = summarize(folds, oos)
+    print(folds[["fold", "test_start", "test_end", "n_train", "n_test", "accuracy", "f1_macro", "fit_s"]].to_string(index=False))
+    print("Out-of-sample classification report:")
+    print(classification_report(oos["y"], oos["pred"]))
+    print(backtest_oos(oos).to_string(index=False))
+    save_results(out, folds, oos, summary)
+    print("Saved walk-forward results to", out)
+
+def main(config_path, metrics_json=None, dataset=None, wf_folds=None, wf_mode=None):
     cfg = yaml.safe_load(open(config_path))
     sym = cfg.get("symbol", "AAPL")
     interval = cfg.get("interval", "15m")
     days = cfg.get("history_days", 365)
     model_path = cfg.get("model_path", "models/rf_model.pkl")
     os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    dataset = dataset or cfg.get("dataset")
+    wf_folds = wf_folds or cfg.get("walk_forward")
+    wf_mode = wf_mode or cfg.get("wf_mode", "expanding")
+    if dataset and wf_folds:
+        walk_forward(Dataset(dataset), cfg, wf_folds, wf_mode)
+    if dataset:
+        model = train_on_dataset(dataset, max_train_rows=cfg.get("max_train_rows", 2_000_000))
+        _save(model, model_path)
+        if metrics_json:
+            metrics.dump_json(metrics_json)
+        return
 
     print("Fetching data...", sym, interval)
     df = fetch_ohlcv(sym, interval=interval, days=days)
-    X, y, df_all = build_features_and_labels(df)
+    with metrics.span("features"):
+        X, y, df_all = cached_features_and_labels(df)
+    if wf_folds:
+        from scripts.walk_forward import single_symbol_dataset
+        walk_forward(single_symbol_dataset(X, y, symbol=sym, interval=interval), cfg, wf_folds, wf_mode)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
 
     model = build_model()
-    model.fit(X_train, y_train)
+    with metrics.span("fit"):
+        model.fit(X_train, y_train)
 
-    preds = model.predict(X_test)
+    with metrics.span("predict"):
+        preds = model.predict(X_test)
     print("Classification report:")
     print(classification_report(y_test, preds))
 
+    _save(model, model_path)
+    if metrics_json:
+        metrics.dump_json(metrics_json)
+
+def _save(model, model_path):
     save_model(model, model_path)
     print("Saved model to", model_path)
+    flat_path = os.path.splitext(model_path)[0] + "_flat"
+    export_flat(model, flat_path)
+    print("Saved flat forest to", flat_path)
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--config", default="config_example.yml")
+    ap.add_argument("--dataset", default=None, help="train on a scripts/dataset.py dataset instead of one symbol")
+    ap.add_argument("--walk-forward", type=int, default=None, metavar="FOLDS",
+                    help="evaluate with this many walk-forward folds before the final fit")
+    ap.add_argument("--wf-mode", choices=["expanding", "rolling"], default=None)
+    ap.add_argument("--metrics-json", default=None, help="write stage latencies / counters here")
     args = ap.parse_args()
-    main(args.config)
+    main(args.config, metrics_json=args.metrics_json, dataset=args.dataset,
+         wf_folds=args.walk_forward, wf_mode=args.wf_mode)
@@ -0,0 +1,295 @@
+# scripts/walk_forward.py
+"""
+Walk-forward (time-series cross-validated) training and evaluation of build_model().
+- the rows after an initial training share (min_train_frac) are cut into n_folds consecutive
+  test windows of equal size; each fold trains on everything before its window ("expanding")
+  or on the last train_bars bars of each symbol before it ("rolling"). Each symbol's last
+  future_bars rows before a test window are purged from training, since their labels look into it
+- folds are fitted in a process pool within one core budget: workers x RF n_jobs (and the
+  BLAS / OpenMP threads of each worker) stay <= cores, so fold-level and tree-level
+  parallelism do not oversubscribe the machine
+- rows reach the workers without pickling: one symbol's X / y go to shared memory (as in
+  sweep.py), a scripts/dataset.py dataset is opened memory-mapped from its path
+- results: a table of per-fold metrics and the merged out-of-sample predictions (one per
+  test row, with its close), which run_backtest takes directly; backtest_oos() does that
+  per symbol
+
+Usage:
+python -m scripts.walk_forward --config config_example.yml --folds 5 --mode expanding --cores 8
+python -m scripts.walk_forward --dataset data/datasets/universe_15m --folds 8 --mode rolling --train-bars 20000
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+
+from bar_store import _index_to_ns
+from scripts.backtest import run_backtest
+from scripts.dataset import Dataset
+from scripts.model import build_model
+
+logger = logging.getLogger(__name__)
+
+LABELS = [-1, 0, 1]
+
+
+# --------------- folds ---------------
+def make_folds(ds: Dataset, n_folds: int = 5, mode: str = "expanding", min_train_frac: float = 0.5,
+               train_bars: Optional[int] = None, purge_bars: Optional[int] = None) -> List[dict]:
+    """
+    Folds over the dataset's rows: a test time window [test_start, test_end) (UTC ns) and, per
+    symbol, the rows before it minus the last purge_bars (default future_bars) of them
+    (Dataset.ranges_before). Test windows hold about the same number of rows each.
+    Rolling folds keep the last train_bars of those rows per symbol (default: the most rows any
+    symbol has before the first test window).
+    """
+    if mode not in ("expanding", "rolling"):
+        raise ValueError(f"mode must be 'expanding' or 'rolling', not {mode!r}")
+    if len(ds) == 0:
+        return []
+    purge = ds.meta["future_bars"] if purge_bars is None else purge_bars
+    last = int(ds.time_quantiles(1.0))
+    edges = ds.time_quantiles(np.linspace(min_train_frac, 1.0, n_folds + 1)).tolist()
+    edges[-1] = last + 1
+    window = None
+    if mode == "rolling":
+        window = train_bars or max((hi - lo for lo, hi in ds.ranges_before(int(edges[0]), purge)), default=0)
+    folds = []
+    for k in range(n_folds):
+        test_start, test_end = int(edges[k]), int(edges[k + 1])
+        if test_end <= test_start:
+            continue
+        folds.append({"fold": k, "purge_bars": purge, "train_bars": window,
+                      "test_start": test_start, "test_end": test_end})
+    return folds
+
+
+# --------------- shared memory for in-memory data ---------------
+def to_shared(X: np.ndarray, y: np.ndarray, ts: np.ndarray):
+    """One block: ts int64 | X float32 (n x f) | y int8."""
+    n, f = X.shape
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n * (8 + 4 * f + 1)))
+    np.ndarray((n,), dtype=np.int64, buffer=shm.buf)[:] = ts
+    np.ndarray((n, f), dtype=np.float32, buffer=shm.buf, offset=n * 8)[:] = X
+    np.ndarray((n,), dtype=np.int8, buffer=shm.buf, offset=n * (8 + 4 * f))[:] = y
+    return shm, {"name": shm.name, "rows": n, "features": f}
+
+
+def attach_shared(desc):
+    shm = shared_memory.SharedMemory(name=desc["name"])
+    n, f = desc["rows"], desc["features"]
+    ts = np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+    X = np.ndarray((n, f), dtype=np.float32, buffer=shm.buf, offset=n * 8)
+    y = np.ndarray((n,), dtype=np.int8, buffer=shm.buf, offset=n * (8 + 4 * f))
+    return shm, X, y, ts
+
+
+# --------------- workers ---------------
+_worker = {}
+
+
+def _init_worker(source, n_jobs):
+    """source: ("dataset", path) or ("shared", descriptor, meta)."""
+    from threadpoolctl import threadpool_limits
+    _worker["limits"] = threadpool_limits(n_jobs)  # BLAS / OpenMP pools inside this worker
+    _worker["n_jobs"] = n_jobs
+    if source[0] == "dataset":
+        _worker["ds"] = Dataset(source[1])
+    else:
+        _, desc, meta = source
+        shm, X, y, ts = attach_shared(desc)
+        _worker["shm"] = shm
+        _worker["ds"] = Dataset.from_arrays(X, y, ts, symbol=meta["symbol"], interval=meta["interval"],
+                                            future_bars=meta["future_bars"])
+
+
+def fit_fold(ds: Dataset, fold: dict, n_jobs: int = 1, max_train_rows: Optional[int] = None,
+             batch_rows: int = 200_000) -> dict:
+    """Fit build_model() on the fold's training window and predict its test window."""
+    train = ds.ranges_before(fold["test_start"], fold["purge_bars"], fold["train_bars"])
+    test = ds.ranges_between(fold["test_start"], fold["test_end"])
+    X_train, y_train = ds.gather(train, max_rows=max_train_rows, seed=fold["fold"])
+    if len(y_train) == 0 or not test:
+        raise ValueError(f"fold {fold['fold']}: empty train or test window")
+    model = build_model()
+    model.set_params(rf__n_jobs=n_jobs)
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
+    n_train = len(y_train)
+    del X_train, y_train
+    pred = np.concatenate([model.predict(X) for X, _ in ds.batches(test, batch_rows)]).astype(np.int8)
+    y_test = np.concatenate([np.asarray(ds.y[lo:hi]) for lo, hi in test])
+    report = classification_report(y_test, pred, labels=LABELS, output_dict=True, zero_division=0)
+    metrics = {"accuracy": accuracy_score(y_test, pred),
+               "f1_macro": f1_score(y_test, pred, labels=LABELS, average="macro", zero_division=0)}
+    for lab in LABELS:
+        r = report[str(lab)]
+        metrics.update({f"precision_{lab}": r["precision"], f"recall_{lab}": r["recall"]})
+    return {**fold, "train_start": min(int(ds.ts[lo]) for lo, _ in train),
+            "train_end": max(int(ds.ts[hi - 1]) for _, hi in train) + 1,
+            "n_train": n_train, "n_test": len(y_test), "fit_s": fit_s, **metrics,
+            "test_ranges": test, "pred": pred}
+
+
+def _fit_fold_worker(fold, max_train_rows, batch_rows):
+    return fit_fold(_worker["ds"], fold, _worker["n_jobs"], max_train_rows, batch_rows)
+
+
+# --------------- driver ---------------
+def core_budget(n_folds: int, cores: Optional[int] = None, workers: Optional[int] = None) -> Tuple[int, int]:
+    """(fold workers, RF n_jobs per worker) with workers x n_jobs <= cores."""
+    cores = max(1, cores or os.cpu_count() or 1)
+    workers = max(1, min(workers or cores, n_folds, cores))
+    return workers, max(1, cores // workers)
+
+
+def run_walk_forward(ds: Dataset, n_folds: int = 5, mode: str = "expanding", min_train_frac: float = 0.5,
+                     train_bars: Optional[int] = None, cores: Optional[int] = None, workers: Optional[int] = None,
+                     max_train_rows: Optional[int] = 2_000_000, batch_rows: int = 200_000) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Walk-forward over ds (Dataset(path) or Dataset.from_arrays). Returns (per-fold metrics,
+    out-of-sample predictions with columns symbol, ts, close, y, pred, fold; ordered by symbol, ts).
+    Peak memory: about workers x max_train_rows x features x 4 bytes, plus the model.
+    """
+    folds = make_folds(ds, n_folds, mode, min_train_frac, train_bars)
+    workers, n_jobs = core_budget(len(folds), cores, workers)
+    logger.info("Walk-forward: %d %s folds, %d workers x %d RF jobs", len(folds), mode, workers, n_jobs)
+
+    shm = None
+    if ds.path is not None:
+        source = ("dataset", str(ds.path))
+    else:
+        shm, desc = to_shared(ds.X, ds.y, ds.ts)
+        source = ("shared", desc, {"symbol": ds.symbols[0], "interval": ds.meta["interval"],
+                                   "future_bars": ds.meta["future_bars"]})
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source, n_jobs)) as pool:
+            futures = {pool.submit(_fit_fold_worker, f, max_train_rows, batch_rows): f["fold"] for f in folds}
+            for fut in as_completed(futures):
+                res = fut.result()
+                logger.info("Fold %d: %d train / %d test rows, accuracy %.3f, macro F1 %.3f (fit %.1f s)",
+                            res["fold"], res["n_train"], res["n_test"], res["accuracy"], res["f1_macro"], res["fit_s"])
+                results.append(res)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+    results.sort(key=lambda r: r["fold"])
+    return fold_table(results), merge_oos(ds, results)
+
+
+def fold_table(results: List[dict]) -> pd.DataFrame:
+    rows = [{k: v for k, v in r.items() if k not in ("test_ranges", "pred")} for r in results]
+    table = pd.DataFrame(rows)
+    for col in ("train_start", "train_end", "test_start", "test_end"):
+        if col in table:
+            table[col] = pd.to_datetime(table[col], utc=True)
+    return table
+
+
+def merge_oos(ds: Dataset, results: List[dict]) -> pd.DataFrame:
+    """One row per out-of-sample prediction; test windows do not overlap, so rows are unique."""
+    close_col = ds.features.index("close")
+    parts = []
+    for r in results:
+        pos = 0
+        for lo, hi in r["test_ranges"]:
+            n = hi - lo
+            parts.append(pd.DataFrame({
+                "symbol": ds.symbols[int(ds.sym[lo])],
+                "ts": pd.to_datetime(np.asarray(ds.ts[lo:hi]), utc=True),
+                "close": np.asarray(ds.X[lo:hi, close_col], dtype=np.float64),
+                "y": np.asarray(ds.y[lo:hi]),
+                "pred": r["pred"][pos:pos + n],
+                "fold": r["fold"]}))
+            pos += n
+    if not parts:
+        return pd.DataFrame(columns=["symbol", "ts", "close", "y", "pred", "fold"])
+    return pd.concat(parts, ignore_index=True).sort_values(["symbol", "ts"], kind="stable").reset_index(drop=True)
+
+
+def backtest_oos(oos: pd.DataFrame, size_frac: float = 0.01) -> pd.DataFrame:
+    """run_backtest on each symbol's out-of-sample predictions."""
+    rows = []
+    for sym, g in oos.groupby("symbol", sort=True):
+        _, _, stats = run_backtest(g["close"].to_numpy(), g["pred"].to_numpy(), size_frac=size_frac,
+                                   index=pd.DatetimeIndex(g["ts"]))
+        rows.append({"symbol": sym, **stats})
+    return pd.DataFrame(rows)
+
+
+def summarize(folds: pd.DataFrame, oos: pd.DataFrame) -> dict:
+    """Pooled out-of-sample metrics next to the fold averages."""
+    if oos.empty:
+        return {"folds": 0}
+    return {"folds": len(folds), "oos_rows": len(oos),
+            "oos_accuracy": float(accuracy_score(oos["y"], oos["pred"])),
+            "oos_f1_macro": float(f1_score(oos["y"], oos["pred"], labels=LABELS, average="macro", zero_division=0)),
+            "fold_accuracy_mean": float(folds["accuracy"].mean()), "fold_accuracy_std": float(folds["accuracy"].std()),
+            "fit_s_total": float(folds["fit_s"].sum())}
+
+
+def single_symbol_dataset(X: pd.DataFrame, y: pd.Series, symbol: str = "", interval: str = "15m",
+                          future_bars: int = 3) -> Dataset:
+    """Wrap build_features_and_labels output for run_walk_forward."""
+    return Dataset.from_arrays(X.to_numpy(dtype=np.float32), y.to_numpy(dtype=np.int8), _index_to_ns(X.index),
+                               symbol=symbol, interval=interval, future_bars=future_bars)
+
+
+def save_results(out: str, folds: pd.DataFrame, oos: pd.DataFrame, summary: dict):
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    folds.to_csv(out / "folds.csv", index=False)
+    oos.to_csv(out / "oos_predictions.csv", index=False)
+    (out / "summary.json").write_text(json.dumps(summary, indent=2))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", default="config_example.yml")
+    ap.add_argument("--dataset", default=None, help="scripts/dataset.py dataset (default: the config's symbol)")
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--mode", choices=["expanding", "rolling"], default="expanding")
+    ap.add_argument("--min-train-frac", type=float, default=0.5, help="rows before the first test window")
+    ap.add_argument("--train-bars", type=int, default=None, help="rolling: training rows per symbol")
+    ap.add_argument("--cores", type=int, default=None, help="total core budget (default: all)")
+    ap.add_argument("--workers", type=int, default=None, help="folds fitted at once (default: min(folds, cores))")
+    ap.add_argument("--max-train-rows", type=int, default=2_000_000)
+    ap.add_argument("--out", default="runs/walk_forward")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    cfg = yaml.safe_load(open(args.config))
+    if args.dataset:
+        ds = Dataset(args.dataset)
+    else:
+        from scripts.data_fetch import fetch_ohlcv
+        from scripts.feature_store import cached_features_and_labels
+        sym, interval = cfg.get("symbol", "AAPL"), cfg.get("interval", "15m")
+        X, y, _ = cached_features_and_labels(fetch_ohlcv(sym, interval=interval, days=cfg.get("history_days", 365)))
+        ds = single_symbol_dataset(X, y, symbol=sym, interval=interval)
+    folds, oos = run_walk_forward(ds, args.folds, args.mode, args.min_train_frac, args.train_bars,
+                                  cores=args.cores, workers=args.workers, max_train_rows=args.max_train_rows)
+    summary = summarize(folds, oos)
+    print(folds[["fold", "test_start", "test_end", "n_train", "n_test", "accuracy", "f1_macro", "fit_s"]].to_string(index=False))
+    print(backtest_oos(oos).to_string(index=False))
+    print(json.dumps(summary, indent=2))
+    save_results(args.out, folds, oos, summary)
+    print("Saved fold metrics and out-of-sample predictions to", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# scripts/webhook_load_test.py
+"""
+Load test for live/webhook_server.py against a stub executor (no broker calls).
+- the server runs in-process on a local port (threaded werkzeug server)
+- the stub's place_order() sleeps --broker-ms to stand in for the broker round trip
+- N client threads post alerts for --seconds; reports sustained req/s, p50/p99
+  acknowledgement latency, 429s, and (async mode) how long the queue took to drain
+
+Usage:
+python -m scripts.webhook_load_test --mode async --clients 32 --seconds 10 --broker-ms 150
+python -m scripts.webhook_load_test --mode both
+"""
+
+import argparse
+import itertools
+import logging
+import threading
+import time
+
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+import live.webhook_server as ws
+from live.model_registry import ModelHandle, ModelRegistry
+from live.order_queue import OrderQueue
+from live.risk_manager import RiskManager
+
+
+class StubExecutor:
+    """Stands in for KiteExecutor: fixed latency, counts orders."""
+
+    def __init__(self, latency_s=0.15):
+        self.latency_s = latency_s
+        self.placed = 0
+        self._lock = threading.Lock()
+
+    def place_order(self, symbol, side, size_pct=1.0, signal_id=None, qty=None):
+        time.sleep(self.latency_s)
+        with self._lock:
+            self.placed += 1
+        return {"paper": True, "action": side, "symbol": symbol}
+
+
+def run_load(mode="async", clients=32, seconds=10.0, broker_ms=150.0, queue_size=1000, workers=8, port=0):
+    cfg = {"symbol": "AAPL", "risk": {"max_risk_per_trade_pct": 100.0, "daily_max_loss_pct": 3.0}}
+    stub = StubExecutor(broker_ms / 1000.0)
+    ws.cfg, ws.executor, ws.risk = cfg, stub, RiskManager(cfg)
+    ws.models = ModelHandle(ModelRegistry("models/registry"))
+    ws.orders = OrderQueue(stub, maxsize=queue_size, workers=workers) if mode == "async" else None
+
+    server = make_server("127.0.0.1", port, ws.app, threaded=True)
+    url = f"http://127.0.0.1:{server.server_port}/webhook"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ids = itertools.count()
+    latencies, codes = [], {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client():
+        sess = requests.Session()
+        lat, cnt = [], {}
+        while time.perf_counter() < stop_at:
+            body = {"action": "BUY", "symbol": "AAPL", "size_pct": 0.01, "id": f"sig-{next(ids)}"}
+            t = time.perf_counter()
+            r = sess.post(url, json=body)
+            lat.append(time.perf_counter() - t)
+            cnt[r.status_code] = cnt.get(r.status_code, 0) + 1
+        with lock:
+            latencies.extend(lat)
+            for k, v in cnt.items():
+                codes[k] = codes.get(k, 0) + v
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    drain = 0.0
+    if ws.orders is not None:
+        t = time.perf_counter()
+        ws.orders.join()
+        drain = time.perf_counter() - t
+        ws.orders.shutdown()
+    server.shutdown()
+
+    lat_ms = np.asarray(latencies) * 1e3
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "req_per_s": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat_ms, 50)) if len(lat_ms) else float("nan"),
+        "p99_ms": float(np.percentile(lat_ms, 99)) if len(lat_ms) else float("nan"),
+        "codes": codes,
+        "orders_placed": stub.placed,
+        "drain_s": drain,
+    }
+
+
+def print_report(r):
+    print(f"[{r['mode']}] {r['requests']} requests, {r['req_per_s']:.0f} req/s, "
+          f"ack p50 {r['p50_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms, codes {r['codes']}, "
+          f"orders placed {r['orders_placed']}, queue drained in {r['drain_s']:.1f} s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["async", "sync", "both"], default="both")
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--broker-ms", type=float, default=150.0)
+    ap.add_argument("--queue-size", type=int, default=1000)
+    ap.add_argument("--workers", type=int, default=8)
+    args = ap.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)  # the server logs every alert at INFO
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    for mode in (["sync", "async"] if args.mode == "both" else [args.mode]):
+        print_report(run_load(mode, args.clients, args.seconds, args.broker_ms, args.queue_size, args.workers))
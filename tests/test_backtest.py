@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.backtest import run_backtest
+
+
+def loop_backtest(close, pred, initial_capital=10000.0, size_frac=0.01):
+    """The original bar loop from scripts/backtest.py, plus the position and closed-trade pnl it implies."""
+    capital = initial_capital
+    position = 0
+    entry_price = 0
+    capital_hist, positions, pnls = [], [], []
+    for price, p in zip(close, pred):
+        trade_size = capital * size_frac
+        shares = trade_size / price if price > 0 else 0
+        if position == 0 and p != 0 and shares > 0:
+            position = p
+            entry_price = price
+        elif position != 0 and p != position:
+            pnl = (price - entry_price) * position * shares
+            capital += pnl
+            pnls.append(pnl)
+            position = 0
+            entry_price = 0
+        capital_hist.append(capital + (position * (price - entry_price) * shares if position != 0 else 0))
+        positions.append(position)
+    return np.array(capital_hist), np.array(positions), np.array(pnls)
+
+
+def random_case(n, seed, stay):
+    """Random walk closes and -1/0/1 predictions that repeat with probability `stay`."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    pred = rng.integers(-1, 2, n)
+    for i in range(1, n):
+        if rng.random() < stay:
+            pred[i] = pred[i - 1]
+    return close, pred
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("stay", [0.0, 0.5, 0.9])  # 0.0: mostly 1-bar runs, the case the run logic special-cases
+def test_matches_the_bar_loop(seed, stay):
+    close, pred = random_case(2000, seed, stay)
+    want_cap, want_pos, want_pnl = loop_backtest(close, pred)
+    equity, trades, stats = run_backtest(close, pred)
+    np.testing.assert_array_equal(equity["position"].to_numpy(), want_pos)
+    np.testing.assert_allclose(equity["capital"].to_numpy(), want_cap, rtol=1e-10)
+    np.testing.assert_allclose(trades["pnl"].to_numpy(), want_pnl, rtol=1e-8, atol=1e-9)
+    assert stats["n_trades"] == len(want_pnl)
+    assert stats["end_capital"] == pytest.approx(want_cap[-1], rel=1e-10)
+
+
+@pytest.mark.parametrize("pred", [[1, 1, 1], [0, 0, 0], [1, -1, 1, -1], [-1, 0, 0, 1], [1, 1, -1, -1, 0, 1]])
+def test_matches_the_bar_loop_on_edge_patterns(pred):
+    close = np.linspace(100, 110, len(pred))
+    want_cap, want_pos, _ = loop_backtest(close, pred)
+    equity, _, _ = run_backtest(close, pred)
+    np.testing.assert_array_equal(equity["position"].to_numpy(), want_pos)
+    np.testing.assert_allclose(equity["capital"].to_numpy(), want_cap, rtol=1e-12)
+
+
+def test_trades_carry_the_bar_times():
+    index = pd.date_range("2024-01-01", periods=4, freq="D")
+    _, trades, _ = run_backtest([100.0, 101.0, 102.0, 103.0], [1, 1, 0, 0], index=index)
+    assert len(trades) == 1
+    assert trades["entry_time"].iloc[0] == index[0] and trades["exit_time"].iloc[0] == index[2]
+    assert trades["side"].iloc[0] == "LONG"
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scripts.data_fetch as data_fetch
+from bar_store import BarStore, cached_fetch
+from universal_fetcher import universe_symbol_for_yf
+
+HOUR = pd.Timedelta("1h")
+NOW = pd.Timestamp("2024-03-10 12:30", tz="UTC")
+
+
+class FakeFeed:
+    """fetch_range over hourly bars; close = fetch number, so refreshed rows are visible."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, s, e):
+        self.calls.append((s, e))
+        idx = pd.date_range(s.ceil("1h"), e, freq="1h", inclusive="left")
+        n = float(len(self.calls))
+        return pd.DataFrame({"open": n, "high": n, "low": n, "close": n, "volume": 1.0}, index=idx)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(str(tmp_path))
+
+
+def test_second_call_is_served_from_the_cache(store):
+    feed = FakeFeed()
+    first = cached_fetch("NSE:TCS", "1h", "2d", feed, store=store, now=NOW)
+    again = cached_fetch("NSE:TCS", "1h", "2d", feed, store=store, now=NOW)
+    assert len(feed.calls) == 1
+    assert len(first) == 48
+    pd.testing.assert_frame_equal(first, again)
+
+
+def test_top_up_fetches_only_the_tail_and_refreshes_the_partial_last_bar(store):
+    feed = FakeFeed()
+    cached_fetch("NSE:TCS", "1h", "2d", feed, store=store, now=NOW)
+    later = NOW + 3 * HOUR
+    df = cached_fetch("NSE:TCS", "1h", "2d", feed, store=store, now=later)
+    # the 12:00 bar was still forming at 12:30: the top-up starts at it
+    assert feed.calls[1] == (pd.Timestamp("2024-03-10 12:00", tz="UTC"), later)
+    assert df.loc["2024-03-10 11:00", "close"] == 1.0
+    assert (df.loc["2024-03-10 12:00":, "close"] == 2.0).all()
+    assert df.index[-1] == pd.Timestamp("2024-03-10 15:00", tz="UTC")
+
+
+def test_holes_are_detected_and_filled(store):
+    feed = FakeFeed()
+    early = NOW - pd.Timedelta(days=1)
+    store.merge("NSE:TCS", "1h", feed(early - 6 * HOUR, early), span=(int((early - 6 * HOUR).value), int(early.value)))
+    store.merge("NSE:TCS", "1h", feed(NOW - 6 * HOUR, NOW), span=(int((NOW - 6 * HOUR).value), int(NOW.value)))
+    assert store.missing_ranges("NSE:TCS", "1h", early - 6 * HOUR, NOW) == [(early, NOW - 6 * HOUR)]
+    feed.calls.clear()
+    df = cached_fetch("NSE:TCS", "1h", "30h", feed, store=store, now=NOW)
+    assert feed.calls == [(early, NOW - 6 * HOUR)]
+    assert len(df) == 30
+    assert not df.index.duplicated().any()
+    assert np.all(np.diff(df.index.asi8) == HOUR.value)
+
+
+@pytest.mark.parametrize("ticker,universe", [
+    ("TCS.NS", "NSE:TCS"), ("RELIANCE.BO", "BSE:RELIANCE"), ("^NSEI", "INDEX:NIFTY"),
+    ("EURUSD=X", "FX:EURUSD"), ("GC=F", "METAL:GOLD"), ("AAPL", "AAPL"),
+])
+def test_yfinance_tickers_map_to_universe_symbols(ticker, universe):
+    assert universe_symbol_for_yf(ticker) == universe
+
+
+def test_fetch_ohlcv_caches_under_the_universe_symbol(store, monkeypatch):
+    feed = FakeFeed()
+    monkeypatch.setattr(data_fetch, "_download", lambda symbol, interval, start=None, end=None: feed(start, end))
+    monkeypatch.setattr("backfill.get_store", lambda: store)
+    df = data_fetch.fetch_ohlcv("TCS.NS", interval="1h", days=2)
+    assert len(df) > 0
+    assert store.read_meta("NSE:TCS", "1h")["rows"] == len(df)
+    assert store.read_meta("TCS.NS", "1h") == {}
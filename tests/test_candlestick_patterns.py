@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from candlestick_patterns import PATTERN_COLUMNS, PatternStream, detect_patterns
+
+
+def bars(n=3000, seed=0):
+    """Random OHLC with a share of dojis, marubozus and repeated lows/highs so every rule fires."""
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + rng.standard_normal(n).cumsum(), 2)
+    open_ = np.round(close + rng.standard_normal(n), 2)
+    doji = rng.random(n) < 0.15
+    open_[doji] = close[doji]
+    high = np.maximum(open_, close) + np.round(rng.exponential(1.0, n), 2)
+    low = np.minimum(open_, close) - np.round(rng.exponential(1.0, n), 2)
+    marubozu = rng.random(n) < 0.05
+    high[marubozu] = np.maximum(open_, close)[marubozu]
+    low[marubozu] = np.minimum(open_, close)[marubozu]
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close,
+                         "volume": rng.integers(100, 1000, n).astype(float)})
+
+
+def assert_stream_matches(stream, df, expected):
+    for row, exp in zip(df.itertuples(index=False), expected.itertuples(index=False)):
+        values, final_signal = stream.update(row.open, row.high, row.low, row.close)
+        assert list(values) == [int(getattr(exp, col)) for col in PATTERN_COLUMNS]
+        assert final_signal == exp.final_signal
+
+
+def test_stream_matches_batch_bar_for_bar():
+    df = bars()
+    expected = detect_patterns(df)
+    assert (expected[PATTERN_COLUMNS] != 0).any().all()  # every pattern occurs at least once
+    assert_stream_matches(PatternStream(), df, expected)
+
+
+@pytest.mark.parametrize("start", [1, 2, 1234])
+def test_seeded_stream_matches_batch_mid_series(start):
+    df = bars()
+    expected = detect_patterns(df).iloc[start:]
+    stream = PatternStream()
+    stream.seed(df.iloc[:start])
+    assert_stream_matches(stream, df.iloc[start:], expected)
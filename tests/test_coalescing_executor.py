@@ -0,0 +1,97 @@
+import threading
+
+from live.kite_executor import CoalescingExecutor, KiteExecutor
+
+
+class CountingKite:
+    """Fake Kite client: records every place_order call, optionally failing them."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def place_order(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            n = len(self.calls)
+        if self.fail:
+            raise RuntimeError("broker down")
+        return f"order-{n}"
+
+
+def make(fail=False, window_s=0.05):
+    kite = CountingKite(fail)
+    return kite, CoalescingExecutor(KiteExecutor({}, kite=kite), window_s=window_s)
+
+
+def test_same_symbol_nets_to_one_call():
+    kite, ex = make()
+    futs = [ex.place_order_async("INFY", "BUY", 2.0, signal_id="a"),
+            ex.place_order_async("INFY", "SELL", 1.0, signal_id="b"),
+            ex.place_order_async("INFY", "BUY", 0.5, signal_id="c")]
+    recs = [f.result(timeout=5) for f in futs]
+    assert len(kite.calls) == 1
+    assert kite.calls[0]["transaction_type"] == "BUY"
+    assert all(r is recs[0] for r in recs)
+    assert recs[0]["status"] == "placed"
+    assert recs[0]["signals"] == ["a", "b", "c"]
+    assert recs[0]["net_side"] == "BUY" and recs[0]["net_size_pct"] == 1.5
+
+
+def test_opposite_signals_net_out_without_a_call():
+    kite, ex = make()
+    futs = [ex.place_order_async("INFY", "BUY", 1.0, signal_id="a"),
+            ex.place_order_async("INFY", "SELL", 1.0, signal_id="b")]
+    recs = [f.result(timeout=5) for f in futs]
+    assert kite.calls == []
+    assert all(r["status"] == "netted_out" and r["broker_result"] is None for r in recs)
+
+
+def test_different_symbols_are_not_merged():
+    kite, ex = make()
+    futs = [ex.place_order_async("INFY", "BUY", 1.0, signal_id="a"),
+            ex.place_order_async("TCS", "BUY", 1.0, signal_id="b"),
+            ex.place_order_async("INFY", "BUY", 1.0, signal_id="c")]
+    recs = [f.result(timeout=5) for f in futs]
+    assert sorted(c["tradingsymbol"] for c in kite.calls) == ["INFY", "TCS"]
+    assert recs[0] is recs[2] and recs[0]["signals"] == ["a", "c"]
+    assert recs[1]["signals"] == ["b"]
+
+
+def test_failure_reaches_every_caller_in_the_batch():
+    kite, ex = make(fail=True)
+    results = {}
+
+    def call(sid, side, size):
+        results[sid] = ex.place_order("INFY", side, size, signal_id=sid)
+
+    threads = [threading.Thread(target=call, args=(sid, side, size))
+               for sid, side, size in [("a", "BUY", 2.0), ("b", "SELL", 1.0), ("c", "BUY", 1.0)]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    assert len(kite.calls) == 1
+    assert set(results) == {"a", "b", "c"}
+    for rec in results.values():
+        assert rec["status"] == "failed"
+        assert "broker down" in rec["error"]
+
+
+def test_place_order_async_does_not_wait_for_the_window():
+    kite, ex = make(window_s=10.0)
+    fut = ex.place_order_async("INFY", "BUY", 1.0, signal_id="a")
+    assert not fut.done()
+    assert kite.calls == []
+
+
+def test_net_qty_is_the_quantity_sent():
+    kite, ex = make()
+    futs = [ex.place_order_async("INFY", "BUY", 1.0, signal_id="a", qty=10),
+            ex.place_order_async("INFY", "SELL", 1.0, signal_id="b", qty=4),
+            ex.place_order_async("INFY", "SELL", 1.0, signal_id="c")]  # no qty: 1 share
+    rec = futs[0].result(timeout=5)
+    assert len(kite.calls) == 1
+    assert kite.calls[0]["transaction_type"] == "BUY" and kite.calls[0]["quantity"] == 5
+    assert rec["net_qty"] == 5 and rec["net_side"] == "BUY"
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.dataset import Dataset
+from scripts.features import FEATURE_COLS
+
+FUTURE_BARS = 4
+
+
+def nse_dataset(days=40):
+    """One symbol of 15m NSE bars (09:15-15:30 IST): the overnight gap sits between sessions."""
+    stamps = []
+    for day in pd.bdate_range("2024-03-04", periods=days):
+        stamps.extend(pd.date_range(f"{day.date()} 09:15", f"{day.date()} 15:30", freq="15min",
+                                    tz="Asia/Kolkata", inclusive="left"))
+    ts = pd.DatetimeIndex(stamps).tz_convert("UTC").as_unit("ns").asi8
+    X = np.zeros((len(ts), len(FEATURE_COLS)), dtype=np.float32)
+    y = np.zeros(len(ts), dtype=np.int8)
+    return Dataset.from_arrays(X, y, ts, symbol="NSE:TEST", interval="15m", future_bars=FUTURE_BARS)
+
+
+def assert_purged(ds, train, cutoff_ns, purge=FUTURE_BARS):
+    """No training row's label window (the next `purge` rows) reaches the cutoff."""
+    first_test = int(np.searchsorted(ds.ts, cutoff_ns))
+    assert max(hi for _, hi in train) == first_test - purge
+
+
+@pytest.mark.parametrize("cutoff", ["2024-03-12 09:15", "2024-03-12 09:45", "2024-03-12 12:00"])
+def test_time_split_purges_rows_across_the_overnight_gap(cutoff):
+    ds = nse_dataset()
+    cutoff_ns = pd.Timestamp(cutoff, tz="Asia/Kolkata").value
+    train, test, got = ds.time_split(cutoff=pd.Timestamp(cutoff, tz="Asia/Kolkata"))
+    assert got == cutoff_ns
+    assert_purged(ds, train, cutoff_ns)
+    assert test[0][0] == np.searchsorted(ds.ts, cutoff_ns)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.features import FEATURE_COLS, IndicatorState, add_technical_indicators
+
+
+def ohlcv(n, seed, flat_every=0):
+    """Random OHLCV bars; flat_every > 0 repeats the close in stretches (zero diffs, equal MA inputs)."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    if flat_every:
+        for i in range(0, n, flat_every):
+            close[i:i + flat_every // 2] = close[i]
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.5, n))
+    return pd.DataFrame({"open": open_, "high": np.maximum(open_, close) + spread,
+                         "low": np.minimum(open_, close) - spread, "close": close,
+                         "volume": rng.integers(1, 10_000, n).astype(float)},
+                        index=pd.date_range("2024-01-01", periods=n, freq="15min"))
+
+
+def incremental(df):
+    state = IndicatorState()
+    keys, rows = [], []
+    for ts, (o, h, l, c, v) in zip(df.index, df[["open", "high", "low", "close", "volume"]].itertuples(index=False)):
+        row = state.update(o, h, l, c, v)
+        if row is not None:
+            keys.append(ts)
+            rows.append(row)
+    return pd.DataFrame(rows, index=pd.DatetimeIndex(keys, freq=None), columns=FEATURE_COLS), state
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("flat_every", [0, 40])
+def test_updates_match_add_technical_indicators(seed, flat_every):
+    df = ohlcv(600, seed, flat_every)
+    want = add_technical_indicators(df)[FEATURE_COLS]
+    got, _ = incremental(df)
+    assert list(got.index) == list(want.index)
+    np.testing.assert_array_equal(got.to_numpy(), want.to_numpy())
+
+
+def test_warm_start_continues_like_a_full_replay():
+    df = ohlcv(300, 7)
+    state = IndicatorState.from_history(df.iloc[:200])
+    rows = [state.update(*r) for r in df[["open", "high", "low", "close", "volume"]].iloc[200:].itertuples(index=False)]
+    want = add_technical_indicators(df)[FEATURE_COLS].iloc[-100:]
+    np.testing.assert_allclose(np.vstack(rows), want.to_numpy(), rtol=1e-12, atol=1e-12)
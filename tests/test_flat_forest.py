@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from scripts.flat_forest import FlatForest, export_flat
+from scripts.model import build_model
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6)) * [1.0, 50.0, 1e4, 0.01, 3.0, 1.0] + [0, 100, 1e5, 0, 0, 0]
+    y = (X[:, 0] + X[:, 1] / 50 + rng.normal(size=len(X)) > 0).astype(int) - (X[:, 4] > 3)
+    model = build_model().set_params(rf__n_estimators=25, rf__n_jobs=1)
+    model.fit(X[:1500], y[:1500])
+    return model, X[1500:]
+
+
+@pytest.mark.parametrize("rows", [1, 10, 500])  # below and above FlatForest.BATCH_BY_TREE
+def test_exported_forest_matches_sklearn_exactly(fitted, tmp_path, rows):
+    model, X = fitted
+    export_flat(model, tmp_path / "flat")
+    flat = FlatForest.load(tmp_path / "flat")
+    X = X[:rows]
+    np.testing.assert_array_equal(flat.predict(X), model.predict(X))
+    assert np.abs(flat.predict_proba(X) - model.predict_proba(X)).max() == 0
@@ -0,0 +1,83 @@
+import datetime as dt
+
+import pytest
+
+from live.instrument_store import InstrumentStore, today_ist
+from live.kite_option_chain import KiteHelper
+
+EXPIRY = today_ist() + dt.timedelta(days=7)
+
+
+def instruments():
+    rows = []
+    for name, strikes in (("NIFTY", range(22000, 23050, 50)), ("BANKNIFTY", range(47000, 49100, 100))):
+        for k in strikes:
+            for t in ("CE", "PE"):
+                rows.append({"instrument_token": len(rows) + 1, "tradingsymbol": f"{name}X{k}{t}", "name": name,
+                             "strike": float(k), "instrument_type": t, "segment": "NFO-OPT", "exchange": "NFO",
+                             "expiry": EXPIRY, "lot_size": 50, "tick_size": 0.05})
+    return rows
+
+
+class FakeKite:
+    def __init__(self, spots=None, fail=False):
+        self.spots = spots or {}
+        self.fail = fail
+        self.ltp_calls = []
+        self.downloads = 0
+
+    def ltp(self, symbols):
+        self.ltp_calls.append(list(symbols))
+        return {s: {"last_price": self.spots[s]} for s in symbols}
+
+    def instruments(self):
+        self.downloads += 1
+        if self.fail:
+            raise ConnectionError("instrument download failed")
+        return instruments()
+
+
+def test_exact_underlying_match():
+    kh = KiteHelper(kite=FakeKite())
+    nifty = kh.filter_option_chain(instruments(), "NIFTY")
+    bank = kh.filter_option_chain(instruments(), "BANKNIFTY")
+    assert {r["name"] for r in nifty} == {"NIFTY"} and len(nifty) == 2 * 21
+    assert {r["name"] for r in bank} == {"BANKNIFTY"} and len(bank) == 2 * 21
+
+
+def test_default_returns_every_strike_without_a_spot_lookup():
+    kite = FakeKite()
+    chain = KiteHelper(kite=kite).filter_option_chain(instruments(), "NIFTY")
+    assert kite.ltp_calls == []
+    assert len({r["strike"] for r in chain}) == 21
+
+
+@pytest.mark.parametrize("underlying,spot_symbol,spot,atm,step", [
+    ("NIFTY", "NSE:NIFTY 50", 22512.0, 22500.0, 50.0),
+    ("BANKNIFTY", "NSE:NIFTY BANK", 48180.0, 48200.0, 100.0),
+])
+def test_atm_window_uses_the_index_spot(underlying, spot_symbol, spot, atm, step):
+    kite = FakeKite({spot_symbol: spot})
+    chain = KiteHelper(kite=kite).filter_option_chain(instruments(), underlying, strike_window=2)
+    assert kite.ltp_calls == [[spot_symbol]]
+    expected = [atm + i * step for i in range(-2, 3)]
+    assert [r["strike"] for r in chain if r["instrument_type"] == "CE"] == expected
+    assert [r["strike"] for r in chain if r["instrument_type"] == "PE"] == expected
+
+
+def test_stale_store_is_served_with_a_retry_interval(tmp_path, monkeypatch):
+    InstrumentStore.from_records(instruments(), as_of=today_ist() - dt.timedelta(days=1)).save(str(tmp_path))
+    orig = InstrumentStore.load_or_refresh.__func__
+    monkeypatch.setattr(InstrumentStore, "load_or_refresh",
+                        classmethod(lambda cls, kite=None, root=None, force=False: orig(cls, kite, str(tmp_path), force)))
+    clock = [1000.0]
+    monkeypatch.setattr("live.kite_option_chain.time.monotonic", lambda: clock[0])
+    kite = FakeKite(fail=True)
+    kh = KiteHelper(kite=kite)
+    for _ in range(5):
+        assert kh.instrument_store().as_of < today_ist()
+    assert kite.downloads == 1
+    clock[0] += KiteHelper.INSTRUMENT_RETRY_S
+    kite.fail = False
+    assert kh.instrument_store().as_of == today_ist()
+    assert kite.downloads == 2
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from live.model_registry import ModelHandle, ModelRegistry
+from scripts.model import build_model
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 4))
+    y = (X[:, 0] + rng.normal(size=len(X)) > 0).astype(int)
+    return build_model().set_params(rf__n_estimators=5, rf__n_jobs=1).fit(X, y)
+
+
+def test_activate_goes_live_and_updates_manifest(fitted, tmp_path):
+    reg = ModelRegistry(tmp_path)
+    reg.publish(fitted)
+    reg.publish(fitted)
+    handle = ModelHandle(reg)
+    assert handle.swap() == "v0001"
+    assert handle.activate("v0002") == "v0002"
+    assert handle.get()[0] == "v0002"
+    assert reg.active_version() == "v0002"
+
+
+def test_failed_activate_leaves_manifest_and_live_model(fitted, tmp_path):
+    reg = ModelRegistry(tmp_path)
+    reg.publish(fitted)
+    reg.publish(fitted)
+    handle = ModelHandle(reg)
+    handle.swap()
+    for f in (tmp_path / "v0002").iterdir():
+        if f.name != "version.json":
+            f.unlink()
+    with pytest.raises(Exception):
+        handle.activate("v0002")
+    assert reg.active_version() == "v0001"
+    assert handle.get()[0] == "v0001"
+    with pytest.raises(KeyError):
+        handle.activate("v0009")
+    assert reg.active_version() == "v0001"
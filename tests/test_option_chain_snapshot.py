@@ -0,0 +1,15 @@
+import datetime as dt
+
+import numpy as np
+
+from live.instrument_store import IST
+from live.option_chain_snapshot import year_fraction
+
+
+def test_naive_now_is_ist_wall_clock():
+    expiry = np.array(["2024-03-28"], dtype="datetime64[D]")
+    naive = dt.datetime(2024, 3, 27, 15, 30)
+    assert year_fraction(expiry, naive)[0] == year_fraction(expiry, naive.replace(tzinfo=IST))[0]
+    assert year_fraction(expiry, naive)[0] * 365.0 == 1.0
+    utc = dt.datetime(2024, 3, 27, 10, 0, tzinfo=dt.timezone.utc)  # 15:30 IST
+    assert year_fraction(expiry, utc)[0] * 365.0 == 1.0
@@ -0,0 +1,21 @@
+import universal_fetcher
+from live.replay_engine import ReplayEngine
+from replay_provider import ReplayProvider
+
+
+def test_replay_fetches_through_fetch_market_data_and_restores_live_providers(monkeypatch):
+    provider = ReplayProvider.synthetic(3, 150, "15m")
+    calls = []
+    real = universal_fetcher.fetch_market_data
+
+    def spy(sym, **kwargs):
+        calls.append((sym, kwargs))
+        return real(sym, **kwargs)
+
+    monkeypatch.setattr("live.replay_engine.fetch_market_data", spy)
+    engine = ReplayEngine(provider, lookback=20)
+    report = engine.run(max_bars=50)
+    assert report["symbol_bars"] == len(calls) == 3 * 50
+    assert all(kw["patterns"] is False and kw["interval"] == "15m" for _, kw in calls)
+    assert universal_fetcher._replay_provider is None
+    assert provider.clock_ns is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_store import OHLCV_COLUMNS
+from resample import SESSIONS, Resampler, resample_ohlcv
+
+
+def nse_bars(days=30, start="09:15", end="16:30", freq="15min", seed=0):
+    """Weekday 15m bars in IST covering pre-open / post-close time, like some providers send."""
+    stamps = []
+    for day in pd.bdate_range("2024-03-04", periods=days):
+        stamps.extend(pd.date_range(f"{day.date()} {start}", f"{day.date()} {end}", freq=freq,
+                                    tz="Asia/Kolkata", inclusive="left"))
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(len(stamps)).cumsum()
+    return pd.DataFrame({"open": close + rng.standard_normal(len(stamps)) * 0.1,
+                         "high": close + 1.0, "low": close - 1.0, "close": close,
+                         "volume": rng.integers(1, 1000, len(stamps)).astype(float)},
+                        index=pd.DatetimeIndex(stamps).tz_convert("UTC"))[OHLCV_COLUMNS]
+
+
+def incremental(df, interval, chunk=None):
+    rs = Resampler("15m", [interval], SESSIONS["NSE"])
+    keys, rows = [], []
+    if chunk is None:
+        for ts, row in zip(df.index, df.itertuples(index=False)):
+            for _, start, bar in rs.update(ts, *row):
+                keys.append(start)
+                rows.append(bar)
+    else:
+        for i in range(0, len(df), chunk):
+            closed = rs.update_frame(df.iloc[i:i + chunk])[interval]
+            keys.extend(closed.index.asi8)
+            rows.extend(map(tuple, closed.to_numpy()))
+    if rs.current(interval) is not None:
+        start, bar = rs.current(interval)
+        keys.append(start)
+        rows.append(bar)
+    return pd.DataFrame(rows, index=pd.to_datetime(keys, utc=True), columns=OHLCV_COLUMNS)
+
+
+@pytest.mark.parametrize("chunk", [None, 7, 100])
+@pytest.mark.parametrize("interval", ["1h", "1d", "1wk", "1mo"])
+def test_incremental_matches_batch(interval, chunk):
+    df = nse_bars()
+    batch = resample_ohlcv(df, interval, SESSIONS["NSE"])
+    inc = incremental(df, interval, chunk)
+    assert list(inc.index) == list(batch.index)
+    np.testing.assert_allclose(inc.to_numpy(), batch.to_numpy())
+
+
+def test_daily_bars_ignore_out_of_session_bars():
+    df = nse_bars(days=3)
+    daily = resample_ohlcv(df, "1d", SESSIONS["NSE"])
+    assert len(daily) == 3
+    in_hours = df[(df.index.tz_convert("Asia/Kolkata").strftime("%H:%M") < "15:30")]
+    assert daily["volume"].sum() == in_hours["volume"].sum()
+    assert len(incremental(df, "1d")) == 3
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+import live.webhook_server as ws
+from live.kite_executor import CoalescingExecutor, KiteExecutor
+from live.order_queue import OrderQueue
+from live.risk_manager import RiskManager
+
+CFG = {"symbol": "AAPL", "risk": {"max_risk_per_trade_pct": 100.0, "capital": 100000.0}}
+
+
+def assert_flat_reservations(risk):
+    assert risk.reservations == {}
+    assert risk.reserved_gross == 0
+    assert risk.pending_qty == {}
+
+
+def test_repeated_reservation_id_is_rejected_and_keeps_the_first():
+    risk = RiskManager(CFG)
+    assert risk.check_and_reserve("AAPL", "BUY", 10, 100.0, reservation_id="A1") == (True, None, "A1")
+    assert risk.check_and_reserve("AAPL", "BUY", 10, 100.0, reservation_id="A1") == (False, "duplicate", "A1")
+    assert risk.reserved_gross == 1000 and risk.pending_qty == {"AAPL": 10}
+    risk.fill("A1")
+    assert risk.positions["AAPL"].qty == 10
+    assert_flat_reservations(risk)
+
+
+def test_fill_net_books_only_the_residual():
+    risk = RiskManager(CFG)
+    risk.check_and_reserve("AAPL", "BUY", 10, 100.0, reservation_id="a")
+    risk.check_and_reserve("AAPL", "SELL", 4, 101.0, reservation_id="b")
+    risk.fill_net(["a", "b", "unknown"])
+    assert risk.positions["AAPL"].qty == 6
+    assert risk.positions["AAPL"].avg_price == 100.0
+    assert_flat_reservations(risk)
+
+
+def test_restore_drops_in_flight_reservations(tmp_path):
+    path = tmp_path / "risk.json"
+    risk = RiskManager(CFG)
+    risk.apply_fill("AAPL", 5, 100.0)
+    risk.check_and_reserve("AAPL", "BUY", 10, 100.0, reservation_id="A1")
+    risk.snapshot(path)
+    restored = RiskManager({"risk": {**CFG["risk"], "snapshot_path": str(path)}})
+    assert restored.positions["AAPL"].qty == 5
+    assert_flat_reservations(restored)
+
+
+class GatedExecutor:
+    """Holds every order until `gate` is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = 0
+
+    def place_order(self, symbol, side, size_pct=1.0, signal_id=None, qty=None):
+        self.calls += 1
+        self.gate.wait(5)
+        return {"paper": True}
+
+
+@pytest.fixture
+def server():
+    ws.cfg, ws.risk = CFG, RiskManager(CFG)
+    yield ws
+    if ws.orders is not None:
+        ws.orders.shutdown()
+    ws.orders = None
+
+
+def test_duplicate_alert_keeps_the_original_reservation(server):
+    ex = GatedExecutor()
+    server.executor = ex
+    server.orders = OrderQueue(ex, workers=1, on_done=server.settle_reservation)
+    client = server.app.test_client()
+    body = {"action": "BUY", "symbol": "AAPL", "size_pct": 0.01, "id": "A1", "qty": 10, "price": 100}
+    assert client.post("/webhook", json=body).get_json()["status"] == "queued"
+    assert client.post("/webhook", json=body).get_json()["status"] == "duplicate"
+    ex.gate.set()
+    server.orders.join()
+    assert ex.calls == 1
+    assert server.risk.positions["AAPL"].qty == 10
+    assert_flat_reservations(server.risk)
+
+
+@pytest.mark.parametrize("qtys,expected", [((10, 10), None), ((10, 5), 5)])
+def test_coalesced_batch_settles_from_the_net_order(server, qtys, expected):
+    ex = CoalescingExecutor(KiteExecutor({}), window_s=0.05)
+    server.executor = ex
+    server.orders = OrderQueue(ex, workers=2, on_done=server.settle_reservation)
+    client = server.app.test_client()
+    client.post("/webhook", json={"action": "BUY", "symbol": "AAPL", "size_pct": 0.01, "id": "b",
+                                  "qty": qtys[0], "price": 100})
+    client.post("/webhook", json={"action": "SELL", "symbol": "AAPL", "size_pct": 0.01, "id": "s",
+                                  "qty": qtys[1], "price": 100})
+    server.orders.join()
+    pos = server.risk.positions.get("AAPL")
+    assert (pos.qty if pos else None) == expected
+    assert_flat_reservations(server.risk)
+
+
+def test_max_positions_counts_symbols_with_pending_reservations():
+    risk = RiskManager({"risk": {**CFG["risk"], "max_positions": 2}})
+    results = [risk.check_and_reserve(f"S{i}", "BUY", 1, 100.0, reservation_id=f"r{i}") for i in range(5)]
+    assert [ok for ok, _, _ in results] == [True, True, False, False, False]
+    assert {reason for _, reason, _ in results[2:]} == {"max_positions"}
+    # more orders on a symbol that already holds a slot still pass
+    assert risk.check_and_reserve("S0", "BUY", 1, 100.0)[0]
+    risk.fill("r0")
+    risk.fill("r1")
+    assert not risk.check_and_reserve("S9", "BUY", 1, 100.0)[0]
+    assert len(risk.positions) == 2
+    # closing a position frees its slot
+    risk.apply_fill("S1", -1, 100.0)
+    assert risk.check_and_reserve("S9", "BUY", 1, 100.0)[0]
+    assert risk.pending_only == 1
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from live.strategy_loop import StrategyLoop
+from resample import SESSIONS, next_close
+
+NSE = SESSIONS["NSE"]
+
+
+def ist(text):
+    return pd.Timestamp(text, tz="Asia/Kolkata").value
+
+
+class NullExecutor:
+    def place_order(self, *args, **kwargs):
+        return {}
+
+
+def daily_frame(days):
+    idx = pd.DatetimeIndex([pd.Timestamp(d, tz="Asia/Kolkata") for d in days])
+    return pd.DataFrame({"open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1.0}, index=idx)
+
+
+def test_daily_bar_is_closed_at_the_session_close():
+    loop = StrategyLoop(["NSE:TEST"], "1d", executor=NullExecutor(), poll=False)
+    df = daily_frame(["2024-03-06", "2024-03-07", "2024-03-08"])
+    close = next_close(ist("2024-03-08 15:00"), "1d", NSE)
+    assert close == ist("2024-03-08 15:30")
+    bars = loop._new_bars("NSE:TEST", df, NSE, close)
+    assert [pd.Timestamp(b[0], tz="UTC") for b in bars] == list(df.index)
+
+
+@pytest.mark.parametrize("interval,now,expected", [
+    ("15m", "2024-03-08 15:20", "2024-03-08 15:30"),   # Friday's last bar
+    ("15m", "2024-03-08 15:40", "2024-03-11 09:30"),   # after Friday's close: Monday's first bar
+    ("15m", "2024-03-09 11:00", "2024-03-11 09:30"),   # Saturday
+    ("1h", "2024-03-10 23:00", "2024-03-11 10:15"),    # Sunday night
+    ("1d", "2024-03-08 16:00", "2024-03-11 15:30"),
+    ("1d", "2024-03-09 10:00", "2024-03-11 15:30"),
+])
+def test_next_close_skips_weekends(interval, now, expected):
+    assert next_close(ist(now), interval, NSE) == ist(expected)
+
+
+def test_round_the_clock_sessions_keep_weekends():
+    assert next_close(pd.Timestamp("2024-03-09 11:07", tz="UTC").value, "15m", SESSIONS["UTC"]) == \
+        pd.Timestamp("2024-03-09 11:15", tz="UTC").value
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+import scripts.sweep as sweep
+
+
+def frames(symbols=("AAA", "BBB"), n=400):
+    rng = np.random.default_rng(0)
+    out = {}
+    for sym in symbols:
+        close = 100 + rng.standard_normal(n).cumsum()
+        out[sym] = pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close,
+                                 "volume": 1000.0}, index=pd.date_range("2024-01-01", periods=n, freq="15min"))
+    return out
+
+
+GRID = {"ma": {"fast": [5, 8], "slow": [21], "size_frac": [0.01]}}
+
+
+def test_resume_returns_only_the_current_grid(tmp_path):
+    ckpt = tmp_path / "ckpt.jsonl"
+    big = sweep.run_sweep(frames(), {"ma": {"fast": [3, 5, 8], "slow": [21], "size_frac": [0.01]}},
+                          workers=2, checkpoint=ckpt, interval="15m", period="30d")
+    assert len(big) == 6
+    resumed = sweep.run_sweep(frames(("AAA",)), GRID, workers=2, checkpoint=ckpt, interval="15m", period="30d")
+    assert len(resumed) == 2
+    assert set(resumed["symbol"]) == {"AAA"} and set(resumed["fast"]) == {5, 8}
+
+
+def test_nothing_to_run_skips_the_pool(tmp_path, monkeypatch):
+    ckpt = tmp_path / "ckpt.jsonl"
+    first = sweep.run_sweep(frames(), GRID, workers=2, checkpoint=ckpt, interval="15m", period="30d")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no shared memory or pool expected")
+
+    monkeypatch.setattr(sweep, "to_shared", fail)
+    monkeypatch.setattr(sweep, "ProcessPoolExecutor", fail)
+    again = sweep.run_sweep(frames(), GRID, workers=2, checkpoint=ckpt, interval="15m", period="30d")
+    pd.testing.assert_frame_equal(first, again)
+
+
+def test_other_data_is_not_skipped(tmp_path):
+    ckpt = tmp_path / "ckpt.jsonl"
+    sweep.run_sweep(frames(), GRID, workers=2, checkpoint=ckpt, interval="15m", period="30d")
+    assert sweep.task_key("AAA", {"fast": 5}, "1h", "30d") != sweep.task_key("AAA", {"fast": 5}, "15m", "30d")
+    assert sweep.task_key("AAA", {"fast": 5}, "15m", "60d") != sweep.task_key("AAA", {"fast": 5}, "15m", "30d")
+    hourly = sweep.run_sweep(frames(), GRID, workers=2, checkpoint=ckpt, interval="1h", period="30d")
+    assert len(hourly) == 4
+    assert sum(1 for _ in open(ckpt)) == 8
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_store import OHLCV_COLUMNS
+from live.tick_aggregator import SimulatedFeed, TickAggregator, bars_to_frame
+
+T0 = int(pd.Timestamp("2024-03-04 00:00", tz="UTC").value)
+S = 10**9
+
+
+def ticks_of(feed):
+    return [t for batch in feed for t in batch]
+
+
+def pandas_bars(ticks, symbol, interval, tz="UTC", offset=None):
+    """Reference OHLCV from pandas: ticks ordered by timestamp, resampled in the session tz."""
+    rows = sorted((t for t in ticks if t[0] == symbol), key=lambda t: t[1])
+    idx = pd.to_datetime([t[1] for t in rows], utc=True).tz_convert(tz)
+    df = pd.DataFrame({"price": [t[2] for t in rows], "qty": [t[3] for t in rows]}, index=idx)
+    r = df.resample(interval, offset=offset)
+    out = r["price"].ohlc().assign(volume=r["qty"].sum())
+    out = out[r["price"].count() > 0]
+    out.columns = OHLCV_COLUMNS
+    return out.tz_convert("UTC")
+
+
+def aggregate(ticks, intervals, grace_ms=0.0):
+    agg = TickAggregator(intervals, grace_ms=grace_ms)
+    bars = agg.update_many(ticks) + agg.flush()
+    return agg, bars
+
+
+@pytest.mark.parametrize("interval,freq", [("1m", "1min"), ("5m", "5min"), ("1h", "1h")])
+def test_in_order_ticks_match_pandas(interval, freq):
+    ticks = ticks_of(SimulatedFeed(["SIM:A", "SIM:B"], n_ticks=20_000, ticks_per_s=2.0, batch=3000))
+    agg, bars = aggregate(ticks, ["1m", "5m", "1h"])
+    for sym in ("SIM:A", "SIM:B"):
+        got = bars_to_frame(bars, sym, interval)
+        want = pandas_bars(ticks, sym, freq)
+        assert list(got.index) == list(want.index)
+        np.testing.assert_allclose(got.to_numpy(), want.to_numpy())
+    assert agg.stats["late_in_bucket"] == agg.stats["late_dropped"] == 0
+
+
+def test_nse_bars_are_anchored_at_the_open_and_skip_off_hours():
+    # 09:00-16:00 IST with one tick a second: pre-open and post-close ticks are dropped
+    start = int(pd.Timestamp("2024-03-04 09:00", tz="Asia/Kolkata").value)
+    rng = np.random.default_rng(1)
+    ticks = [("NSE:SIM", start + i * S, 100 + float(rng.normal()), 1.0) for i in range(7 * 3600)]
+    agg, bars = aggregate(ticks, ["15m", "1h"])
+    in_session = [t for t in ticks
+                  if "09:15" <= pd.Timestamp(t[1], tz="UTC").tz_convert("Asia/Kolkata").strftime("%H:%M") < "15:30"]
+    assert agg.stats["outside_session"] == len(ticks) - len(in_session)
+    for interval, freq in (("15m", "15min"), ("1h", "1h")):
+        got = bars_to_frame(bars, "NSE:SIM", interval)
+        want = pandas_bars(in_session, "NSE:SIM", freq, tz="Asia/Kolkata", offset="15min")
+        assert list(got.index) == list(want.index)
+        np.testing.assert_allclose(got.to_numpy(), want.to_numpy())
+    assert bars_to_frame(bars, "NSE:SIM", "1h").index[-1].tz_convert("Asia/Kolkata").strftime("%H:%M") == "15:15"
+
+
+def test_bar_is_emitted_by_the_first_tick_past_its_end():
+    agg = TickAggregator(["1m"])
+    assert not agg.update("SIM:A", T0 + 10 * S, 1.0, 1)
+    assert not agg.update("SIM:A", T0 + 50 * S, 2.0, 1)
+    [bar] = agg.update("SIM:A", T0 + 60 * S, 3.0, 1)
+    assert (bar.start, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.ticks) == (T0, 1.0, 2.0, 1.0, 2.0, 2, 2)
+    assert agg.current("SIM:A", "1m").start == T0 + 60 * S
+    # a quiet symbol's bar is closed by flush() once the clock passes its end
+    assert agg.flush(T0 + 119 * S) == []
+    assert [b.start for b in agg.flush(T0 + 120 * S)] == [T0 + 60 * S]
+
+
+def test_late_tick_inside_the_forming_bucket_moves_the_open():
+    agg = TickAggregator(["1m"])
+    agg.update("SIM:A", T0 + 20 * S, 2.0, 1)
+    agg.update("SIM:A", T0 + 10 * S, 1.0, 1)  # arrives after the 20s tick
+    agg.update("SIM:A", T0 + 30 * S, 3.0, 1)
+    [bar] = agg.flush()
+    assert (bar.open, bar.close, bar.low, bar.high) == (1.0, 3.0, 1.0, 3.0)
+    assert agg.stats["late_in_bucket"] == 1
+
+
+def test_late_tick_within_grace_joins_the_closed_bucket():
+    agg = TickAggregator(["1m"], grace_ms=5000)
+    agg.update("SIM:A", T0 + 10 * S, 1.0, 1)
+    assert not agg.update("SIM:A", T0 + 62 * S, 3.0, 1)  # bucket closed but held for the grace period
+    assert not agg.update("SIM:A", T0 + 30 * S, 5.0, 1)
+    [bar] = agg.update("SIM:A", T0 + 65 * S, 3.0, 1)
+    assert (bar.start, bar.high, bar.close, bar.ticks) == (T0, 5.0, 5.0, 2)
+    assert agg.stats["late_in_grace"] == 1
+
+
+def test_late_tick_for_an_emitted_bar_is_dropped():
+    agg = TickAggregator(["1m"])
+    agg.update("SIM:A", T0 + 10 * S, 1.0, 1)
+    [bar] = agg.update("SIM:A", T0 + 61 * S, 3.0, 1)
+    assert not agg.update("SIM:A", T0 + 30 * S, 9.0, 1)
+    assert agg.stats["late_dropped"] == 1
+    assert [b.high for b in agg.flush()] == [3.0]  # only the forming 00:01 bar is left
+
+
+def test_out_of_order_feed_matches_pandas_with_enough_grace():
+    # ticks are at most 500ms late, so a 1s grace period catches every one of them
+    feed = SimulatedFeed(["SIM:A", "SIM:B"], n_ticks=20_000, ticks_per_s=20.0, late_frac=0.05, max_delay_ms=500)
+    ticks = ticks_of(feed)
+    agg, bars = aggregate(ticks, ["1m", "5m"], grace_ms=1000)
+    assert agg.stats["late_dropped"] == 0 and agg.stats["late_in_bucket"] > 0 and agg.stats["late_in_grace"] > 0
+    for sym in ("SIM:A", "SIM:B"):
+        for interval, freq in (("1m", "1min"), ("5m", "5min")):
+            got = bars_to_frame(bars, sym, interval)
+            want = pandas_bars(ticks, sym, freq)
+            assert list(got.index) == list(want.index)
+            np.testing.assert_allclose(got.to_numpy(), want.to_numpy())
+
+
+def test_without_grace_dropped_ticks_are_the_only_ones_missing():
+    feed = SimulatedFeed(["SIM:A"], n_ticks=20_000, ticks_per_s=20.0, late_frac=0.05, max_delay_ms=500)
+    ticks = ticks_of(feed)
+    agg, bars = aggregate(ticks, ["1m"])
+    assert agg.stats["late_dropped"] > 0
+    assert sum(b.ticks for b in bars) + agg.stats["late_dropped"] == len(ticks)
+    starts = [b.start for b in bars]
+    assert starts == sorted(set(starts))
@@ -0,0 +1,23 @@
+import logging
+
+from universal_fetcher import SymbolRouter, universe_symbol_for_yf
+
+
+def test_unknown_provider_hint_falls_back_with_a_warning(caplog):
+    router = SymbolRouter([{"universe_symbol": "NSE:NIFTY", "provider_hint": "kite"}])
+    with caplog.at_level(logging.WARNING, logger="universal_fetcher"):
+        route = router.resolve("NSE:NIFTY")
+    assert (route.provider, route.symbol) == ("yfinance", "NIFTY.NS")
+    assert "'kite'" in caplog.text and "NSE:NIFTY" in caplog.text
+
+
+def test_registered_provider_hint_overrides_the_prefix_rule():
+    route = SymbolRouter().resolve("BINANCE:BTC/USDT", provider_hint="yfinance")
+    assert (route.provider, route.symbol) == ("yfinance", "BTC/USDT")
+    route = SymbolRouter().resolve("BINANCE:BTC/USDT")
+    assert (route.provider, route.symbol, route.exchange) == ("ccxt", "BTC/USDT", "binance")
+
+
+def test_yfinance_tickers_map_back_to_universe_symbols():
+    assert [universe_symbol_for_yf(t) for t in ("TCS.NS", "TCS.BO", "EURUSD=X", "^NSEI", "GC=F", "AAPL")] == \
+        ["NSE:TCS", "BSE:TCS", "FX:EURUSD", "INDEX:NIFTY", "METAL:GOLD", "AAPL"]
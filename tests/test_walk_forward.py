@@ -0,0 +1,22 @@
+import pytest
+
+from scripts.walk_forward import make_folds
+from test_dataset import FUTURE_BARS, assert_purged, nse_dataset
+
+
+@pytest.mark.parametrize("mode,train_bars", [("expanding", None), ("rolling", 100), ("rolling", None)])
+def test_folds_purge_and_window_in_rows(mode, train_bars):
+    ds = nse_dataset()
+    folds = make_folds(ds, n_folds=6, mode=mode, train_bars=train_bars)
+    assert len(folds) == 6
+    for fold in folds:
+        train = ds.ranges_before(fold["test_start"], fold["purge_bars"], fold["train_bars"])
+        assert_purged(ds, train, fold["test_start"])
+        rows = sum(hi - lo for lo, hi in train)
+        if mode == "expanding":
+            assert train[0][0] == 0
+        elif train_bars:
+            assert rows == train_bars
+        else:
+            first_window = ds.ranges_before(folds[0]["test_start"], FUTURE_BARS)
+            assert rows == first_window[0][1] - first_window[0][0]
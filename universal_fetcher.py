@@ -1,238 +1,331 @@
-# scripts/universal_fetcher.py
+# universal_fetcher.py
 """
-Universal data fetcher for equities, indices, FX, metals, and crypto.
-- Uses yfinance for equities/indices/commodities where available
-- Uses CCXT for crypto tickers / exchanges
-- Placeholder function for NSE option chains (requires broker/API)
+Universal data fetcher + candlestick pattern integration.
+- yfinance for global equities/indices/metals/FX, ccxt for crypto
+- providers are registered by name and imported on first use, so a process that only
+  trades NSE never loads ccxt; register_provider() adds a backend without editing
+  fetch_market_data
+- SymbolRouter maps a universe symbol to (provider, provider symbol, exchange) from prefix
+  rules plus provider hints in data/instrument_registry.csv; resolutions are memoized
+- integrates candlestick_patterns.detect_patterns() to return final_signal
 """
 
-import pandas as pd
-import time
+import csv
+import importlib
 import logging
-from typing import Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
 
-# pip install yfinance ccxt
-import yfinance as yf
-import ccxt
+from rate_limit import get_bucket
+from backfill import backfill_period
+from bar_store import interval_to_timedelta, period_to_timedelta
+from resample import resample_ohlcv, session_for
+from metrics import inc, span
+from candlestick_patterns import detect_patterns  # ensure candlestick_patterns.py is in PYTHONPATH or same dir
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# -------------- Helpers --------------
-def fetch_yfinance_ohlcv(symbol: str, interval: str = "15m", period: str = "30d") -> pd.DataFrame:
+# --------------- yfinance ---------------
+def fetch_yfinance_ohlcv(symbol: str, interval: str = "15m", period: str = "30d", start=None, end=None) -> pd.DataFrame:
     """
     symbol: ticker in yfinance format, e.g., "RELIANCE.NS", "^NSEI", "GC=F" (gold futures), "EURUSD=X"
-    interval: '1m','2m','5m','15m','1h','1d'
-    period: "7d","30d","365d"
+    start/end: explicit range (used by the bar cache to top up only the missing part), else period
     """
-    df = yf.download(tickers=symbol, period=period, interval=interval, progress=False)
+    import yfinance as yf  # loaded on first use: ~0.2 s of import time
+    if start is not None:
+        df = yf.download(tickers=symbol, start=start, end=end, interval=interval, progress=False)
+    else:
+        df = yf.download(tickers=symbol, period=period, interval=interval, progress=False)
     if df is None or df.empty:
-        logger.warning(f"No data from yfinance for {symbol} (interval={interval} period={period})")
+        logger.warning("No data from yfinance for %s", symbol)
         return pd.DataFrame()
     df = df.rename(columns={"Open":"open","High":"high","Low":"low","Close":"close","Volume":"volume"})
     df.index = pd.to_datetime(df.index)
-    return df[["open","high","low","close","volume"]]
+    df = df[["open","high","low","close","volume"]]
+    return df
 
 # --------------- CCXT Crypto ---------------
-# example: fetcher for Binance (spot)
 _ccxt_exchanges = {}
+_ccxt_lock = threading.Lock()
 def get_ccxt_exchange(name="binance"):
-    if name not in _ccxt_exchanges:
-        ex = getattr(ccxt, name)()
-        _ccxt_exchanges[name] = ex
+    with _ccxt_lock:
+        if name not in _ccxt_exchanges:
+            import ccxt  # loaded on first use: ~0.25 s of import time
+            _ccxt_exchanges[name] = getattr(ccxt, name)()
     return _ccxt_exchanges[name]
 
-def fetch_crypto_ohlcv(symbol: str, exchange_name: str = "binance", timeframe: str = "15m", limit: int = 500):
-    """
-    symbol: "BTC/USDT", "DOGE/USDT" etc.
-    timeframe: '1m','5m','15m','1h','1d'
-    returns pandas DataFrame with columns open, high, low, close, volume
-    """
+def fetch_crypto_ohlcv(symbol: str, exchange_name: str = "binance", timeframe: str = "15m", limit: int = 500,
+                       since: Optional[int] = None, raise_errors: bool = False):
+    """since: start time in ms since epoch (None = most recent `limit` bars)
+    raise_errors: re-raise exchange errors instead of returning an empty frame (backfill retries them)"""
     ex = get_ccxt_exchange(exchange_name)
-    # unify symbol if needed
     try:
-        ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
+        ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
     except Exception as e:
-        logger.error("CCXT fetch failed: %s", e)
+        if raise_errors:
+            raise
+        logger.error("CCXT fetch failed for %s: %s", symbol, e)
         return pd.DataFrame()
     df = pd.DataFrame(ohlcv, columns=["timestamp","open","high","low","close","volume"])
     df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
     df.set_index("timestamp", inplace=True)
     return df
 
-# --------------- NSE Option Chain Placeholder ---------------
-def fetch_nse_option_chain(symbol: str):
+# --------------- Routing ---------------
+class Route:
+    """Where a universe symbol is fetched from."""
+    __slots__ = ("univ_symbol", "provider", "symbol", "exchange")
+
+    def __init__(self, univ_symbol: str, provider: str, symbol: str, exchange: Optional[str] = None):
+        self.univ_symbol = univ_symbol
+        self.provider = provider
+        self.symbol = symbol
+        self.exchange = exchange
+
+    @property
+    def bucket(self) -> str:
+        """Rate-limit bucket (rate_limit.py): 'yfinance', 'ccxt:<exchange>', or the provider name."""
+        return f"ccxt:{self.exchange}" if self.provider == "ccxt" else self.provider
+
+    def __repr__(self):
+        return f"Route({self.univ_symbol!r} -> {self.provider}:{self.symbol}" + (f"@{self.exchange})" if self.exchange else ")")
+
+INDEX_SYMBOLS = {"NIFTY":"^NSEI","SENSEX":"^BSESN","DOW":"^DJI","SPX":"^GSPC"}
+METAL_SYMBOLS = {"GOLD":"GC=F","SILVER":"SI=F","XAU":"GC=F"}
+
+# universe prefix -> (provider, provider-symbol transform of the part after ':'; None = as is)
+PREFIX_RULES: Dict[str, Tuple[str, Optional[Callable[[str], str]]]] = {
+    "NSE": ("yfinance", lambda s: s + ".NS"),
+    "BSE": ("yfinance", lambda s: s + ".BO"),  # yfinance BSE tickers sometimes use .BO or .BSE
+    "INDEX": ("yfinance", lambda s: INDEX_SYMBOLS.get(s.upper(), s.upper())),
+    "FX": ("yfinance", lambda s: f"{s.upper()}=X"),
+    "METAL": ("yfinance", lambda s: METAL_SYMBOLS.get(s.upper(), s.upper())),
+    "BINANCE": ("ccxt", None),
+    "CRYPTO": ("ccxt", None),
+}
+DEFAULT_EXCHANGE = "binance"
+
+def universe_symbol_for_yf(ticker: str) -> str:
     """
-    Placeholder for fetching NSE option chain for an underlying like 'RELIANCE' or 'NIFTY'.
-    Options:
-    - Use Zerodha/Kite Connect instrument lookup + NSE option chain endpoints (via broker)
-    - Use 'nsepython' / 'nsetools' or scrape (may break / be against TOS)
-    Implement this function with your chosen provider.
+    Universe symbol of a raw yfinance ticker ("TCS.NS" -> "NSE:TCS", "^NSEI" -> "INDEX:NIFTY"),
+    the inverse of the yfinance PREFIX_RULES, so both spellings share one bar cache entry.
+    Tickers without a rule ("AAPL") are already universe symbols.
     """
-    raise NotImplementedError("NSE Option chain fetch requires broker API or paid data feed. Implement here.")
+    if ticker.endswith(".NS"):
+        return "NSE:" + ticker[:-3]
+    if ticker.endswith(".BO"):
+        return "BSE:" + ticker[:-3]
+    if ticker.endswith("=X"):
+        return "FX:" + ticker[:-2]
+    for prefix, table in (("INDEX", INDEX_SYMBOLS), ("METAL", METAL_SYMBOLS)):
+        name = next((k for k, v in table.items() if v == ticker), None)
+        if name is not None:
+            return f"{prefix}:{name}"
+    return ticker
 
-# --------------- Unified fetch function ---------------
-def fetch_market_data(univ_symbol: str, interval: str = "15m", period: str = "30d", exchange_hint: Optional[str]=None):
+class SymbolRouter:
     """
-    univ_symbol: a canonical symbol with hints, e.g.:
-      - NSE stock: "NSE:RELIANCE" -> maps to "RELIANCE.NS" for yfinance
-      - BSE: "BSE:TCS" -> mapping needed
-      - Index: "INDEX:NIFTY" -> "^NSEI" or other symbol
-      - Crypto: "BINANCE:BTC/USDT" or "CRYPTO:BTC/USDT"
-      - FX: "FX:EURUSD" -> "EURUSD=X" in yfinance or use AlphaVantage
-      - Metal: "METAL:GOLD" -> "GC=F" or MCX symbol (not always in yfinance)
-    """
-    # simple parser:
-    if univ_symbol.startswith("NSE:") or univ_symbol.endswith(".NS"):
-        # convert NSE:RELIANCE -> REliance.NS
-        if univ_symbol.startswith("NSE:"):
-            yf_sym = univ_symbol.split(":",1)[1] + ".NS"
-        else:
-            yf_sym = univ_symbol
-        return fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-    if univ_symbol.startswith("BSE:"):
-        # yfinance BSE tickers sometimes use .BO or .BSE - check
-        yf_sym = univ_symbol.split(":",1)[1] + ".BO"
-        return fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-    if univ_symbol.startswith("INDEX:"):
-        # mapping common indices
-        idx = univ_symbol.split(":",1)[1].upper()
-        mapping = {"NIFTY":"^NSEI","SENSEX":"^BSESN","DOW":"^DJI","SPX":"^GSPC"}
-        yf_sym = mapping.get(idx, idx)
-        return fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-    if univ_symbol.startswith("BINANCE:") or univ_symbol.startswith("CRYPTO:"):
-        sym = univ_symbol.split(":",1)[1]
-        return fetch_crypto_ohlcv(sym, exchange_name=(exchange_hint or "binance"), timeframe=interval)
-    if univ_symbol.startswith("FX:") or univ_symbol.endswith("=X"):
-        # Try yfinance for FX: EURUSD -> EURUSD=X
-        if univ_symbol.startswith("FX:"):
-            pair = univ_symbol.split(":",1)[1].upper()
-            yf_sym = f"{pair}=X"
+    Universe symbol -> Route. The prefix before ':' selects a rule (one dict lookup); symbols
+    without a known prefix go to the default provider as they are ("RELIANCE.NS", "EURUSD=X").
+    A provider hint (from the registry CSV or the caller) overrides the rule when that provider
+    is registered; an unknown hint is logged and ignored. Resolutions are memoized.
+    """
+
+    def __init__(self, registry_rows: Iterable[Dict[str, str]] = (), rules: Optional[Dict] = None,
+                 default_provider: str = "yfinance"):
+        self.rules = dict(PREFIX_RULES if rules is None else rules)
+        self.default_provider = default_provider
+        self.hints = {r["universe_symbol"]: r["provider_hint"].strip().lower()
+                      for r in registry_rows if r.get("provider_hint")}
+        self._cache: Dict[Tuple, Route] = {}
+
+    def add_rule(self, prefix: str, provider: str, transform: Optional[Callable[[str], str]] = None):
+        """Route '<PREFIX>:...' symbols to provider, e.g. add_rule("KRAKEN", "ccxt")."""
+        self.rules[prefix.upper()] = (provider, transform)
+        self._cache.clear()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def resolve(self, univ_symbol: str, exchange_hint: Optional[str] = None,
+                provider_hint: Optional[str] = None) -> Route:
+        key = (univ_symbol, exchange_hint, provider_hint)
+        route = self._cache.get(key)
+        if route is None:
+            route = self._cache[key] = self._resolve(univ_symbol, exchange_hint, provider_hint)
+        return route
+
+    def _resolve(self, univ_symbol, exchange_hint, provider_hint) -> Route:
+        prefix, sep, rest = univ_symbol.partition(":")
+        prefix = prefix.upper()
+        rule = self.rules.get(prefix) if sep else None
+        if rule is not None:
+            provider, transform = rule
+            symbol = transform(rest) if transform else rest
         else:
-            yf_sym = univ_symbol
-        return fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-    if univ_symbol.startswith("METAL:"):
-        metal = univ_symbol.split(":",1)[1].upper()
-        mapping = {"GOLD":"GC=F","SILVER":"SI=F","XAU":"GC=F"}
-        yf_sym = mapping.get(metal, metal)
-        return fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
+            provider, symbol = self.default_provider, univ_symbol
+        hint = (provider_hint or self.hints.get(univ_symbol) or "").strip().lower()
+        if hint and hint != provider:
+            if has_provider(hint):
+                provider, symbol = hint, rest if sep else univ_symbol
+            else:
+                logger.warning("Provider hint %r for %s is not a registered provider, using %s",
+                               hint, univ_symbol, provider)
+        exchange = None
+        if provider == "ccxt":
+            exchange = exchange_hint or (prefix.lower() if sep and prefix != "CRYPTO" else DEFAULT_EXCHANGE)
+        return Route(univ_symbol, provider, symbol, exchange)
 
-    # fallback: try direct yfinance symbol
-    return fetch_yfinance_ohlcv(univ_symbol, interval=interval, period=period)
+REGISTRY_PATH = Path("data/instrument_registry.csv")
 
+_router: Optional[SymbolRouter] = None
+_router_lock = threading.Lock()
 
-# ------------------ Example usage ------------------
-if __name__ == "__main__":
-    # examples:
-    examples = [
-        "NSE:RELIANCE",
-        "BSE:TCS",
-        "INDEX:NIFTY",
-        "BINANCE:BTC/USDT",
-        "CRYPTO:DOGE/USDT",
-        "FX:EURUSD",
-        "METAL:GOLD"
-    ]
-    for s in examples:
-        print("Fetching", s)
-        try:
-            df = fetch_market_data(s, interval="1h", period="7d")
-            print(f"{s}: rows={len(df)}")
-            time.sleep(1)
-        except Exception as e:
-            print("Error:", e)
-# scripts/universal_fetcher.py
-"""
-Universal data fetcher + candlestick pattern integration.
-- yfinance for global equities/indices/metals/FX
-- ccxt for crypto
-- integrates candlestick_patterns.detect_patterns() to return final_signal
-"""
+def get_router() -> SymbolRouter:
+    """The process-wide router, built once from REGISTRY_PATH (if present) and PREFIX_RULES."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                rows = load_instrument_registry(REGISTRY_PATH) if REGISTRY_PATH.exists() else []
+                _router = SymbolRouter(rows)
+    return _router
 
-import pandas as pd
-import logging
-import time
-from typing import Optional
-import yfinance as yf
-import ccxt
+def set_router(router: Optional[SymbolRouter]):
+    """Replace the process-wide router (None = rebuild from the registry on next use)."""
+    global _router
+    _router = router
 
-from candlestick_patterns import detect_patterns  # ensure candlestick_patterns.py is in PYTHONPATH or same dir
+# --------------- Providers ---------------
+# name -> fetch function, or "module:function" imported on first use.
+# A fetch function is called as fetch(route, interval, period, use_cache) and returns OHLCV.
+_provider_specs: Dict[str, Union[str, Callable]] = {}
+_providers: Dict[str, Callable] = {}
+_providers_lock = threading.Lock()
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+def register_provider(name: str, fetch: Union[str, Callable]):
+    """
+    Add or replace a market-data backend. fetch: a callable, or "package.module:function" so the
+    backend's module (and its dependencies) is only imported when a symbol first routes to it.
+    """
+    with _providers_lock:
+        _provider_specs[name] = fetch
+        _providers.pop(name, None)
+    if _router is not None:
+        _router.clear_cache()  # provider hints may resolve differently now
 
-def fetch_yfinance_ohlcv(symbol: str, interval: str = "15m", period: str = "30d") -> pd.DataFrame:
-    df = yf.download(tickers=symbol, period=period, interval=interval, progress=False)
-    if df is None or df.empty:
-        logger.warning("No data from yfinance for %s", symbol)
-        return pd.DataFrame()
-    df = df.rename(columns={"Open":"open","High":"high","Low":"low","Close":"close","Volume":"volume"})
-    df.index = pd.to_datetime(df.index)
-    df = df[["open","high","low","close","volume"]]
-    return df
+def has_provider(name: str) -> bool:
+    return name in _provider_specs
 
-_ccxt_exchanges = {}
-def get_ccxt_exchange(name="binance"):
-    if name not in _ccxt_exchanges:
-        _ccxt_exchanges[name] = getattr(ccxt, name)()
-    return _ccxt_exchanges[name]
+def get_provider(name: str) -> Callable:
+    fn = _providers.get(name)
+    if fn is None:
+        with _providers_lock:
+            spec = _provider_specs.get(name)
+            if spec is None:
+                raise ValueError(f"Unknown market-data provider: {name}")
+            if isinstance(spec, str):
+                module, _, attr = spec.partition(":")
+                spec = getattr(importlib.import_module(module), attr)
+                logger.debug("Loaded market-data provider %s from %s", name, module)
+            fn = _providers[name] = spec
+    return fn
 
-def fetch_crypto_ohlcv(symbol: str, exchange_name: str = "binance", timeframe: str = "15m", limit: int = 500):
-    ex = get_ccxt_exchange(exchange_name)
-    try:
-        ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
-    except Exception as e:
-        logger.error("CCXT fetch failed for %s: %s", symbol, e)
-        return pd.DataFrame()
-    df = pd.DataFrame(ohlcv, columns=["timestamp","open","high","low","close","volume"])
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-    df.set_index("timestamp", inplace=True)
-    return df
+def _fetch_yf(route: Route, interval: str, period: str, use_cache: bool) -> pd.DataFrame:
+    if not use_cache or period_to_timedelta(period) is None:
+        get_bucket("yfinance").acquire()
+        return fetch_yfinance_ohlcv(route.symbol, interval=interval, period=period)
+    # yf.download reports failures as an empty frame, so empty windows are retried next time
+    return backfill_period(route.univ_symbol, interval, period,
+                           lambda s, e: fetch_yfinance_ohlcv(route.symbol, interval=interval, start=s, end=e),
+                           provider="yfinance", record_empty=False)
 
-def fetch_market_data(univ_symbol: str, interval: str = "15m", period: str = "30d", exchange_hint: Optional[str]=None):
+def _fetch_crypto(route: Route, interval: str, period: str, use_cache: bool, limit: int = 500) -> pd.DataFrame:
+    if not use_cache or period_to_timedelta(period) is None:
+        get_bucket(route.bucket).acquire()
+        return fetch_crypto_ohlcv(route.symbol, exchange_name=route.exchange, timeframe=interval, limit=limit)
+    return backfill_period(route.univ_symbol, interval, period,
+                           lambda s, e: fetch_crypto_ohlcv(route.symbol, exchange_name=route.exchange,
+                                                           timeframe=interval, limit=limit,
+                                                           since=int(s.value // 1_000_000), raise_errors=True),
+                           provider=route.bucket, page_limit=limit)
+
+register_provider("yfinance", _fetch_yf)
+register_provider("ccxt", _fetch_crypto)
+
+# --------------- Replay ---------------
+_replay_provider = None
+
+def set_replay_provider(provider):
+    """Serve fetch_market_data() from a replay_provider.ReplayProvider (None = live providers again)."""
+    global _replay_provider
+    _replay_provider = provider
+
+# --------------- NSE Option Chain (Kite) ---------------
+def fetch_nse_option_chain(symbol: str, expiry: Optional[str] = None, strike_window: Optional[int] = None,
+                           rate: float = 0.065) -> pd.DataFrame:
+    """
+    Option chain snapshot for an NSE underlying like 'RELIANCE' or 'NIFTY' via Kite Connect:
+    one row per contract with bid/ask/last/oi plus implied volatility and greeks.
+    expiry: 'YYYY-MM-DD', 'all', or None for the nearest expiry. Needs KITE_API_KEY / KITE_ACCESS_TOKEN.
+    """
+    from live.kite_option_chain import KiteHelper
+    from live.option_chain_snapshot import OptionChainSnapshot
+    kh = KiteHelper()
+    if not kh.kite:
+        raise RuntimeError("NSE option chain needs Kite credentials (KITE_API_KEY / KITE_ACCESS_TOKEN)")
+    snap = OptionChainSnapshot(kh.kite, kh.instrument_store(), rate=rate)
+    return snap.snapshot(symbol.split(":", 1)[-1], expiry=expiry, strike_window=strike_window)
+
+# --------------- Unified fetch function ---------------
+def fetch_market_data(univ_symbol: str, interval: str = "15m", period: str = "30d", exchange_hint: Optional[str]=None,
+                      use_cache: bool = True, provider_hint: Optional[str] = None, patterns: bool = True):
     """
     Universal interface returning OHLCV with candlestick signals attached.
+    univ_symbol: a canonical symbol with hints, e.g.:
+      - NSE stock: "NSE:RELIANCE" -> "RELIANCE.NS" for yfinance
+      - BSE: "BSE:TCS" -> "TCS.BO"
+      - Index: "INDEX:NIFTY" -> "^NSEI"
+      - Crypto: "BINANCE:BTC/USDT" or "CRYPTO:BTC/USDT" (ccxt, exchange_hint or binance)
+      - FX: "FX:EURUSD" -> "EURUSD=X"
+      - Metal: "METAL:GOLD" -> "GC=F"
+      - anything else is passed to yfinance as is
+    use_cache: serve bars from the local bar store (bar_store.py) and only download what is missing.
+    patterns: attach candlestick columns; False returns plain OHLCV (callers that keep their own
+    incremental PatternStream, e.g. live/strategy_loop.py).
     """
     df = pd.DataFrame()
+    provider = "replay" if _replay_provider is not None else "unknown"
     try:
-        if univ_symbol.startswith("NSE:") or univ_symbol.endswith(".NS"):
-            if univ_symbol.startswith("NSE:"):
-                yf_sym = univ_symbol.split(":",1)[1] + ".NS"
-            else:
-                yf_sym = univ_symbol
-            df = fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-        elif univ_symbol.startswith("BSE:"):
-            yf_sym = univ_symbol.split(":",1)[1] + ".BO"
-            df = fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-        elif univ_symbol.startswith("INDEX:"):
-            idx = univ_symbol.split(":",1)[1].upper()
-            mapping = {"NIFTY":"^NSEI","SENSEX":"^BSESN","DOW":"^DJI","SPX":"^GSPC"}
-            yf_sym = mapping.get(idx, idx)
-            df = fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-        elif univ_symbol.startswith("BINANCE:") or univ_symbol.startswith("CRYPTO:"):
-            sym = univ_symbol.split(":",1)[1]
-            df = fetch_crypto_ohlcv(sym, exchange_name=(exchange_hint or "binance"), timeframe=interval)
-        elif univ_symbol.startswith("FX:"):
-            pair = univ_symbol.split(":",1)[1].upper()
-            yf_sym = f"{pair}=X"
-            df = fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
-        elif univ_symbol.startswith("METAL:"):
-            metal = univ_symbol.split(":",1)[1].upper()
-            mapping = {"GOLD":"GC=F","SILVER":"SI=F"}
-            yf_sym = mapping.get(metal, metal)
-            df = fetch_yfinance_ohlcv(yf_sym, interval=interval, period=period)
+        if _replay_provider is not None:
+            with span("fetch", provider=provider):
+                df = _replay_provider.ohlcv(univ_symbol, interval=interval, period=period)
         else:
-            df = fetch_yfinance_ohlcv(univ_symbol, interval=interval, period=period)
+            route = get_router().resolve(univ_symbol, exchange_hint, provider_hint)
+            provider = route.provider
+            with span("fetch", provider=provider):
+                df = get_provider(provider)(route, interval, period, use_cache)
     except Exception as e:
         logger.exception("fetch_market_data error for %s: %s", univ_symbol, e)
+        inc("fetch_failures_total", provider=provider)
         return pd.DataFrame()
 
     if df.empty:
+        inc("fetch_empty_total", provider=provider)
         return df
+    return _attach_patterns(univ_symbol, df) if patterns else df
 
-    # Add candlestick pattern detection
+def _attach_patterns(univ_symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Add candlestick pattern columns and final_signal to an OHLCV frame."""
     try:
-        df_patterns = detect_patterns(df[["open","high","low","close","volume"]])
+        with span("patterns"):
+            df_patterns = detect_patterns(df[["open","high","low","close","volume"]])
         # merge pattern columns into df (pattern function returns a DataFrame with pattern columns)
         for col in df_patterns.columns:
             if col not in df.columns:
@@ -245,3 +338,102 @@ def fetch_market_data(univ_symbol: str, interval: str = "15m", period: str = "30
         logger.exception("Pattern detection failed for %s: %s", univ_symbol, e)
 
     return df
+
+
+def fetch_market_data_mtf(univ_symbol: str, intervals: Iterable[str] = ("15m", "1h", "1d"), period: str = "30d",
+                          exchange_hint: Optional[str] = None, use_cache: bool = True,
+                          base_interval: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Several timeframes of one symbol from a single provider fetch: the finest interval (or
+    base_interval) is fetched once and the others are resampled from it, session-aware
+    (resample.py). Returns {interval: df} with candlestick signals attached to each.
+    The base interval's history limits every timeframe (yfinance serves 15m bars ~60 days back).
+    """
+    intervals = list(intervals)
+    base = base_interval or min(intervals, key=interval_to_timedelta)
+    df = fetch_market_data(univ_symbol, interval=base, period=period, exchange_hint=exchange_hint,
+                           use_cache=use_cache)
+    if df.empty:
+        return {iv: df for iv in intervals}
+    session = session_for(univ_symbol)
+    out = {}
+    for iv in intervals:
+        if iv == base:
+            out[iv] = df
+        else:
+            bars = resample_ohlcv(df, iv, session)
+            out[iv] = _attach_patterns(univ_symbol, bars) if not bars.empty else bars
+    return out
+
+
+# --------------- Batch fetch over the instrument registry ---------------
+def load_instrument_registry(path: Union[str, Path] = REGISTRY_PATH) -> List[Dict[str, str]]:
+    """
+    Parse data/instrument_registry.csv (comment lines start with '#').
+    Returns dicts with universe_symbol, provider_hint, asset_class, note.
+    """
+    fields = ["universe_symbol", "provider_hint", "asset_class", "note"]
+    rows = []
+    with open(path) as f:
+        lines = [row for row in f if row.strip() and not row.strip().startswith("#")]
+    for row in csv.reader(lines, skipinitialspace=True):
+        if not row or not row[0].strip():
+            continue
+        rec = {k: (row[i].strip() if i < len(row) else "") for i, k in enumerate(fields)}
+        rows.append(rec)
+    return rows
+
+def provider_key(univ_symbol: str, provider_hint: Optional[str] = None, exchange_hint: Optional[str] = None) -> str:
+    """Rate-limit bucket for a symbol: 'yfinance', 'ccxt:<exchange>' or a registered provider's name."""
+    return get_router().resolve(univ_symbol, exchange_hint, provider_hint).bucket
+
+def fetch_market_data_many(symbols: Iterable[Union[str, Tuple[str, str]]], interval: str = "15m", period: str = "30d",
+                           exchange_hint: Optional[str] = None, max_workers: int = 8,
+                           use_cache: bool = True, patterns: bool = True) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Fetch many symbols concurrently and yield (univ_symbol, df) as each one completes.
+    symbols: universe symbols, or (universe_symbol, provider_hint) pairs from the registry.
+    Every provider request takes a token from its provider's bucket (rate_limit.py), so a sweep
+    is paced by provider rate limits rather than by a fixed sleep per symbol; symbols served
+    from the bar cache cost no tokens.
+    """
+    jobs = {}
+    for item in symbols:
+        sym, hint = (item, None) if isinstance(item, str) else (item[0], item[1])
+        jobs.setdefault(sym, hint or None)
+
+    def _one(sym: str, hint: Optional[str]) -> pd.DataFrame:
+        return fetch_market_data(sym, interval=interval, period=period, exchange_hint=exchange_hint,
+                                 use_cache=use_cache, provider_hint=hint, patterns=patterns)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(_one, sym, hint): sym for sym, hint in jobs.items()}
+        for fut in as_completed(futures):
+            sym = futures[fut]
+            try:
+                df = fut.result()
+            except Exception as e:
+                logger.exception("fetch_market_data_many error for %s: %s", sym, e)
+                df = pd.DataFrame()
+            yield sym, df
+
+
+# ------------------ Example usage ------------------
+if __name__ == "__main__":
+    examples = [
+        "NSE:RELIANCE",
+        "BSE:TCS",
+        "INDEX:NIFTY",
+        "BINANCE:BTC/USDT",
+        "CRYPTO:DOGE/USDT",
+        "FX:EURUSD",
+        "METAL:GOLD"
+    ]
+    for s in examples:
+        print("Fetching", s, get_router().resolve(s))
+        try:
+            df = fetch_market_data(s, interval="1h", period="7d")
+            print(f"{s}: rows={len(df)}")
+            time.sleep(1)
+        except Exception as e:
+            print("Error:", e)